@@ -0,0 +1,177 @@
+# app/core/answer_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .config import setup_logging
+
+logger = setup_logging(__name__, "logs/answer_cache.log")
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    embedding: np.ndarray
+    chunk_set_key: str
+    answer: str
+    created_at: float
+    context_packing: Optional[Dict[str, Any]] = None
+
+
+class SemanticAnswerCache:
+    """
+    Cache semântico de respostas do LLM.
+
+    Um hit exige (1) exatamente o mesmo conjunto de chunks recuperados e
+    (2) similaridade de cosseno acima do limiar entre o embedding da query
+    atual e o de uma query já respondida. As entradas são agrupadas pela
+    assinatura do conjunto de chunks, então a comparação vetorial só roda
+    contra as poucas respostas que usaram o mesmo contexto.
+
+    Com um version_provider, cada resposta guarda a versão do índice em que
+    foi gerada; quando a versão muda (ingestão feita por outro processo) o
+    cache inteiro é descartado na próxima consulta, sem esperar o TTL.
+    """
+
+    def __init__(self,
+                 similarity_threshold: float = 0.95,
+                 max_entries: int = 512,
+                 ttl_seconds: Optional[float] = 24 * 3600,
+                 version_provider: Optional[Callable[[], str]] = None):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_provider = version_provider
+        self._index_version: Optional[str] = None
+
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._by_chunk_set: Dict[str, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidations": 0,
+            "stale_writes": 0
+        }
+
+    @staticmethod
+    def chunk_set_key(chunk_ids: Iterable[str]) -> str:
+        return hashlib.sha256("\x1f".join(sorted(set(chunk_ids))).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get(self, query_embedding: List[float], chunk_ids: Iterable[str]) -> Optional[str]:
+        """Retorna a resposta em cache para uma query semelhante com o mesmo contexto, ou None."""
+        entry = self.get_entry(query_embedding, chunk_ids)
+        return entry.answer if entry is not None else None
+
+    def get_entry(self, query_embedding: List[float], chunk_ids: Iterable[str],
+                  index_version: Optional[str] = None) -> Optional[CachedAnswer]:
+        """
+        Como get, mas devolve a entrada inteira (resposta e relatório de
+        empacotamento do contexto). index_version é a versão atual do índice;
+        quando omitida, é lida do version_provider.
+        """
+        key = self.chunk_set_key(chunk_ids)
+        query_vector = self._normalize(query_embedding)
+        now = time.time()
+        if index_version is None:
+            index_version = self.current_version()
+
+        with self._lock:
+            if index_version != self._index_version:
+                if self._entries:
+                    logger.info("Index version changed; dropping cached answers")
+                    self._clear()
+                self._index_version = index_version
+            candidate_ids = self._by_chunk_set.get(key, [])
+            best_id, best_similarity = None, self.similarity_threshold
+            for entry_id in list(candidate_ids):
+                entry = self._entries[entry_id]
+                if self.ttl_seconds is not None and now - entry.created_at > self.ttl_seconds:
+                    self._remove(entry_id)
+                    self.stats["expired"] += 1
+                    continue
+                similarity = float(np.dot(entry.embedding, query_vector))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.stats["hits"] += 1
+            entry = self._entries[best_id]
+            logger.info(f"Answer cache hit (similarity {best_similarity:.4f}) from query: '{entry.query}'")
+            return entry
+
+    def current_version(self) -> Optional[str]:
+        return self.version_provider() if self.version_provider else None
+
+    def put(self, query: str, query_embedding: List[float], chunk_ids: Iterable[str], answer: str,
+            context_packing: Optional[Dict[str, Any]] = None, index_version: Optional[str] = None):
+        """index_version é a versão lida antes da busca; se o índice mudou desde então, a resposta é descartada."""
+        key = self.chunk_set_key(chunk_ids)
+        entry = CachedAnswer(
+            query=query,
+            embedding=self._normalize(query_embedding),
+            chunk_set_key=key,
+            answer=answer,
+            created_at=time.time(),
+            context_packing=context_packing
+        )
+        with self._lock:
+            if self.version_provider and index_version != self._index_version:
+                self.stats["stale_writes"] += 1
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._by_chunk_set.setdefault(key, []).append(entry_id)
+            self.stats["writes"] += 1
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self.stats["evictions"] += 1
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        siblings = self._by_chunk_set.get(entry.chunk_set_key, [])
+        if entry_id in siblings:
+            siblings.remove(entry_id)
+        if not siblings:
+            self._by_chunk_set.pop(entry.chunk_set_key, None)
+
+    def invalidate(self):
+        """Descarta todas as respostas (ex.: após reconstrução das collections)."""
+        with self._lock:
+            self._clear()
+        logger.info("Answer cache invalidated")
+
+    def _clear(self):
+        self._entries.clear()
+        self._by_chunk_set.clear()
+        self.stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = self.stats.copy()
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
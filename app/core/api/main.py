@@ -1,19 +1,65 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from app.core.integrated_rag_system import OptimizedSearchSystem
-from app.core.initialize_chroma_db import initialize_chroma_db
+import asyncio
+import json
 import logging
+import time
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _warm_up_search_system(app: FastAPI):
+    """Cria (se necessário) e aquece o sistema de busca compartilhado pela aplicação"""
+    start_time = time.time()
+    try:
+        system = getattr(app.state, "search_system", None) or OptimizedSearchSystem()
+        app.state.search_system = system
+        if not system.is_initialized:
+            app.state.warm_up_stats = system.warm_up()
+        app.state.ready = True
+        logger.info(f"Search system ready in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        app.state.startup_error = str(e)
+        logger.error(f"Error warming up search system: {e}", exc_info=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Mantém um único OptimizedSearchSystem durante toda a vida da aplicação"""
+    app.state.ready = False
+    app.state.startup_error = None
+    app.state.warm_up_stats = {}
+    app.state.in_flight = 0
+    app.state.idle = asyncio.Event()
+    app.state.idle.set()
+    app.state.rebuild_lock = asyncio.Lock()
+    # O aquecimento roda em segundo plano para que o liveness responda enquanto o índice carrega
+    warm_up_task = asyncio.create_task(asyncio.to_thread(_warm_up_search_system, app))
+    try:
+        yield
+    finally:
+        # Cancelar a task não para a thread do aquecimento (nem a de um /initialize em
+        # andamento): espera as duas terminarem antes de fechar o sistema que elas usam
+        try:
+            await warm_up_task
+        except Exception as e:
+            logger.error(f"Warm-up failed during shutdown: {e}")
+        async with app.state.rebuild_lock:
+            system = getattr(app.state, "search_system", None)
+            if system is not None:
+                system.close()
+
 app = FastAPI(
     title="RAG System API",
     description="API para o Sistema RAG Otimizado",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -31,49 +77,180 @@ class GenerateRequest(BaseModel):
 
 class GenerateResponse(BaseModel):
     llm_response: str
+    context_packing: Optional[Dict[str, Any]] = None
 
-def get_search_system() -> OptimizedSearchSystem:
-    """Dependency to get or initialize the search system"""
-    try:
-        system = OptimizedSearchSystem()
-        if not system.is_initialized:
-            system.initialize_database(reset_collections=False)
-        return system
-    except Exception as e:
-        logger.error(f"Error initializing search system: {e}")
-        raise HTTPException(status_code=500, detail="Failed to initialize search system")
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+
+MAX_BATCH_QUERIES = 1000
+
+def get_search_system(request: Request) -> OptimizedSearchSystem:
+    """Dependency que retorna o sistema de busca já carregado pela aplicação"""
+    if not getattr(request.app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="Search system is not ready yet")
+    return request.app.state.search_system
+
+def _enter_query(request: Request) -> OptimizedSearchSystem:
+    """Registra uma consulta em andamento; /initialize espera todas terminarem antes de reconstruir"""
+    system = get_search_system(request)
+    request.app.state.in_flight += 1
+    request.app.state.idle.clear()
+    return system
+
+def _exit_query(request: Request):
+    state = request.app.state
+    state.in_flight -= 1
+    if state.in_flight == 0:
+        state.idle.set()
 
 @app.get("/health")
 async def health_check():
     """Endpoint para verificar a saúde da API"""
     return {"status": "healthy"}
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: o processo está de pé e respondendo"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check(request: Request):
+    """Readiness: o índice foi carregado e o sistema pode atender consultas"""
+    state = request.app.state
+    if getattr(state, "ready", False):
+        return {"status": "ready", "warm_up": getattr(state, "warm_up_stats", {})}
+    status = "failed" if getattr(state, "startup_error", None) else "starting"
+    return JSONResponse(
+        status_code=503,
+        content={"status": status, "error": getattr(state, "startup_error", None)}
+    )
+
 @app.post("/generate", response_model=GenerateResponse)
-async def generate_response(request: GenerateRequest, system: OptimizedSearchSystem = Depends(get_search_system)):
+async def generate_response(request: GenerateRequest, http_request: Request):
     """Endpoint para gerar respostas usando o LLM"""
+    system = _enter_query(http_request)
     try:
-        response = system.generate_llm_response(
+        response = await system.generate_llm_response_async(
             query_text=request.query,
             top_k=request.top_k
         )
-        return GenerateResponse(llm_response=response["llm_response"])
+        return GenerateResponse(
+            llm_response=response["llm_response"],
+            context_packing=response.get("context_packing")
+        )
     except Exception as e:
         logger.error(f"Error in generate: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        _exit_query(http_request)
 
-@app.post("/initialize")
-async def initialize_database(system: OptimizedSearchSystem = Depends(get_search_system)):
-    """Endpoint para inicializar o banco de dados"""
+@app.post("/search/batch")
+async def search_batch(request: BatchSearchRequest, http_request: Request):
+    """Endpoint de busca em lote: embeda e consulta todas as queries de uma vez"""
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    system = _enter_query(http_request)
     try:
-        stats = initialize_chroma_db(reset_collections=True)
-        return {
-            "status": "success",
-            "message": "Database initialized successfully",
-            "stats": stats
-        }
+        responses = await asyncio.to_thread(system.search_many, request.queries, request.top_k)
+        return {"results": [response.to_dict() for response in responses]}
     except Exception as e:
-        logger.error(f"Error initializing database: {e}")
+        logger.error(f"Error in batch search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        _exit_query(http_request)
+
+@app.get("/metrics/cache")
+async def cache_metrics(system: OptimizedSearchSystem = Depends(get_search_system)):
+    """Endpoint com as métricas de hit/miss dos caches de embedding e de respostas"""
+    return system.get_cache_stats()
+
+@app.get("/metrics/embeddings")
+async def embedding_metrics(system: OptimizedSearchSystem = Depends(get_search_system)):
+    """Endpoint com o tamanho dos lotes e a espera na fila do coalescer de embeddings"""
+    return system.get_embedding_stats()
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Serializa um evento no formato text/event-stream"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/generate/stream")
+async def generate_response_stream(request: GenerateRequest, http_request: Request):
+    """Endpoint que envia as fontes recuperadas e depois os tokens gerados via Server-Sent Events"""
+    system = _enter_query(http_request)
+    released = False
+
+    def release():
+        # Chamado ao fim do stream e de novo pela background task (que cobre um stream nunca iniciado)
+        nonlocal released
+        if not released:
+            released = True
+            _exit_query(http_request)
+
+    async def event_stream():
+        try:
+            async for event in system.stream_llm_response_async(
+                query_text=request.query,
+                top_k=request.top_k
+            ):
+                yield _format_sse(event["event"], event["data"])
+        except Exception as e:
+            logger.error(f"Error in generate stream: {e}")
+            yield _format_sse("error", {"detail": str(e)})
+        finally:
+            release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
+
+def _build_initialized_system() -> Tuple[OptimizedSearchSystem, Dict[str, Any]]:
+    """Sistema novo, com as collections reconstruídas do zero"""
+    system = OptimizedSearchSystem()
+    try:
+        stats = system.initialize_database(reset_collections=True)
+    except Exception:
+        system.close()
+        raise
+    return system, stats
+
+@app.post("/initialize")
+async def initialize_database(request: Request):
+    """
+    Endpoint para inicializar o banco de dados. A reconstrução apaga as
+    collections que as consultas leem, então o sistema sai de serviço (503)
+    até as consultas em andamento terminarem; um sistema novo é montado com
+    o banco reconstruído e substitui o antigo de uma vez.
+    """
+    state = request.app.state
+    get_search_system(request)
+    async with state.rebuild_lock:
+        old_system = state.search_system
+        state.ready = False
+        try:
+            await state.idle.wait()
+            new_system, stats = await asyncio.to_thread(_build_initialized_system)
+        except Exception as e:
+            logger.error(f"Error initializing database: {e}")
+            # O sistema antigo volta a atender com o que ficou no banco
+            try:
+                await asyncio.to_thread(old_system.reload)
+                state.ready = True
+            except Exception as reload_error:
+                state.startup_error = str(reload_error)
+                logger.error(f"Error reloading search system after failed initialization: {reload_error}")
+            raise HTTPException(status_code=500, detail=str(e))
+        state.search_system = new_system
+        state.ready = True
+        old_system.close()
+    return {
+        "status": "success",
+        "message": "Database initialized successfully",
+        "stats": stats
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,4 +1,5 @@
 import os
+import json
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
@@ -21,6 +22,131 @@ LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(exist_ok=True)
 
+# Embedding configuration
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "512"))
+
+# Embedding backend for queries and ingest: "openai" (API) or "local"
+# (deterministic hashing encoder, no network). Collections must be ingested
+# with the same backend they are queried with.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+LOCAL_EMBEDDING_MODEL = "local-hashing-v1"
+# Recompute chunk embeddings with the configured backend at ingest instead of
+# using the vectors stored in the JSON files (default: only for the local backend)
+INGEST_REEMBED = os.getenv("INGEST_REEMBED", "true" if EMBEDDING_BACKEND == "local" else "false").lower() == "true"
+# Per-collection manifests (doc_id -> content/metadata/embedding hashes) kept
+# next to the Chroma files so re-runs only write what changed
+INGEST_MANIFEST_DIRNAME = "ingest_manifest"
+INGEST_DELETE_BATCH_SIZE = int(os.getenv("INGEST_DELETE_BATCH_SIZE", "500"))
+# Chunks re-embedded (one provider call) and validated/normalized together at ingest
+INGEST_VALIDATION_BATCH_SIZE = int(os.getenv("INGEST_VALIDATION_BATCH_SIZE", "256"))
+# Collections ingested concurrently, each as a parse -> validate -> write pipeline
+# whose stages exchange blocks through queues of at most QUEUE_BLOCKS blocks.
+# Chroma's add() holds the GIL, so with stored embeddings concurrent collections
+# only serialize; they pay off when re-embedding waits on the embedding API
+INGEST_PARALLEL_COLLECTIONS = int(os.getenv("INGEST_PARALLEL_COLLECTIONS", "4" if INGEST_REEMBED else "1"))
+INGEST_PIPELINE_QUEUE_BLOCKS = int(os.getenv("INGEST_PIPELINE_QUEUE_BLOCKS", "4"))
+# Chroma write batches start at WRITE_BATCH_SIZE documents, double while the add
+# latency per document improves by more than TOLERANCE and halve when it gets
+# worse by more than that, always within [MIN, MAX]
+INGEST_WRITE_BATCH_SIZE = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "50"))
+INGEST_WRITE_BATCH_MIN = int(os.getenv("INGEST_WRITE_BATCH_MIN", "10"))
+INGEST_WRITE_BATCH_MAX = int(os.getenv("INGEST_WRITE_BATCH_MAX", "1000"))
+INGEST_WRITE_BATCH_TOLERANCE = float(os.getenv("INGEST_WRITE_BATCH_TOLERANCE", "0.1"))
+
+# Index snapshots: immutable, versioned copies of chroma_db (with a checksum
+# manifest) built offline; the server activates the newest valid one at start
+# instead of ingesting. REQUIRED makes start fail when none is valid (no
+# fallback ingest); KEEP is how many snapshots a build leaves in the directory
+INDEX_SNAPSHOT_DIR = os.getenv("INDEX_SNAPSHOT_DIR", "snapshots")
+INDEX_SNAPSHOT_MANIFEST_FILENAME = "snapshot_manifest.json"
+INDEX_SNAPSHOT_VERIFY_CHECKSUMS = os.getenv("INDEX_SNAPSHOT_VERIFY_CHECKSUMS", "true").lower() == "true"
+INDEX_SNAPSHOT_REQUIRED = os.getenv("INDEX_SNAPSHOT_REQUIRED", "false").lower() == "true"
+INDEX_SNAPSHOT_KEEP = int(os.getenv("INDEX_SNAPSHOT_KEEP", "3"))
+
+# Micro-batching of concurrent query embeddings into one multi-input request
+# (remote backends only): flush after MAX_WAIT_MS from the first queued text
+# or once MAX_BATCH_SIZE texts are waiting
+EMBEDDING_COALESCER_ENABLED = os.getenv("EMBEDDING_COALESCER_ENABLED", "true").lower() == "true"
+EMBEDDING_COALESCER_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_COALESCER_MAX_BATCH_SIZE", "64"))
+EMBEDDING_COALESCER_MAX_WAIT_MS = float(os.getenv("EMBEDDING_COALESCER_MAX_WAIT_MS", "5"))
+EMBEDDING_COALESCER_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_COALESCER_MAX_IN_FLIGHT", "4"))
+
+# Query embedding cache (in-process LRU + on-disk SQLite store)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "cache/query_embeddings.sqlite3")
+EMBEDDING_CACHE_MEMORY_SIZE = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "1024"))
+EMBEDDING_CACHE_DISK_SIZE = int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "50000"))
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# Concurrent fan-out of collection queries
+SEARCH_PARALLEL_ENABLED = os.getenv("SEARCH_PARALLEL_ENABLED", "true").lower() == "true"
+SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", "4"))
+SEARCH_COLLECTION_TIMEOUT_SECONDS = float(os.getenv("SEARCH_COLLECTION_TIMEOUT_SECONDS", "5.0"))
+
+# Search engine: "chroma" (one HNSW query per collection), "unified"
+# (single in-process matrix spanning all collections) or "exact" (brute force
+# over memory-mapped float16/int8 exports of each collection)
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "chroma")
+
+# Exact engine: export dtype, collections served by it (empty = all; the rest
+# stay on Chroma) and rows per matrix-multiply block
+EXACT_INDEX_DIRNAME = "exact_index"
+SEARCH_EXACT_DTYPE = os.getenv("SEARCH_EXACT_DTYPE", "float16")
+SEARCH_EXACT_COLLECTIONS = [name.strip() for name in os.getenv("SEARCH_EXACT_COLLECTIONS", "").split(",") if name.strip()]
+SEARCH_EXACT_BLOCK_ROWS = int(os.getenv("SEARCH_EXACT_BLOCK_ROWS", "65536"))
+
+# Adaptive candidate depth: start shallow and widen a collection only while
+# its last returned score could still reach the top_k cutoff
+SEARCH_ADAPTIVE_DEPTH = os.getenv("SEARCH_ADAPTIVE_DEPTH", "true").lower() == "true"
+SEARCH_ADAPTIVE_INITIAL_DEPTH = int(os.getenv("SEARCH_ADAPTIVE_INITIAL_DEPTH", "10"))
+SEARCH_ADAPTIVE_GROWTH_FACTOR = int(os.getenv("SEARCH_ADAPTIVE_GROWTH_FACTOR", "2"))
+SEARCH_ADAPTIVE_SCORE_MARGIN = float(os.getenv("SEARCH_ADAPTIVE_SCORE_MARGIN", "0.01"))
+
+# Batch search: inputs per embeddings.create call and query vectors per collection.query call
+SEARCH_BATCH_EMBEDDING_SIZE = int(os.getenv("SEARCH_BATCH_EMBEDDING_SIZE", "256"))
+SEARCH_BATCH_QUERY_SIZE = int(os.getenv("SEARCH_BATCH_QUERY_SIZE", "64"))
+
+# Two-phase fetch: Chroma queries return only ids and distances (plus vectors for
+# MMR); documents and metadata are read afterwards for the final results only
+SEARCH_TWO_PHASE_FETCH = os.getenv("SEARCH_TWO_PHASE_FETCH", "true").lower() == "true"
+
+# Hybrid retrieval: BM25 inverted index (built at ingest, stored next to the
+# Chroma files) fused with the vector ranking by reciprocal rank fusion
+LEXICAL_INDEX_FILENAME = "lexical_index.json"
+SEARCH_HYBRID_ENABLED = os.getenv("SEARCH_HYBRID_ENABLED", "true").lower() == "true"
+SEARCH_HYBRID_LEXICAL_TOP_N = int(os.getenv("SEARCH_HYBRID_LEXICAL_TOP_N", "50"))
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+
+# Direct identifier lookups: Aho-Corasick automaton over chunk titles,
+# function names and enum names (map built at ingest, next to the Chroma files)
+IDENTIFIER_INDEX_FILENAME = "identifier_index.json"
+SEARCH_IDENTIFIER_LOOKUP_ENABLED = os.getenv("SEARCH_IDENTIFIER_LOOKUP_ENABLED", "true").lower() == "true"
+# Queries made only of identifiers (plus stopwords) are answered without embedding or ANN
+SEARCH_IDENTIFIER_SKIP_ANN = os.getenv("SEARCH_IDENTIFIER_SKIP_ANN", "true").lower() == "true"
+
+# Maximal Marginal Relevance reranking of the merged candidates: lambda weighs
+# relevance against similarity to chunks already selected (1.0 = pure relevance)
+SEARCH_MMR_ENABLED = os.getenv("SEARCH_MMR_ENABLED", "true").lower() == "true"
+SEARCH_MMR_LAMBDA = float(os.getenv("SEARCH_MMR_LAMBDA", "0.7"))
+SEARCH_MMR_LAMBDA_BY_INTENT = json.loads(os.getenv(
+    "SEARCH_MMR_LAMBDA_BY_INTENT",
+    '{"code_request": 0.85, "report_query": 0.85, "field_query": 0.7, "enum_query": 0.6, "data_source_query": 0.5}'
+))
+SEARCH_MMR_CANDIDATE_POOL = int(os.getenv("SEARCH_MMR_CANDIDATE_POOL", "50"))
+
+# Context packing: token budget for the retrieved documentation in the prompt,
+# filled in rank order using the token_count stored with each chunk at ingest
+CONTEXT_PACKING_ENABLED = os.getenv("CONTEXT_PACKING_ENABLED", "true").lower() == "true"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+CONTEXT_MIN_FRAGMENT_TOKENS = int(os.getenv("CONTEXT_MIN_FRAGMENT_TOKENS", "64"))
+
+# Semantic answer cache in front of the LLM
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+
 # Configure logging for the application
 def setup_logging(name, log_file=None):
     """
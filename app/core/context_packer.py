@@ -0,0 +1,121 @@
+# app/core/context_packer.py
+import re
+from typing import Any, Dict, List, Tuple
+
+from .config import setup_logging
+from ..utils.token_counter import estimate_tokens
+
+logger = setup_logging(__name__, "logs/context_packer.log")
+
+CONTEXT_BLOCK_HEADER = "### Bloco de Documentação (Fonte: {collection})\n"
+TRUNCATION_MARKER = "\n\n[... trecho omitido por limite de contexto ...]"
+
+_CODE_FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+_HEADING_PATTERN = re.compile(r"^#{1,6}\s")
+
+
+def format_context_block(collection: str, content: str) -> str:
+    return CONTEXT_BLOCK_HEADER.format(collection=collection) + content
+
+
+def boundary_offsets(content: str) -> List[int]:
+    """
+    Posições em que o conteúdo pode ser cortado sem partir uma seção ou um
+    bloco de código: antes de cada título Markdown e de cada bloco de código,
+    e logo após o fechamento de cada bloco.
+    """
+    offsets = []
+    in_code_block = False
+    position = 0
+    for line in content.splitlines(keepends=True):
+        if _CODE_FENCE_PATTERN.match(line):
+            if not in_code_block:
+                offsets.append(position)
+            in_code_block = not in_code_block
+            position += len(line)
+            if not in_code_block:
+                offsets.append(position)
+            continue
+        if not in_code_block and _HEADING_PATTERN.match(line):
+            offsets.append(position)
+        position += len(line)
+    return sorted({offset for offset in offsets if 0 < offset < len(content)})
+
+
+class ContextPacker:
+    """
+    Preenche um orçamento de tokens com os resultados da busca, na ordem do ranking.
+
+    O tamanho de cada chunk vem do token_count gravado nos metadados na
+    ingestão (sem tokenizar em tempo de consulta). Um chunk que não cabe
+    inteiro é cortado na última fronteira de seção/bloco de código que cabe
+    no espaço restante; se nenhuma cabe, é descartado e o próximo é tentado.
+    """
+
+    def __init__(self, token_budget: int = 8000, min_fragment_tokens: int = 64):
+        self.token_budget = token_budget
+        self.min_fragment_tokens = min_fragment_tokens
+
+    @staticmethod
+    def result_tokens(result: Dict[str, Any]) -> int:
+        token_count = (result.get("metadata") or {}).get("token_count")
+        if token_count:
+            return int(token_count)
+        return estimate_tokens(result.get("content", ""))
+
+    def _truncate(self, content: str, tokens: int, available_tokens: int) -> Tuple[str, int]:
+        """Maior prefixo terminado em fronteira que cabe em available_tokens, com sua estimativa de tokens."""
+        if available_tokens < self.min_fragment_tokens or not content:
+            return "", 0
+        tokens_per_char = tokens / len(content)
+        max_chars = int(available_tokens / tokens_per_char) if tokens_per_char else len(content)
+        cut = max((offset for offset in boundary_offsets(content) if offset <= max_chars), default=0)
+        fragment = content[:cut].rstrip()
+        if not fragment:
+            return "", 0
+        return fragment, int(round(cut * tokens_per_char))
+
+    def pack(self, search_results: List[Any]) -> Tuple[List[str], Dict[str, Any]]:
+        """Retorna os blocos de contexto e o relatório das decisões de empacotamento."""
+        remaining = self.token_budget
+        blocks: List[str] = []
+        decisions: List[Dict[str, Any]] = []
+
+        for rank, result in enumerate(search_results, 1):
+            if not isinstance(result, dict):
+                result = {"content": str(result)}
+            collection = result.get("collection", "unknown")
+            header_tokens = estimate_tokens(CONTEXT_BLOCK_HEADER.format(collection=collection))
+            content = result.get("content", "")
+            tokens = self.result_tokens(result)
+            decision = {"id": result.get("id", ""), "rank": rank, "tokens": tokens}
+
+            if header_tokens + tokens <= remaining:
+                blocks.append(format_context_block(collection, content))
+                remaining -= header_tokens + tokens
+                decision.update(action="included", packed_tokens=tokens)
+            else:
+                available = remaining - header_tokens - estimate_tokens(TRUNCATION_MARKER)
+                fragment, fragment_tokens = self._truncate(content, tokens, available)
+                if fragment:
+                    blocks.append(format_context_block(collection, fragment + TRUNCATION_MARKER))
+                    remaining -= header_tokens + fragment_tokens + estimate_tokens(TRUNCATION_MARKER)
+                    decision.update(action="truncated", packed_tokens=fragment_tokens)
+                else:
+                    decision.update(action="skipped", packed_tokens=0)
+            decisions.append(decision)
+
+        actions = [decision["action"] for decision in decisions]
+        report = {
+            "token_budget": self.token_budget,
+            "tokens_used": self.token_budget - remaining,
+            "included": actions.count("included"),
+            "truncated": actions.count("truncated"),
+            "skipped": actions.count("skipped"),
+            "chunks": decisions
+        }
+        logger.info(
+            f"Context packed: {report['tokens_used']}/{self.token_budget} tokens, "
+            f"{report['included']} included, {report['truncated']} truncated, {report['skipped']} skipped"
+        )
+        return blocks, report
@@ -0,0 +1,231 @@
+# app/core/embedding_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .config import setup_logging
+
+logger = setup_logging(__name__, "logs/embedding_cache.log")
+
+
+def normalize_query_text(text: str) -> str:
+    """Normaliza o texto da query para uso como chave de cache (NFC + espaços colapsados)."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Cache de embeddings de query em dois níveis:
+    1. LRU em memória (acesso em microssegundos)
+    2. Store em disco via SQLite (sobrevive a reinícios)
+
+    As entradas são indexadas por (texto normalizado, modelo, dimensões) e
+    expiram por TTL. Ambos os níveis têm tamanho máximo com descarte LRU.
+    """
+
+    def __init__(self,
+                 db_path: Optional[str] = "cache/query_embeddings.sqlite3",
+                 max_memory_entries: int = 1024,
+                 max_disk_entries: int = 50000,
+                 ttl_seconds: Optional[float] = 30 * 24 * 3600):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Linhas no store em disco: contadas uma vez na abertura e mantidas a cada insert/delete
+        self._disk_count = 0
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "writes": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "disk_errors": 0
+        }
+
+        if db_path:
+            self._open_disk_store(db_path)
+
+    def _open_disk_store(self, db_path: str):
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " dimensions INTEGER NOT NULL,"
+                " embedding BLOB NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_access"
+                " ON query_embeddings(last_access)"
+            )
+            self._disk_count = self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            logger.info(f"Embedding cache disk store opened at {db_path}")
+        except Exception as e:
+            logger.error(f"Could not open embedding cache disk store at {db_path}: {e}")
+            self._conn = None
+
+    @staticmethod
+    def make_key(text: str, model: str, dimensions: int) -> str:
+        normalized = normalize_query_text(text)
+        return hashlib.sha256(f"{model}|{dimensions}|{normalized}".encode("utf-8")).hexdigest()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and (now - created_at) > self.ttl_seconds
+
+    def get(self, text: str, model: str, dimensions: int) -> Optional[List[float]]:
+        """Retorna o embedding em cache ou None em caso de miss/expiração."""
+        key = self.make_key(text, model, dimensions)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                embedding, created_at = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return embedding
+                del self._memory[key]
+                self.stats["expired"] += 1
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT embedding, created_at FROM query_embeddings WHERE key = ?",
+                        (key,)
+                    ).fetchone()
+                    if row is not None:
+                        blob, created_at = row
+                        if self._is_expired(created_at, now):
+                            cursor = self._conn.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+                            self._disk_count -= max(cursor.rowcount, 0)
+                            self.stats["expired"] += 1
+                        else:
+                            embedding = np.frombuffer(blob, dtype=np.float32).tolist()
+                            self._conn.execute(
+                                "UPDATE query_embeddings SET last_access = ? WHERE key = ?",
+                                (now, key)
+                            )
+                            self._put_memory(key, embedding, created_at)
+                            self.stats["disk_hits"] += 1
+                            return embedding
+                except sqlite3.Error as e:
+                    self.stats["disk_errors"] += 1
+                    logger.warning(f"Embedding cache disk read failed: {e}")
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, text: str, model: str, dimensions: int, embedding: List[float]):
+        """Armazena o embedding nos dois níveis do cache."""
+        key = self.make_key(text, model, dimensions)
+        now = time.time()
+
+        with self._lock:
+            self._put_memory(key, list(embedding), now)
+            self.stats["writes"] += 1
+
+            if self._conn is not None:
+                try:
+                    blob = np.asarray(embedding, dtype=np.float32).tobytes()
+                    # INSERT OR IGNORE + UPDATE (em vez de REPLACE) para saber se a linha é nova
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO query_embeddings"
+                        " (key, model, dimensions, embedding, created_at, last_access)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, model, dimensions, blob, now, now)
+                    )
+                    if cursor.rowcount > 0:
+                        self._disk_count += cursor.rowcount
+                        if self._disk_count > self.max_disk_entries:
+                            self._evict_disk(now)
+                    else:
+                        self._conn.execute(
+                            "UPDATE query_embeddings SET embedding = ?, created_at = ?, last_access = ?"
+                            " WHERE key = ?",
+                            (blob, now, now, key)
+                        )
+                except sqlite3.Error as e:
+                    self.stats["disk_errors"] += 1
+                    logger.warning(f"Embedding cache disk write failed: {e}")
+
+    def _put_memory(self, key: str, embedding: List[float], created_at: float):
+        self._memory[key] = (embedding, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["memory_evictions"] += 1
+
+    def _evict_disk(self, now: float):
+        """
+        Chamado só quando o store passa de max_disk_entries: primeiro remove as
+        entradas expiradas (as lidas já são removidas no get), depois as menos
+        acessadas até 90% do limite, para que a limpeza não rode a cada put.
+        """
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM query_embeddings WHERE created_at < ?",
+                (now - self.ttl_seconds,)
+            )
+            removed = max(cursor.rowcount, 0)
+            self._disk_count -= removed
+            self.stats["disk_evictions"] += removed
+
+        overflow = self._disk_count - (self.max_disk_entries - self.max_disk_entries // 10)
+        if overflow > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM query_embeddings WHERE key IN ("
+                " SELECT key FROM query_embeddings ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            removed = max(cursor.rowcount, 0)
+            self._disk_count -= removed
+            self.stats["disk_evictions"] += removed
+
+    def clear(self):
+        """Remove todas as entradas dos dois níveis."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM query_embeddings")
+                    self._disk_count = 0
+                except sqlite3.Error as e:
+                    self.stats["disk_errors"] += 1
+                    logger.warning(f"Embedding cache clear failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores de hit/miss e taxa de acerto"""
+        with self._lock:
+            stats = self.stats.copy()
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,164 @@
+# app/core/embedding_coalescer.py
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .config import setup_logging
+from .embedding_provider import EmbeddingProvider
+
+logger = setup_logging(__name__, "logs/embedding_coalescer.log")
+
+_SHUTDOWN = object()
+
+
+class EmbeddingCoalescer(EmbeddingProvider):
+    """
+    Micro-batching na frente de um EmbeddingProvider remoto.
+
+    Chamadas concorrentes de textos isolados (threads ou corrotinas) entram
+    numa fila; uma thread coletora junta o que chegar em até max_wait_ms a
+    partir do primeiro pedido (ou até max_batch_size textos), envia um único
+    embed com várias entradas e devolve cada vetor ao seu chamador. Até
+    max_in_flight lotes ficam em voo ao mesmo tempo, então uma chamada lenta
+    não segura a fila. Pedidos que já são lotes do tamanho máximo vão direto
+    ao provider.
+    """
+
+    def __init__(self, provider: EmbeddingProvider, max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0, max_in_flight: int = 4, stats_window: int = 1024):
+        self.provider = provider
+        self.model_name = provider.model_name
+        self.dimensions = provider.dimensions
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._dispatch_executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embedding-batch")
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "texts_sent": 0,
+            "max_batch_size": 0,
+            "direct_batches": 0,
+            "errors": 0
+        }
+        # Janelas recentes para as distribuições (tamanho do lote e espera na fila)
+        self._batch_sizes: deque = deque(maxlen=stats_window)
+        self._queue_waits_ms: deque = deque(maxlen=stats_window)
+
+        self._collector = threading.Thread(target=self._collect_loop, name="embedding-coalescer", daemon=True)
+        self._collector.start()
+
+    def _submit(self, text: str) -> Future:
+        if self._closed:
+            raise RuntimeError("EmbeddingCoalescer is closed")
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) >= self.max_batch_size:
+            with self._lock:
+                self.stats["direct_batches"] += 1
+            return self.provider.embed(texts)
+        futures = [self._submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) >= self.max_batch_size:
+            with self._lock:
+                self.stats["direct_batches"] += 1
+            return await self.provider.embed_async(texts)
+        futures = [asyncio.wrap_future(self._submit(text)) for text in texts]
+        return list(await asyncio.gather(*futures))
+
+    def _collect_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is _SHUTDOWN:
+                return
+            batch = [item]
+            deadline = item[2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # Vencido o prazo, ainda leva o que já estiver na fila (sem esperar)
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _SHUTDOWN:
+                    self._dispatch(batch)
+                    return
+                batch.append(item)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[str, Future, float]]):
+        dispatched_at = time.perf_counter()
+        # Textos repetidos no lote são enviados uma única vez
+        unique_texts = list(dict.fromkeys(text for text, _, _ in batch))
+        with self._lock:
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["texts_sent"] += len(unique_texts)
+            self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(batch))
+            self._batch_sizes.append(len(batch))
+            self._queue_waits_ms.extend((dispatched_at - enqueued_at) * 1000.0 for _, _, enqueued_at in batch)
+        self._dispatch_executor.submit(self._run_batch, batch, unique_texts)
+
+    def _run_batch(self, batch: List[Tuple[str, Future, float]], unique_texts: List[str]):
+        try:
+            embeddings = dict(zip(unique_texts, self.provider.embed(unique_texts)))
+        except Exception as e:
+            logger.error(f"Error embedding coalesced batch of {len(unique_texts)} texts: {str(e)}")
+            with self._lock:
+                self.stats["errors"] += 1
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for text, future, _ in batch:
+            future.set_result(embeddings[text])
+        logger.debug(f"Coalesced {len(batch)} requests into one call of {len(unique_texts)} texts")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores, tamanho médio/p50/p95 dos lotes e espera na fila (ms) dos pedidos recentes"""
+        with self._lock:
+            stats: Dict[str, Any] = self.stats.copy()
+            batch_sizes = np.array(self._batch_sizes, dtype=np.float64)
+            queue_waits = np.array(self._queue_waits_ms, dtype=np.float64)
+        stats["avg_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        stats["queue_depth"] = self._queue.qsize()
+        if len(batch_sizes):
+            stats["batch_size_p50"] = float(np.percentile(batch_sizes, 50))
+            stats["batch_size_p95"] = float(np.percentile(batch_sizes, 95))
+        if len(queue_waits):
+            stats["queue_wait_ms_avg"] = float(queue_waits.mean())
+            stats["queue_wait_ms_p50"] = float(np.percentile(queue_waits, 50))
+            stats["queue_wait_ms_p95"] = float(np.percentile(queue_waits, 95))
+            stats["queue_wait_ms_max"] = float(queue_waits.max())
+        return stats
+
+    def close(self):
+        """Envia o que ainda estiver na fila e encerra a thread coletora."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_SHUTDOWN)
+        self._collector.join(timeout=1.0)
+        self._dispatch_executor.shutdown(wait=False)
+        # Pedidos que chegaram depois do sinal de parada não seriam atendidos
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _SHUTDOWN:
+                item[1].set_exception(RuntimeError("EmbeddingCoalescer is closed"))
@@ -0,0 +1,165 @@
+# app/core/embedding_provider.py
+import asyncio
+import re
+import unicodedata
+import zlib
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+from openai import OpenAI, AsyncOpenAI
+
+from .config import (
+    setup_logging,
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    LOCAL_EMBEDDING_MODEL,
+)
+
+logger = setup_logging(__name__, "logs/embedding_provider.log")
+
+
+class EmbeddingProvider(ABC):
+    """
+    Backend de embeddings usado tanto na consulta quanto na ingestão.
+
+    model_name identifica o espaço vetorial (entra na chave do cache de
+    embeddings e nos metadados das collections): vetores de modelos diferentes
+    não são comparáveis entre si.
+    """
+
+    model_name: str
+    dimensions: int
+    # Backends remotos se beneficiam de juntar chamadas concorrentes num só pedido
+    coalesce_requests: bool = False
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings dos textos, na mesma ordem. Erros do backend são propagados."""
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+    def embed_one(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+    async def embed_one_async(self, text: str) -> List[float]:
+        return (await self.embed_async([text]))[0]
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings da API da OpenAI (text-embedding-3-small com dimensões reduzidas por padrão)."""
+
+    coalesce_requests = True
+
+    def __init__(self, api_key: str, model: str = EMBEDDING_MODEL, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.model_name = model
+        self.dimensions = dimensions
+        self.client = OpenAI(api_key=api_key)
+        self.async_client = AsyncOpenAI(api_key=api_key)
+
+    @staticmethod
+    def _ordered(response) -> List[List[float]]:
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(
+            model=self.model_name,
+            input=texts,
+            dimensions=self.dimensions
+        )
+        return self._ordered(response)
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        response = await self.async_client.embeddings.create(
+            model=self.model_name,
+            input=texts,
+            dimensions=self.dimensions
+        )
+        return self._ordered(response)
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Encoder local e determinístico por feature hashing (sem rede nem modelo).
+
+    Palavras, bigramas de palavras e trigramas de caracteres do texto
+    normalizado (minúsculas, sem acentos, identificadores quebrados em
+    camelCase/snake_case) são espalhados em `dimensions` posições via CRC32,
+    com sinal também derivado do hash, e o vetor final é L2-normalizado.
+    Não captura sinônimos como um modelo treinado, mas é estável entre
+    processos e máquinas e leva bem menos de 1 ms por query.
+    """
+
+    WORD_WEIGHT = 1.0
+    BIGRAM_WEIGHT = 0.5
+    TRIGRAM_WEIGHT = 0.25
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS, model: str = LOCAL_EMBEDDING_MODEL):
+        self.model_name = model
+        self.dimensions = dimensions
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+        text = unicodedata.normalize("NFKD", text.lower())
+        text = "".join(char for char in text if not unicodedata.combining(char))
+        return [token for token in re.split(r"[\W_]+", text) if token]
+
+    def _features(self, text: str):
+        tokens = self._tokens(text)
+        for token in tokens:
+            yield "w:" + token, self.WORD_WEIGHT
+            padded = f"#{token}#"
+            for start in range(len(padded) - 2):
+                yield "c:" + padded[start:start + 3], self.TRIGRAM_WEIGHT
+        for first, second in zip(tokens, tokens[1:]):
+            yield f"b:{first} {second}", self.BIGRAM_WEIGHT
+
+    def _embed_text(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, weight in self._features(text):
+            digest = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dimensions] += sign * weight
+        # Amortece termos muito repetidos (equivalente a um tf sublinear)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            # Texto sem tokens: vetor fixo, para não gerar distâncias indefinidas
+            vector[zlib.crc32(b"<empty>") % self.dimensions] = 1.0
+            return vector
+        return vector / norm
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_text(text).tolist() for text in texts]
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        # CPU puro e rápido: não compensa ir para uma thread
+        return self.embed(texts)
+
+
+def configured_embedding_model(backend: Optional[str] = None) -> str:
+    """Nome do modelo do backend configurado, sem instanciar o cliente (não exige chave de API)."""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == "local":
+        return LOCAL_EMBEDDING_MODEL
+    if backend == "openai":
+        return EMBEDDING_MODEL
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def create_embedding_provider(backend: Optional[str] = None, api_key: Optional[str] = None) -> EmbeddingProvider:
+    """Instancia o backend configurado em EMBEDDING_BACKEND ("openai" ou "local")."""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == "local":
+        provider = HashingEmbeddingProvider()
+    elif backend == "openai":
+        if not api_key:
+            raise ValueError("OpenAI API key is required for the openai embedding backend. Set OPENAI_API_KEY or use EMBEDDING_BACKEND=local.")
+        provider = OpenAIEmbeddingProvider(api_key=api_key)
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    logger.info(f"Embedding provider: {backend} ({provider.model_name}, {provider.dimensions} dims)")
+    return provider
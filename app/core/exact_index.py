@@ -0,0 +1,336 @@
+# app/core/exact_index.py
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .config import setup_logging
+from .result_set import ResultSet, object_array
+
+logger = setup_logging(__name__, "logs/exact_index.log")
+
+MANIFEST_FILENAME = "manifest.json"
+SUPPORTED_DTYPES = ("float16", "int8")
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantização escalar simétrica por vetor: linha ≈ codes * scale, com codes em [-127, 127]."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _atomic_save(path: str, array: np.ndarray):
+    # Outros processos podem estar mapeando o arquivo: grava ao lado e troca de uma vez
+    temporary_path = f"{path}.tmp.{os.getpid()}.npy"
+    np.save(temporary_path, array)
+    os.replace(temporary_path, path)
+
+
+def _read_normalized_embeddings(collection, page_size: int = 1000) -> Tuple[np.ndarray, List[str]]:
+    """Embeddings L2-normalizados (float32) e ids de uma collection, lidos em páginas."""
+    blocks, ids = [], []
+    count = collection.count()
+    for page_start in range(0, count, page_size):
+        page = collection.get(limit=page_size, offset=page_start, include=["embeddings"])
+        page_embeddings = page.get("embeddings")
+        if page_embeddings is None or len(page_embeddings) == 0:
+            continue
+        blocks.append(np.asarray(page_embeddings, dtype=np.float32))
+        ids.extend(page["ids"])
+
+    matrix = np.vstack(blocks) if blocks else np.empty((0, 0), dtype=np.float32)
+    if matrix.size:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+    return matrix, ids
+
+
+class ExactVectorIndex:
+    """
+    Busca exata (força bruta) sobre os embeddings exportados de cada collection.
+
+    Cada collection vira um .npy em float16, ou em int8 com uma escala float32
+    por vetor, aberto com mmap: vários processos de worker compartilham as
+    mesmas páginas pelo page cache do sistema operacional em vez de cada um
+    manter sua cópia. As similaridades saem de produtos matriciais em blocos
+    de block_rows linhas (convertidas para float32 bloco a bloco), seguidos de
+    um argpartition. Documentos e metadados não ficam no índice: os
+    resultados voltam com o conteúdo pendente e são hidratados do Chroma
+    apenas para os finais.
+    """
+
+    def __init__(self, directory: str, dtype: str = "float16", block_rows: int = 65536):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported exact index dtype: {dtype} (expected one of {SUPPORTED_DTYPES})")
+        self.directory = directory
+        self.dtype = dtype
+        self.block_rows = block_rows
+        self.matrices: Dict[str, np.ndarray] = {}
+        self.scales: Dict[str, Optional[np.ndarray]] = {}
+        self.ids: Dict[str, np.ndarray] = {}
+        self.is_loaded = False
+        self.load_time = 0.0
+
+    def __contains__(self, collection_name: str) -> bool:
+        return collection_name in self.matrices
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self.ids.values())
+
+    def _paths(self, collection_name: str) -> Dict[str, str]:
+        prefix = os.path.join(self.directory, f"{collection_name}.{self.dtype}")
+        return {
+            "vectors": f"{prefix}.vectors.npy",
+            "scales": f"{prefix}.scales.npy",
+            "ids": f"{prefix}.ids.json"
+        }
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        temporary_manifest_path = os.path.join(self.directory, f"{MANIFEST_FILENAME}.tmp.{os.getpid()}")
+        with open(temporary_manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temporary_manifest_path, os.path.join(self.directory, MANIFEST_FILENAME))
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.directory, MANIFEST_FILENAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def export_collection(self, collection_name: str, collection, page_size: int = 1000) -> int:
+        """Exporta os embeddings (L2-normalizados) de uma collection do Chroma e atualiza o manifesto."""
+        os.makedirs(self.directory, exist_ok=True)
+        matrix, ids = _read_normalized_embeddings(collection, page_size)
+
+        paths = self._paths(collection_name)
+        if self.dtype == "int8":
+            codes, scales = quantize_int8(matrix)
+            _atomic_save(paths["vectors"], codes)
+            _atomic_save(paths["scales"], scales)
+        else:
+            _atomic_save(paths["vectors"], matrix.astype(np.float16))
+        temporary_ids_path = f"{paths['ids']}.tmp.{os.getpid()}"
+        with open(temporary_ids_path, "w", encoding="utf-8") as f:
+            json.dump(ids, f)
+        os.replace(temporary_ids_path, paths["ids"])
+
+        manifest = self._read_manifest()
+        manifest.setdefault("collections", {})[f"{collection_name}.{self.dtype}"] = {
+            "count": len(ids),
+            "dimensions": int(matrix.shape[1]) if matrix.size else 0,
+            "exported_at": time.time()
+        }
+        self._write_manifest(manifest)
+
+        logger.info(f"Exported {len(ids)} vectors of collection {collection_name} as {self.dtype} to {self.directory}")
+        return len(ids)
+
+    def invalidate_collection(self, collection_name: str) -> int:
+        """
+        Remove os exports da collection em todos os dtypes. Chamado quando a
+        collection muda na ingestão: um upsert pode alterar vetores sem mudar a
+        contagem, então o export antigo não seria reconhecido como desatualizado
+        no load(). Retorna quantos exports foram removidos.
+        """
+        manifest = self._read_manifest()
+        entries = manifest.get("collections", {})
+        removed = sum(entries.pop(f"{collection_name}.{dtype}", None) is not None for dtype in SUPPORTED_DTYPES)
+        # The manifest goes first: without an entry the files are never trusted again
+        if removed:
+            self._write_manifest(manifest)
+        for dtype in SUPPORTED_DTYPES:
+            prefix = os.path.join(self.directory, f"{collection_name}.{dtype}")
+            for suffix in (".vectors.npy", ".scales.npy", ".ids.json"):
+                try:
+                    os.remove(f"{prefix}{suffix}")
+                except FileNotFoundError:
+                    pass
+        if removed:
+            logger.info(f"Removed {removed} stale exact index exports of collection {collection_name}")
+        return removed
+
+    def has_export(self, collection_name: str, count: int, manifest: Optional[Dict[str, Any]] = None) -> bool:
+        """True se já existe export desta collection com a contagem informada"""
+        if manifest is None:
+            manifest = self._read_manifest().get("collections", {})
+        entry = manifest.get(f"{collection_name}.{self.dtype}")
+        return entry is not None and entry.get("count") == count and os.path.exists(self._paths(collection_name)["vectors"])
+
+    def load(self, collections: Dict[str, Any], collection_names: Optional[List[str]] = None):
+        """
+        Mapeia os arquivos das collections pedidas (todas por padrão). Uma
+        collection cujo export não existe ou cuja contagem difere da do Chroma
+        é reexportada antes.
+        """
+        start_time = time.time()
+        manifest = self._read_manifest().get("collections", {})
+        for name in collection_names or list(collections):
+            collection = collections.get(name)
+            if not collection:
+                continue
+            paths = self._paths(name)
+            if not self.has_export(name, collection.count(), manifest):
+                logger.info(f"Exact index for {name} is missing or stale; exporting it from Chroma")
+                self.export_collection(name, collection)
+
+            self.matrices[name] = np.load(paths["vectors"], mmap_mode="r")
+            self.scales[name] = np.load(paths["scales"]) if self.dtype == "int8" else None
+            with open(paths["ids"], "r", encoding="utf-8") as f:
+                self.ids[name] = object_array(json.load(f))
+
+        self.is_loaded = True
+        self.load_time = time.time() - start_time
+        logger.info(
+            f"Exact index loaded: {len(self)} vectors from {len(self.matrices)} collections "
+            f"({self.dtype}, {self.memory_bytes() / 1e6:.1f} MB mapped) in {self.load_time:.2f}s"
+        )
+
+    def memory_bytes(self) -> int:
+        return sum(matrix.nbytes for matrix in self.matrices.values()) + sum(
+            scales.nbytes for scales in self.scales.values() if scales is not None
+        )
+
+    def vectors(self, collection_name: str, rows: np.ndarray) -> np.ndarray:
+        """Vetores float32 (desquantizados) das linhas pedidas."""
+        vectors = np.asarray(self.matrices[collection_name][rows], dtype=np.float32)
+        scales = self.scales[collection_name]
+        if scales is not None:
+            vectors *= scales[rows][:, None]
+        return vectors
+
+    def similarities(self, collection_name: str, queries: np.ndarray) -> np.ndarray:
+        """Similaridade de cosseno (documentos, queries), calculada em blocos de block_rows linhas."""
+        matrix = self.matrices[collection_name]
+        scales = self.scales[collection_name]
+        scores = np.empty((matrix.shape[0], queries.shape[1]), dtype=np.float32)
+        for start in range(0, matrix.shape[0], self.block_rows):
+            stop = min(start + self.block_rows, matrix.shape[0])
+            np.matmul(matrix[start:stop].astype(np.float32), queries, out=scores[start:stop])
+            if scales is not None:
+                scores[start:stop] *= scales[start:stop, None]
+        return scores
+
+    def _result_set(self, name: str, rows: np.ndarray, scores: np.ndarray) -> ResultSet:
+        return ResultSet.from_hits(
+            name,
+            ids=self.ids[name][rows],
+            documents=None,
+            metadatas=None,
+            distances=(1.0 - scores).astype(np.float32),
+            embeddings=self.vectors(name, rows)
+        )
+
+    @staticmethod
+    def _normalized_queries(query_embeddings: List[List[float]]) -> np.ndarray:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray((queries / norms).T)
+
+    def search_batch(self,
+                     query_embeddings: List[List[float]],
+                     top_k_per_collection: Union[int, Dict[str, int]],
+                     collection_names: Optional[List[str]] = None) -> List[Dict[str, ResultSet]]:
+        """
+        Top-k exato de cada collection para cada query, na mesma escala de
+        distância de cosseno do Chroma. Retorna um results_by_collection por
+        query, só com as collections presentes no índice.
+        """
+        batch_size = len(query_embeddings)
+        batch_results: List[Dict[str, ResultSet]] = [{} for _ in range(batch_size)]
+        if not self.is_loaded or not batch_size:
+            return batch_results
+
+        queries = self._normalized_queries(query_embeddings)
+        for name in collection_names or list(self.matrices):
+            if name not in self.matrices:
+                continue
+            depth = top_k_per_collection[name] if isinstance(top_k_per_collection, dict) else top_k_per_collection
+            k = min(depth, self.matrices[name].shape[0])
+            if k <= 0:
+                for results in batch_results:
+                    results[name] = ResultSet.empty()
+                continue
+
+            scores = self.similarities(name, queries)
+            if k < scores.shape[0]:
+                top = np.argpartition(-scores, k - 1, axis=0)[:k]
+            else:
+                top = np.tile(np.arange(scores.shape[0])[:, None], (1, batch_size))
+            top_scores = np.take_along_axis(scores, top, axis=0)
+            order = np.argsort(-top_scores, axis=0, kind="stable")
+            top = np.take_along_axis(top, order, axis=0)
+            top_scores = np.take_along_axis(top_scores, order, axis=0)
+
+            for q in range(batch_size):
+                batch_results[q][name] = self._result_set(name, top[:, q], top_scores[:, q])
+        return batch_results
+
+    def search(self,
+               query_embedding: List[float],
+               top_k_per_collection: Union[int, Dict[str, int]],
+               collection_names: Optional[List[str]] = None) -> Dict[str, ResultSet]:
+        return self.search_batch([query_embedding], top_k_per_collection, collection_names)[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "dtype": self.dtype,
+            "vectors": len(self),
+            "collections": {name: len(ids) for name, ids in self.ids.items()},
+            "mapped_mb": round(self.memory_bytes() / 1e6, 2),
+            "load_time": round(self.load_time, 3)
+        }
+
+
+def compare_with_chroma(index: ExactVectorIndex, collections: Dict[str, Any], query_embeddings: List[List[float]],
+                        k: int = 10) -> Dict[str, Dict[str, Any]]:
+    """
+    Recall@k e latência do índice exato e do HNSW do Chroma, por collection.
+
+    A referência é a força bruta em float32 sobre os embeddings guardados no
+    Chroma; recall = fração dos k vizinhos verdadeiros devolvidos pela engine.
+    Latências são por query (uma chamada por query, como na busca online).
+    """
+    queries = ExactVectorIndex._normalized_queries(query_embeddings)
+    report = {}
+    for name in index.matrices:
+        collection = collections.get(name)
+        if not collection:
+            continue
+        reference, ids = _read_normalized_embeddings(collection)
+        if not reference.size:
+            continue
+        reference_ids = np.asarray(ids, dtype=object)
+        depth = min(k, len(reference_ids))
+        truth = np.argsort(-(reference @ queries), axis=0, kind="stable")[:depth]
+
+        engine_hits = {"exact": [], "chroma": []}
+        latencies_ms = {"exact": [], "chroma": []}
+        for q, query_embedding in enumerate(query_embeddings):
+            start = time.perf_counter()
+            exact = index.search(query_embedding, depth, [name])[name]
+            latencies_ms["exact"].append((time.perf_counter() - start) * 1000.0)
+            engine_hits["exact"].append(set(exact.ids))
+
+            start = time.perf_counter()
+            chroma = collection.query(query_embeddings=[query_embedding], n_results=depth, include=["distances"])
+            latencies_ms["chroma"].append((time.perf_counter() - start) * 1000.0)
+            engine_hits["chroma"].append(set(chroma["ids"][0]))
+
+        true_sets = [set(reference_ids[truth[:, q]]) for q in range(len(query_embeddings))]
+        report[name] = {"vectors": len(reference_ids), "k": depth}
+        for engine in ("exact", "chroma"):
+            recalls = [len(hits & true_ids) / len(true_ids) for hits, true_ids in zip(engine_hits[engine], true_sets) if true_ids]
+            latencies = np.array(latencies_ms[engine])
+            report[name][engine] = {
+                "recall": round(float(np.mean(recalls)), 4) if recalls else None,
+                "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+                "latency_ms_p95": round(float(np.percentile(latencies, 95)), 3)
+            }
+    return report
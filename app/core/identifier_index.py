@@ -0,0 +1,171 @@
+# app/core/identifier_index.py
+import json
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config import setup_logging
+
+logger = setup_logging(__name__, "logs/identifier_index.log")
+
+IDENTIFIER_INDEX_VERSION = 1
+IDENTIFIER_FIELDS = ("title", "function_name", "enum_name")
+
+
+def normalize_for_identifier_match(text: str) -> str:
+    """Mesmo formato usado no boost de título: minúsculas e espaços trocados por underscore."""
+    return text.lower().replace(" ", "_")
+
+
+class AhoCorasickAutomaton:
+    """Autômato de Aho-Corasick: encontra todas as palavras-chave de um texto em uma única passada."""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]
+
+    def add(self, keyword: str):
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(keyword)
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Produz (posição_final_exclusiva, palavra) para cada ocorrência."""
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for keyword in self.output[state]:
+                yield position + 1, keyword
+
+
+class IdentifierIndex:
+    """
+    Índice de identificadores (títulos, nomes de funções e de enums) -> ids dos chunks.
+
+    O mapa é construído na ingestão e persistido em JSON; o autômato é montado
+    ao carregar. Uma ocorrência só conta quando não está colada a outros
+    caracteres alfanuméricos, então "cargo_busca" não casa dentro de
+    "cargo_buscatodos".
+    """
+
+    def __init__(self, min_length: int = 4):
+        self.min_length = min_length
+        self.entries: Dict[str, Dict[str, List[str]]] = {}
+        self.automaton: Optional[AhoCorasickAutomaton] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, identifier: str, collection_name: str, doc_id: str):
+        key = normalize_for_identifier_match(identifier or "")
+        if len(key) < self.min_length:
+            return
+        doc_ids = self.entries.setdefault(key, {}).setdefault(collection_name, [])
+        if doc_id not in doc_ids:
+            doc_ids.append(doc_id)
+
+    def build(self):
+        automaton = AhoCorasickAutomaton()
+        for identifier in self.entries:
+            automaton.add(identifier)
+        automaton.build()
+        self.automaton = automaton
+
+    def _iter_boundary_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        if self.automaton is None:
+            return
+        for end, identifier in self.automaton.iter_matches(text):
+            start = end - len(identifier)
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            if end < len(text) and text[end].isalnum():
+                continue
+            yield start, end, identifier
+
+    def find(self, query: str) -> List[str]:
+        """Retorna os identificadores citados na query, na ordem em que aparecem."""
+        matches, seen = [], set()
+        for _, _, identifier in self._iter_boundary_matches(normalize_for_identifier_match(query)):
+            if identifier not in seen:
+                seen.add(identifier)
+                matches.append(identifier)
+        return matches
+
+    def match_spans(self, query: str) -> List[Tuple[int, int]]:
+        """Intervalos [início, fim) da query normalizada cobertos por identificadores."""
+        return [(start, end) for start, end, _ in self._iter_boundary_matches(normalize_for_identifier_match(query))]
+
+    def lookup(self, identifiers: List[str]) -> Dict[str, List[str]]:
+        """Agrupa por collection os ids dos chunks dos identificadores informados."""
+        ids_by_collection: Dict[str, List[str]] = {}
+        for identifier in identifiers:
+            for collection_name, doc_ids in self.entries.get(identifier, {}).items():
+                bucket = ids_by_collection.setdefault(collection_name, [])
+                bucket.extend(doc_id for doc_id in doc_ids if doc_id not in bucket)
+        return ids_by_collection
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": IDENTIFIER_INDEX_VERSION, "min_length": self.min_length, "entries": self.entries},
+                f, ensure_ascii=False, separators=(",", ":")
+            )
+        Path(tmp_path).replace(path)
+        logger.info(f"Identifier index saved to {path}: {len(self.entries)} identifiers")
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IdentifierIndex"]:
+        if not Path(path).exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != IDENTIFIER_INDEX_VERSION:
+            logger.warning(f"Ignoring identifier index at {path}: unsupported version {payload.get('version')}")
+            return None
+        index = cls(min_length=payload.get("min_length", 4))
+        index.entries = payload["entries"]
+        index.build()
+        return index
+
+    @classmethod
+    def build_from_collections(cls, collections: Dict[str, Any], page_size: int = 1000) -> "IdentifierIndex":
+        """Constrói o índice a partir dos metadados atuais das collections do Chroma."""
+        start_time = time.time()
+        index = cls()
+        for collection_name, collection in collections.items():
+            count = collection.count()
+            for offset in range(0, count, page_size):
+                page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+                metadatas = page.get("metadatas") or [{}] * len(page["ids"])
+                for doc_id, metadata in zip(page["ids"], metadatas):
+                    for field in IDENTIFIER_FIELDS:
+                        index.add((metadata or {}).get(field, ""), collection_name, doc_id)
+        index.build()
+        logger.info(f"Identifier index built with {len(index)} identifiers in {time.time() - start_time:.2f}s")
+        return index
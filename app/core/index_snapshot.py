@@ -0,0 +1,314 @@
+# app/core/index_snapshot.py
+"""
+Snapshots do índice: o diretório chroma_db (collections, índices léxico e de
+identificadores, exports do motor exato e manifestos de ingestão) é copiado
+para snapshots/<versão>/, com um manifesto de tamanho e SHA-256 de cada
+arquivo. A versão é o horário UTC do build seguido do hash do conteúdo, então
+a ordem alfabética é a cronológica e duas réplicas com a mesma versão servem
+os mesmos bytes. Com --pack o snapshot vira snapshots/<versão>.tar.gz, que o
+servidor descompacta na primeira vez que o usa.
+
+Na subida, o servidor pega o snapshot válido mais recente (checksums
+conferidos) e o copia para chroma_db: o Chroma escreve no diretório que abre,
+então o snapshot em si nunca é servido diretamente e continua imutável.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tarfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    setup_logging,
+    INDEX_SNAPSHOT_DIR,
+    INDEX_SNAPSHOT_MANIFEST_FILENAME,
+    INDEX_SNAPSHOT_VERIFY_CHECKSUMS,
+    INDEX_SNAPSHOT_KEEP,
+    INGEST_MANIFEST_DIRNAME,
+)
+
+logger = setup_logging(__name__, "logs/index_snapshot.log")
+
+SNAPSHOT_FORMAT_VERSION = 1
+ARCHIVE_SUFFIX = ".tar.gz"
+
+
+def _file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _describe_tree(root: Path) -> Dict[str, Dict[str, Any]]:
+    """Caminho relativo -> tamanho e SHA-256 de cada arquivo (fora o próprio manifesto do snapshot)"""
+    files = {}
+    for path in sorted(root.rglob("*")):
+        if not path.is_file():
+            continue
+        relative_path = path.relative_to(root).as_posix()
+        if relative_path == INDEX_SNAPSHOT_MANIFEST_FILENAME:
+            continue
+        files[relative_path] = {"size": path.stat().st_size, "sha256": _file_sha256(path)}
+    return files
+
+
+def _tree_digest(files: Dict[str, Dict[str, Any]]) -> str:
+    digest = hashlib.sha256()
+    for relative_path, entry in sorted(files.items()):
+        digest.update(f"{relative_path}\0{entry['size']}\0{entry['sha256']}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _collections_summary(chroma_path: Path) -> Dict[str, Dict[str, Any]]:
+    """Documentos e modelo de embeddings de cada collection, lidos dos manifestos de ingestão"""
+    summary = {}
+    for manifest_path in sorted((chroma_path / INGEST_MANIFEST_DIRNAME).glob("*.json")):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summary[manifest_path.stem] = {
+            "documents": len(payload.get("entries", {})),
+            "embedding_model": payload.get("embedding_model", "")
+        }
+    return summary
+
+
+def _make_read_only(root: Path):
+    for path in root.rglob("*"):
+        if path.is_file():
+            path.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+
+def read_snapshot_manifest(snapshot_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(snapshot_path, INDEX_SNAPSHOT_MANIFEST_FILENAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def build_snapshot(chroma_path: str = "./chroma_db", snapshot_dir: str = INDEX_SNAPSHOT_DIR,
+                   pack: bool = False, keep: int = INDEX_SNAPSHOT_KEEP) -> str:
+    """
+    Grava um snapshot imutável de chroma_path em snapshot_dir e retorna seu
+    caminho (diretório, ou arquivo .tar.gz com pack=True). Os checksums são
+    calculados sobre a cópia, não sobre o diretório de origem.
+    """
+    source = Path(chroma_path)
+    if not (source / "chroma.sqlite3").exists():
+        raise FileNotFoundError(f"No Chroma database found at {chroma_path}")
+    start_time = time.time()
+    destination = Path(snapshot_dir)
+    destination.mkdir(parents=True, exist_ok=True)
+
+    staging = destination / f".build.{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.copytree(source, staging, ignore=shutil.ignore_patterns(INDEX_SNAPSHOT_MANIFEST_FILENAME, "*.tmp*"))
+
+    files = _describe_tree(staging)
+    content_digest = _tree_digest(files)
+    # Conteúdo igual ao do snapshot mais novo: não cria uma versão nova
+    latest = next(iter(list_snapshots(snapshot_dir)), None)
+    if latest is not None and latest.endswith(f"-{content_digest[:12]}"):
+        _remove_tree(staging)
+        existing = destination / latest
+        if not existing.is_dir():
+            existing = destination / f"{latest}{ARCHIVE_SUFFIX}"
+        logger.info(f"{chroma_path} is unchanged since snapshot {latest}; not building a new one")
+        return str(existing)
+    version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{content_digest[:12]}"
+    manifest = {
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "version": version,
+        "created_at": time.time(),
+        "content_digest": content_digest,
+        "total_bytes": sum(entry["size"] for entry in files.values()),
+        "collections": _collections_summary(staging),
+        "files": files
+    }
+    with open(staging / INDEX_SNAPSHOT_MANIFEST_FILENAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    _make_read_only(staging)
+
+    if pack:
+        snapshot_path = destination / f"{version}{ARCHIVE_SUFFIX}"
+        temporary_archive = destination / f".{version}{ARCHIVE_SUFFIX}.tmp"
+        with tarfile.open(temporary_archive, "w:gz") as archive:
+            archive.add(staging, arcname=version)
+        temporary_archive.replace(snapshot_path)
+        _remove_tree(staging)
+    else:
+        snapshot_path = destination / version
+        staging.rename(snapshot_path)
+
+    logger.info(
+        f"Snapshot {version} built from {chroma_path} in {time.time() - start_time:.2f}s: "
+        f"{len(files)} files, {manifest['total_bytes'] / 1e6:.1f} MB -> {snapshot_path}"
+    )
+    if keep > 0:
+        prune_snapshots(snapshot_dir, keep)
+    return str(snapshot_path)
+
+
+def _remove_tree(path: Path):
+    # Os arquivos do snapshot são somente leitura; o diretório não, então podem ser removidos
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def list_snapshots(snapshot_dir: str = INDEX_SNAPSHOT_DIR) -> List[str]:
+    """Versões disponíveis (diretórios e arquivos compactados), da mais nova para a mais antiga"""
+    directory = Path(snapshot_dir)
+    if not directory.is_dir():
+        return []
+    versions = set()
+    for path in directory.iterdir():
+        if path.name.startswith("."):
+            continue
+        if path.is_dir():
+            versions.add(path.name)
+        elif path.name.endswith(ARCHIVE_SUFFIX):
+            versions.add(path.name[:-len(ARCHIVE_SUFFIX)])
+    return sorted(versions, reverse=True)
+
+
+def prune_snapshots(snapshot_dir: str = INDEX_SNAPSHOT_DIR, keep: int = INDEX_SNAPSHOT_KEEP) -> List[str]:
+    """Remove as versões além das keep mais novas e retorna as removidas"""
+    removed = list_snapshots(snapshot_dir)[keep:]
+    for version in removed:
+        _remove_tree(Path(snapshot_dir) / version)
+        Path(snapshot_dir, f"{version}{ARCHIVE_SUFFIX}").unlink(missing_ok=True)
+        logger.info(f"Pruned snapshot {version}")
+    return removed
+
+
+def verify_snapshot(snapshot_path: str, checksums: bool = INDEX_SNAPSHOT_VERIFY_CHECKSUMS) -> bool:
+    """Confere presença, tamanho e (com checksums=True) SHA-256 de cada arquivo do manifesto"""
+    manifest = read_snapshot_manifest(snapshot_path)
+    if manifest is None:
+        logger.warning(f"Snapshot at {snapshot_path} has no readable manifest")
+        return False
+    root = Path(snapshot_path)
+    for relative_path, entry in manifest.get("files", {}).items():
+        path = root / relative_path
+        if not path.is_file() or path.stat().st_size != entry["size"]:
+            logger.warning(f"Snapshot {manifest['version']}: {relative_path} is missing or has the wrong size")
+            return False
+        if checksums and _file_sha256(path) != entry["sha256"]:
+            logger.warning(f"Snapshot {manifest['version']}: checksum mismatch for {relative_path}")
+            return False
+    return True
+
+
+def _unpack_snapshot(archive_path: Path, snapshot_dir: Path, version: str) -> Path:
+    staging = snapshot_dir / f".unpack.{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    with tarfile.open(archive_path, "r:gz") as archive:
+        archive.extractall(staging, filter="data")
+    unpacked = staging / version
+    if not unpacked.is_dir():
+        _remove_tree(staging)
+        raise ValueError(f"Archive {archive_path} does not contain snapshot {version}")
+    target = snapshot_dir / version
+    unpacked.rename(target)
+    _remove_tree(staging)
+    logger.info(f"Unpacked snapshot {version} from {archive_path}")
+    return target
+
+
+def find_latest_snapshot(snapshot_dir: str = INDEX_SNAPSHOT_DIR,
+                         checksums: bool = INDEX_SNAPSHOT_VERIFY_CHECKSUMS) -> Optional[str]:
+    """Caminho do snapshot válido mais recente (descompactando-o se preciso), ou None"""
+    directory = Path(snapshot_dir)
+    for version in list_snapshots(snapshot_dir):
+        snapshot_path = directory / version
+        try:
+            if not snapshot_path.is_dir():
+                snapshot_path = _unpack_snapshot(directory / f"{version}{ARCHIVE_SUFFIX}", directory, version)
+        except (OSError, tarfile.TarError, ValueError) as e:
+            logger.warning(f"Skipping snapshot {version}: could not unpack it: {e}")
+            continue
+        if verify_snapshot(str(snapshot_path), checksums=checksums):
+            return str(snapshot_path)
+        logger.warning(f"Skipping invalid snapshot {version}")
+    return None
+
+
+def activate_snapshot(snapshot_path: str, chroma_path: str = "./chroma_db") -> Dict[str, Any]:
+    """
+    Copia o snapshot para chroma_path (cópia gravável, trocada de uma vez).
+    Se chroma_path já veio desta mesma versão, é reutilizado sem copiar.
+    """
+    manifest = read_snapshot_manifest(snapshot_path)
+    if manifest is None:
+        raise ValueError(f"Snapshot at {snapshot_path} has no readable manifest")
+    active = read_snapshot_manifest(chroma_path)
+    if active is not None and active.get("version") == manifest["version"]:
+        logger.info(f"{chroma_path} already holds snapshot {manifest['version']}")
+        return manifest
+
+    target = Path(chroma_path)
+    staging = target.with_name(f"{target.name}.activating.{os.getpid()}")
+    previous = target.with_name(f"{target.name}.previous.{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    # copyfile não leva as permissões: a cópia ativa é gravável, como o Chroma exige
+    shutil.copytree(snapshot_path, staging, copy_function=shutil.copyfile)
+    if target.exists():
+        target.rename(previous)
+    staging.rename(target)
+    shutil.rmtree(previous, ignore_errors=True)
+    logger.info(f"Activated snapshot {manifest['version']} into {chroma_path}")
+    return manifest
+
+
+def restore_latest_snapshot(chroma_path: str = "./chroma_db", snapshot_dir: str = INDEX_SNAPSHOT_DIR,
+                            checksums: bool = INDEX_SNAPSHOT_VERIFY_CHECKSUMS) -> Optional[Dict[str, Any]]:
+    """Ativa o snapshot válido mais recente em chroma_path; retorna seu manifesto, ou None se não houver"""
+    start_time = time.time()
+    snapshot_path = find_latest_snapshot(snapshot_dir, checksums=checksums)
+    if snapshot_path is None:
+        logger.info(f"No valid snapshot found in {snapshot_dir}")
+        return None
+    manifest = activate_snapshot(snapshot_path, chroma_path)
+    logger.info(f"Snapshot {manifest['version']} ready in {time.time() - start_time:.2f}s")
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build, list and restore versioned index snapshots")
+    parser.add_argument("command", choices=["build", "list", "verify", "restore"])
+    parser.add_argument("--chroma-path", default="./chroma_db")
+    parser.add_argument("--snapshot-dir", default=INDEX_SNAPSHOT_DIR)
+    parser.add_argument("--ingest", action="store_true", help="Run the (incremental) ingest before building")
+    parser.add_argument("--pack", action="store_true", help="Write the snapshot as a .tar.gz archive")
+    parser.add_argument("--keep", type=int, default=INDEX_SNAPSHOT_KEEP, help="Snapshots to keep after building (0 = all)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.ingest:
+            from .initialize_chroma_db import initialize_chroma_db
+            initialize_chroma_db(chroma_path=args.chroma_path)
+        print(build_snapshot(args.chroma_path, args.snapshot_dir, pack=args.pack, keep=args.keep))
+    elif args.command == "list":
+        for version in list_snapshots(args.snapshot_dir):
+            print(version)
+    elif args.command == "verify":
+        snapshot_path = find_latest_snapshot(args.snapshot_dir, checksums=True)
+        print(snapshot_path or "No valid snapshot")
+    else:
+        manifest = restore_latest_snapshot(args.chroma_path, args.snapshot_dir)
+        print(manifest["version"] if manifest else "No valid snapshot")
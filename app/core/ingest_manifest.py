@@ -0,0 +1,154 @@
+# app/core/ingest_manifest.py
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from .config import INDEX_SNAPSHOT_MANIFEST_FILENAME, INGEST_MANIFEST_DIRNAME, setup_logging
+
+logger = setup_logging(__name__, "logs/ingest_manifest.log")
+
+INGEST_MANIFEST_VERSION = 1
+
+# Metadados que mudam a cada execução sem que o chunk tenha mudado
+VOLATILE_METADATA_KEYS = frozenset({"processing_timestamp"})
+
+
+def content_digest(content: str) -> str:
+    """SHA-256 do conteúdo (o mesmo hash do ContentDeduplicator)"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def metadata_digest(metadata: Dict[str, Any]) -> str:
+    stable = {key: value for key, value in metadata.items() if key not in VOLATILE_METADATA_KEYS}
+    return hashlib.sha256(json.dumps(stable, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def embedding_digest(embedding: Union[List[float], np.ndarray]) -> str:
+    return hashlib.sha256(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+
+def content_set_digest(content_hashes: Iterable[str]) -> str:
+    """Hash de um conjunto de hashes de conteúdo, independente da ordem"""
+    return hashlib.sha256("".join(sorted(content_hashes)).encode('ascii')).hexdigest()
+
+
+def source_fingerprint(file_path: str) -> Dict[str, int]:
+    """Tamanho e mtime do arquivo de origem: se não mudaram, o arquivo nem precisa ser lido"""
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def index_version(chroma_path: str) -> str:
+    """
+    Versão do conteúdo indexado em chroma_path, derivada só de stat(): toda
+    ingestão que muda uma collection regrava o manifesto dela, e ativar um
+    snapshot troca o diretório inteiro. Qualquer processo que escreva no
+    índice (ingestão incremental, index_snapshot build --ingest) muda a versão.
+    """
+    parts = []
+    manifest_directory = Path(chroma_path, INGEST_MANIFEST_DIRNAME)
+    candidates = sorted(manifest_directory.glob("*.json")) + [Path(chroma_path, INDEX_SNAPSHOT_MANIFEST_FILENAME)]
+    for path in candidates:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        parts.append(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """
+    Estado da última ingestão de uma collection: doc_id -> [hash do conteúdo,
+    hash dos metadados, hash do embedding], mais a impressão digital do
+    arquivo de origem, o modelo de embeddings usado e o hash dos conteúdos
+    que as collections anteriores já tinham (a deduplicação é global, então
+    um chunk descartado aqui pode voltar quando sai de outra collection).
+
+    Comparar a execução atual com o manifesto diz o que inserir, o que
+    sobrescrever (upsert) e o que apagar sem ler a collection do Chroma. O
+    manifesto só vale enquanto o número de entradas bate com o count() da
+    collection; caso contrário (collection apagada ou alterada por fora) ele
+    é descartado e a ingestão reescreve tudo uma vez.
+    """
+
+    def __init__(self, collection_name: str, source: Optional[Dict[str, int]] = None,
+                 embedding_model: str = "", reembed: bool = False, dedup_context: str = ""):
+        self.collection_name = collection_name
+        self.source = source or {}
+        self.embedding_model = embedding_model
+        self.reembed = reembed
+        self.dedup_context = dedup_context
+        self.entries: Dict[str, List[str]] = {}
+        self.updated_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.entries
+
+    @staticmethod
+    def path_for(directory: str, collection_name: str) -> str:
+        return os.path.join(directory, f"{collection_name}.json")
+
+    @staticmethod
+    def entry_digests(content: str, metadata: Dict[str, Any],
+                      embedding: Union[List[float], np.ndarray]) -> List[str]:
+        return [content_digest(content), metadata_digest(metadata), embedding_digest(embedding)]
+
+    def matches_source(self, source: Dict[str, int], embedding_model: str, reembed: bool, dedup_context: str) -> bool:
+        """True quando arquivo de origem, pipeline de embeddings e deduplicação são os mesmos da última ingestão"""
+        return (self.source == source and self.embedding_model == embedding_model
+                and self.reembed == reembed and self.dedup_context == dedup_context)
+
+    def content_digests(self) -> Iterable[str]:
+        return (digests[0] for digests in self.entries.values())
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.updated_at = time.time()
+        payload = {
+            "version": INGEST_MANIFEST_VERSION,
+            "collection": self.collection_name,
+            "source": self.source,
+            "embedding_model": self.embedding_model,
+            "reembed": self.reembed,
+            "dedup_context": self.dedup_context,
+            "updated_at": self.updated_at,
+            "entries": self.entries
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        Path(tmp_path).replace(path)
+        logger.info(f"Ingest manifest saved to {path}: {len(self.entries)} documents")
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IngestManifest"]:
+        if not Path(path).exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable ingest manifest at {path}: {e}")
+            return None
+        if payload.get("version") != INGEST_MANIFEST_VERSION:
+            logger.warning(f"Ignoring ingest manifest at {path}: unsupported version {payload.get('version')}")
+            return None
+        manifest = cls(
+            payload.get("collection", ""),
+            source=payload.get("source"),
+            embedding_model=payload.get("embedding_model", ""),
+            reembed=payload.get("reembed", False),
+            dedup_context=payload.get("dedup_context", "")
+        )
+        manifest.entries = payload.get("entries", {})
+        manifest.updated_at = payload.get("updated_at", 0.0)
+        return manifest
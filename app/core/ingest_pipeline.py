@@ -0,0 +1,194 @@
+# app/core/ingest_pipeline.py
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .config import setup_logging
+
+logger = setup_logging(__name__, "logs/ingest_pipeline.log")
+
+_END = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    blocks: int = 0
+    busy_seconds: float = 0.0
+    input_wait_seconds: float = 0.0
+    output_wait_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "blocks": self.blocks,
+            "busy_s": round(self.busy_seconds, 4),
+            "input_wait_s": round(self.input_wait_seconds, 4),
+            "output_wait_s": round(self.output_wait_seconds, 4),
+            "items_per_s": round(self.items / self.busy_seconds, 1) if self.busy_seconds > 0 else 0.0
+        }
+
+
+class StagedPipeline:
+    """
+    Pipeline de ingestão de uma collection em três estágios, cada um na sua thread:
+    parse (lê o arquivo e monta os candidatos, em blocos de block_size),
+    validate (embeddings, validação/normalização e hashes do bloco) e write
+    (gravação no Chroma). Os estágios se ligam por filas de no máximo
+    queue_blocks blocos, então um estágio rápido espera o lento em vez de
+    acumular o arquivo inteiro em memória.
+
+    Para cada estágio ficam o tempo ocupado (busy), a espera por entrada e a
+    espera por espaço na fila de saída: o gargalo é o estágio com maior busy,
+    e os outros aparecem esperando por ele.
+    """
+
+    STAGES = ("parse", "validate", "write")
+
+    def __init__(self, name: str, block_size: int = 256, queue_blocks: int = 4):
+        self.name = name
+        self.block_size = block_size
+        self.queue_blocks = queue_blocks
+        self.stats = {stage: StageStats(stage) for stage in self.STAGES}
+        self.elapsed = 0.0
+        self._failed = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._error_lock = threading.Lock()
+
+    def _fail(self, error: BaseException):
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+        self._failed.set()
+
+    def _put(self, output: "queue.Queue", item: Any, stats: StageStats):
+        start = time.perf_counter()
+        # Com um estágio falho ninguém mais consome a fila: desiste em vez de bloquear
+        while not self._failed.is_set():
+            try:
+                output.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.output_wait_seconds += time.perf_counter() - start
+
+    def _get(self, input_queue: "queue.Queue", stats: StageStats) -> Any:
+        start = time.perf_counter()
+        while True:
+            try:
+                item = input_queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self._failed.is_set():
+                    item = _END
+                    break
+        stats.input_wait_seconds += time.perf_counter() - start
+        return item
+
+    def _parse(self, source: Iterable[Any], output: "queue.Queue"):
+        stats = self.stats["parse"]
+        try:
+            iterator = iter(source)
+            block: List[Any] = []
+            while not self._failed.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    stats.busy_seconds += time.perf_counter() - start
+                    break
+                stats.busy_seconds += time.perf_counter() - start
+                block.append(item)
+                if len(block) >= self.block_size:
+                    stats.items += len(block)
+                    stats.blocks += 1
+                    self._put(output, block, stats)
+                    block = []
+            if block:
+                stats.items += len(block)
+                stats.blocks += 1
+                self._put(output, block, stats)
+        except Exception as e:
+            logger.error(f"[{self.name}] parse stage failed: {e}")
+            self._fail(e)
+        finally:
+            self._put(output, _END, stats)
+
+    def _transform(self, transform: Callable[[List[Any]], List[Any]], input_queue: "queue.Queue", output: "queue.Queue"):
+        stats = self.stats["validate"]
+        try:
+            while True:
+                block = self._get(input_queue, stats)
+                if block is _END:
+                    break
+                start = time.perf_counter()
+                result = transform(block)
+                stats.busy_seconds += time.perf_counter() - start
+                stats.items += len(result)
+                stats.blocks += 1
+                if result:
+                    self._put(output, result, stats)
+        except Exception as e:
+            logger.error(f"[{self.name}] validate stage failed: {e}")
+            self._fail(e)
+        finally:
+            self._put(output, _END, stats)
+
+    def _write(self, sink: Callable[[List[Any]], None], input_queue: "queue.Queue"):
+        stats = self.stats["write"]
+        try:
+            while True:
+                block = self._get(input_queue, stats)
+                if block is _END:
+                    break
+                start = time.perf_counter()
+                sink(block)
+                stats.busy_seconds += time.perf_counter() - start
+                stats.items += len(block)
+                stats.blocks += 1
+        except Exception as e:
+            logger.error(f"[{self.name}] write stage failed: {e}")
+            self._fail(e)
+
+    def run(self, source: Iterable[Any], transform: Callable[[List[Any]], List[Any]],
+            sink: Callable[[List[Any]], None]) -> Dict[str, Any]:
+        """Executa os três estágios até o fim da fonte; a primeira exceção de qualquer estágio é relançada"""
+        start_time = time.perf_counter()
+        parsed: "queue.Queue" = queue.Queue(maxsize=self.queue_blocks)
+        validated: "queue.Queue" = queue.Queue(maxsize=self.queue_blocks)
+        threads = [
+            threading.Thread(target=self._parse, args=(source, parsed), name=f"ingest-{self.name}-parse", daemon=True),
+            threading.Thread(target=self._transform, args=(transform, parsed, validated),
+                             name=f"ingest-{self.name}-validate", daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+        self._write(sink, validated)
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - start_time
+        if self._error is not None:
+            raise self._error
+        return self.get_stats()
+
+    def bottleneck(self) -> str:
+        return max(self.stats.values(), key=lambda stats: stats.busy_seconds).name
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "elapsed_s": round(self.elapsed, 4),
+            "bottleneck": self.bottleneck(),
+            "stages": {name: stats.as_dict() for name, stats in self.stats.items()}
+        }
+
+    def summary(self) -> str:
+        stages = " | ".join(
+            f"{name} {stats.items} items, {stats.as_dict()['items_per_s']}/s busy "
+            f"({stats.busy_seconds:.2f}s busy, {stats.input_wait_seconds:.2f}s waiting input, "
+            f"{stats.output_wait_seconds:.2f}s blocked on output)"
+            for name, stats in self.stats.items()
+        )
+        return f"{self.name} pipeline in {self.elapsed:.2f}s, bottleneck {self.bottleneck()}: {stages}"
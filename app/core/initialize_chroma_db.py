@@ -7,14 +7,32 @@ from pathlib import Path
 from tqdm import tqdm
 import logging
 import ijson
-from typing import List, Dict, Any, Optional, Set, Generator, Tuple
+from typing import List, Dict, Any, Optional, Set, Generator, Tuple, Iterator, Iterable, Sequence, Union
 import uuid
 import hashlib
+import threading
 import time
 import numpy as np
-from .config import setup_logging, is_dev_mode, log_debug, log_function_call, log_function_return
+from .config import (
+    setup_logging, is_dev_mode, log_debug, log_function_call, log_function_return,
+    LEXICAL_INDEX_FILENAME, IDENTIFIER_INDEX_FILENAME, INGEST_REEMBED, EMBEDDING_DIMENSIONS,
+    INGEST_MANIFEST_DIRNAME, INGEST_DELETE_BATCH_SIZE, INGEST_VALIDATION_BATCH_SIZE,
+    INGEST_PARALLEL_COLLECTIONS, INGEST_PIPELINE_QUEUE_BLOCKS,
+    INGEST_WRITE_BATCH_SIZE, INGEST_WRITE_BATCH_MIN, INGEST_WRITE_BATCH_MAX, INGEST_WRITE_BATCH_TOLERANCE,
+    INDEX_SNAPSHOT_MANIFEST_FILENAME,
+    SEARCH_ENGINE, EXACT_INDEX_DIRNAME, SEARCH_EXACT_DTYPE, SEARCH_EXACT_COLLECTIONS
+)
+from .embedding_provider import EmbeddingProvider, configured_embedding_model, create_embedding_provider
+from .lexical_index import LexicalIndex
+from .identifier_index import IdentifierIndex
+from .exact_index import ExactVectorIndex
+from .ingest_manifest import IngestManifest, content_digest, content_set_digest, source_fingerprint
+from .ingest_pipeline import StagedPipeline
+from ..utils.chunk_keys import split_chunk_key
+from ..utils.token_counter import count_tokens
 from dataclasses import dataclass
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import chromadb.errors
 
 # Configure logging
@@ -38,6 +56,32 @@ class CollectionStats:
     avg_relevance_score: float
     index_quality_score: float
 
+def _with_float32_embedding(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """Troca a lista de floats do embedding por um array float32 assim que o chunk é montado"""
+    embedding = chunk.get("embedding")
+    if embedding is not None:
+        try:
+            chunk["embedding"] = np.asarray(embedding, dtype=np.float32)
+        except (TypeError, ValueError):
+            chunk["embedding"] = np.full(len(embedding), np.nan, dtype=np.float32)
+    return chunk
+
+def iter_json_chunks(file_path: str) -> Iterator[Dict[str, Any]]:
+    """Percorre um arquivo com uma lista de chunks, um chunk por vez (memória independe do tamanho do arquivo)"""
+    with open(file_path, 'rb') as f:
+        for chunk in ijson.items(f, "item", use_float=True):
+            yield _with_float32_embedding(chunk)
+
+def iter_json_chunk_groups(file_path: str) -> Iterator[Tuple[str, Iterator[Dict[str, Any]]]]:
+    """
+    Percorre um arquivo {nome: [chunks]} em streaming, um grupo (função/enum)
+    por vez: só os chunks do grupo atual ficam em memória.
+    """
+    with open(file_path, 'rb') as f:
+        for group_name, chunks in ijson.kvitems(f, "", use_float=True):
+            if isinstance(chunks, list):
+                yield group_name, (_with_float32_embedding(chunk) for chunk in chunks)
+
 class EmbeddingValidator:
     """Valida e normaliza embeddings para garantir qualidade"""
     
@@ -49,46 +93,71 @@ class EmbeddingValidator:
             "normalized_embeddings": 0,
             "zero_embeddings": 0
         }
+        self._lock = threading.Lock()
     
-    def validate_and_normalize(self, embedding: List[float], content: str = "") -> Tuple[bool, List[float]]:
+    def validate_and_normalize(self, embedding: Union[List[float], np.ndarray], content: str = "") -> Tuple[bool, List[float]]:
         """
         Valida e normaliza embedding, retornando (is_valid, normalized_embedding)
         """
-        self.validation_stats["total_processed"] += 1
-        
-        if not embedding or len(embedding) != self.expected_dimension:
-            self.validation_stats["invalid_embeddings"] += 1
-            logger.warning(f"Invalid embedding dimension: {len(embedding) if embedding else 0}, expected {self.expected_dimension}")
+        valid_mask, normalized = self.validate_and_normalize_batch([embedding])
+        if not valid_mask[0]:
             return False, []
+        return True, normalized[0].tolist()
+    
+    def validate_and_normalize_batch(self, embeddings: Union[Sequence[Any], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Valida e normaliza (L2) um bloco de embeddings de uma vez.
+        
+        Retorna (valid_mask, normalized): máscara booleana das linhas válidas e
+        matriz float32 (N, expected_dimension) com as linhas normalizadas
+        (linhas inválidas ficam zeradas). As regras e os contadores são os
+        mesmos da validação individual: dimensão errada, NaN/inf ou norma
+        nula contam como inválidos, e vetores todos zero como zero_embeddings.
+        """
+        count = len(embeddings)
+        if isinstance(embeddings, np.ndarray) and embeddings.ndim == 2 and embeddings.shape[1] == self.expected_dimension:
+            matrix = embeddings.astype(np.float32, copy=False)
+            dimension_ok = np.ones(count, dtype=bool)
+        else:
+            # Linhas de dimensão errada não entram na matriz (ficam zeradas e marcadas)
+            matrix = np.zeros((count, self.expected_dimension), dtype=np.float32)
+            dimension_ok = np.zeros(count, dtype=bool)
+            for row, embedding in enumerate(embeddings):
+                if embedding is not None and len(embedding) == self.expected_dimension:
+                    matrix[row] = embedding
+                    dimension_ok[row] = True
         
-        # Convert to numpy array for processing
-        emb_array = np.array(embedding, dtype=np.float32)
+        with np.errstate(invalid="ignore", over="ignore"):
+            finite = dimension_ok & np.isfinite(matrix).all(axis=1)
+            zero = finite & (np.abs(matrix) <= 1e-8).all(axis=1)
+            norms = np.linalg.norm(matrix, axis=1)
+        valid_mask = finite & ~zero & (norms > 0)
         
-        # Check for NaN or infinite values
-        if np.isnan(emb_array).any() or np.isinf(emb_array).any():
-            self.validation_stats["invalid_embeddings"] += 1
-            logger.warning("Embedding contains NaN or infinite values")
-            return False, []
+        normalized = np.zeros_like(matrix)
+        normalized[valid_mask] = matrix[valid_mask] / norms[valid_mask, None]
         
-        # Check for zero embeddings
-        if np.allclose(emb_array, 0.0):
-            self.validation_stats["zero_embeddings"] += 1
-            logger.warning("Embedding is all zeros")
-            return False, []
+        wrong_dimension = int(count - dimension_ok.sum())
+        not_finite = int(dimension_ok.sum() - finite.sum())
+        zero_count = int(zero.sum())
+        null_norm = int((finite & ~zero).sum() - valid_mask.sum())
+        with self._lock:
+            self.validation_stats["total_processed"] += count
+            self.validation_stats["invalid_embeddings"] += wrong_dimension + not_finite + null_norm
+            self.validation_stats["zero_embeddings"] += zero_count
+            self.validation_stats["normalized_embeddings"] += int(valid_mask.sum())
         
-        # Normalize embedding (L2 normalization for cosine similarity)
-        norm = np.linalg.norm(emb_array)
-        if norm > 0:
-            normalized = emb_array / norm
-            self.validation_stats["normalized_embeddings"] += 1
-            return True, normalized.tolist()
-        else:
-            self.validation_stats["invalid_embeddings"] += 1
-            return False, []
+        if wrong_dimension:
+            logger.warning(f"{wrong_dimension} embeddings with invalid dimension, expected {self.expected_dimension}")
+        if not_finite:
+            logger.warning(f"{not_finite} embeddings contain NaN or infinite values")
+        if zero_count:
+            logger.warning(f"{zero_count} embeddings are all zeros")
+        return valid_mask, normalized
     
     def get_stats(self) -> Dict[str, Any]:
         """Retorna estatísticas de validação"""
-        stats = self.validation_stats.copy()
+        with self._lock:
+            stats = self.validation_stats.copy()
         if stats["total_processed"] > 0:
             stats["success_rate"] = (stats["normalized_embeddings"] / stats["total_processed"]) * 100
         else:
@@ -96,26 +165,52 @@ class EmbeddingValidator:
         return stats
 
 class ContentDeduplicator:
-    """Remove duplicatas baseado em hash de conteúdo"""
+    """
+    Remove duplicatas baseado em hash de conteúdo, inclusive entre collections.
+    
+    Thread-safe, para collections ingeridas em paralelo: cada hash guarda o
+    rank (ordem) da collection dona. Um conteúdo já visto numa collection de
+    rank menor ou igual é duplicata; visto antes só numa de rank maior, passa
+    a pertencer à de rank menor, e a cópia da outra é descartada depois (veja
+    owner). O resultado é o mesmo de processar as collections em sequência.
+    """
     
     def __init__(self):
-        self.content_hashes = set()
+        self.content_owners: Dict[str, int] = {}
         self.duplicate_count = 0
         self.unique_count = 0
+        self._lock = threading.Lock()
     
-    def is_duplicate(self, content: str) -> bool:
+    def is_duplicate(self, content: str, rank: int = 0) -> bool:
         """Verifica se o conteúdo é duplicado baseado em hash"""
         # Create content hash
         content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
         
-        if content_hash in self.content_hashes:
-            self.duplicate_count += 1
-            return True
-        else:
-            self.content_hashes.add(content_hash)
-            self.unique_count += 1
+        with self._lock:
+            owner = self.content_owners.get(content_hash)
+            if owner is not None and owner <= rank:
+                self.duplicate_count += 1
+                return True
+            self.content_owners[content_hash] = rank
+            if owner is None:
+                self.unique_count += 1
+            else:
+                # A cópia da collection posterior deixa de ser única
+                self.duplicate_count += 1
             return False
     
+    def owner(self, content_hash: str) -> Optional[int]:
+        """Rank da collection dona do conteúdo (None se nunca visto)"""
+        return self.content_owners.get(content_hash)
+    
+    def seed(self, content_hashes: Iterable[str], rank: int = 0):
+        """Registra hashes de conteúdo já gravados (collections puladas pelo manifesto) sem contá-los"""
+        with self._lock:
+            for content_hash in content_hashes:
+                owner = self.content_owners.get(content_hash)
+                if owner is None or rank < owner:
+                    self.content_owners[content_hash] = rank
+    
     def get_stats(self) -> Dict[str, int]:
         """Retorna estatísticas de deduplicação"""
         return {
@@ -125,21 +220,57 @@ class ContentDeduplicator:
         }
 
 class OptimizedBatchProcessor:
-    """Processador otimizado para inserção em lotes"""
+    """
+    Processador otimizado para inserção em lotes (add, ou upsert para sobrescrever ids existentes).
+
+    O tamanho do lote se ajusta à latência do Chroma: a cada probe_interval
+    lotes cheios um lote é tentado com o dobro (ou a metade) do tamanho e,
+    se o tempo por documento melhora mais que a tolerância em relação à média
+    do tamanho atual, o novo tamanho é adotado e o próximo passo vai na mesma
+    direção; se não melhora, volta ao tamanho anterior e a próxima tentativa
+    vai na direção oposta. A média é recente (EWMA) porque o custo por
+    documento cresce com a collection.
+
+    Um lote que falha é dividido ao meio recursivamente, então um documento
+    ruim é isolado em O(log n) chamadas em vez de uma chamada por documento.
+    """
+    
+    probe_interval = 8
+    latency_smoothing = 0.3
     
-    def __init__(self, collection, batch_size: int = 100):
+    def __init__(self, collection, batch_size: int = INGEST_WRITE_BATCH_SIZE, upsert: bool = False,
+                 min_batch_size: int = INGEST_WRITE_BATCH_MIN, max_batch_size: int = INGEST_WRITE_BATCH_MAX,
+                 tolerance: float = INGEST_WRITE_BATCH_TOLERANCE):
         self.collection = collection
-        self.batch_size = batch_size
-        self.current_batch = {
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, max_batch_size)
+        self.batch_size = min(max(batch_size, self.min_batch_size), self.max_batch_size)
+        self.tolerance = tolerance
+        self.write = collection.upsert if upsert else collection.add
+        self.current_batch = self._empty_batch()
+        self.total_added = 0
+        self.batch_count = 0
+        self.write_calls = 0
+        self.bisection_splits = 0
+        self.resizes = 0
+        self.write_seconds = 0.0
+        self.batch_sizes_used: Set[int] = set()
+        self.failed_ids: List[str] = []
+        self._latency: Optional[float] = None
+        self._probe_from: Optional[int] = None
+        self._probe_grow = True
+        self._batches_since_probe = 0
+    
+    @staticmethod
+    def _empty_batch() -> Dict[str, List[Any]]:
+        return {
             "ids": [],
             "documents": [],
             "embeddings": [],
             "metadatas": []
         }
-        self.total_added = 0
-        self.batch_count = 0
-        
-    def add_document(self, doc_id: str, content: str, embedding: List[float], metadata: Dict[str, Any]):
+    
+    def add_document(self, doc_id: str, content: str, embedding: Union[List[float], np.ndarray], metadata: Dict[str, Any]):
         """Adiciona documento ao batch atual"""
         self.current_batch["ids"].append(doc_id)
         self.current_batch["documents"].append(content)
@@ -150,69 +281,132 @@ class OptimizedBatchProcessor:
         if len(self.current_batch["ids"]) >= self.batch_size:
             self.flush_batch()
     
+    def _write_batch(self, batch: Dict[str, List[Any]]) -> float:
+        """Uma chamada ao Chroma; retorna a duração em segundos"""
+        start = time.perf_counter()
+        self.write_calls += 1
+        try:
+            self.write(
+                ids=batch["ids"],
+                documents=batch["documents"],
+                embeddings=np.asarray(batch["embeddings"], dtype=np.float32),
+                metadatas=batch["metadatas"]
+            )
+        finally:
+            elapsed = time.perf_counter() - start
+            self.write_seconds += elapsed
+        return elapsed
+    
     def flush_batch(self):
         """Processa o batch atual"""
-        if not self.current_batch["ids"]:
+        batch = self.current_batch
+        if not batch["ids"]:
             return
+        self.current_batch = self._empty_batch()
+        batch_size = len(batch["ids"])
         
         try:
-            self.collection.add(
-                ids=self.current_batch["ids"],
-                documents=self.current_batch["documents"],
-                embeddings=self.current_batch["embeddings"],
-                metadatas=self.current_batch["metadatas"]
-            )
-            
-            batch_size = len(self.current_batch["ids"])
-            self.total_added += batch_size
-            self.batch_count += 1
-            
-            logger.info(f"Batch {self.batch_count} processed: {batch_size} documents")
-            
-            # Clear batch
-            self.current_batch = {
-                "ids": [],
-                "documents": [],
-                "embeddings": [],
-                "metadatas": []
-            }
-            
+            elapsed = self._write_batch(batch)
         except Exception as e:
-            logger.error(f"Error processing batch: {str(e)}")
-            # Try to add documents one by one to identify problematic ones
-            self._process_batch_individually()
+            logger.error(f"Error processing batch of {batch_size} documents: {str(e)}")
+            # Split the batch in halves until the failing documents are isolated
+            self._bisect(batch)
+            return
+        
+        self._record_batch(batch_size, elapsed)
+        
+        # Only full batches say something about the batch size (the last one is usually partial)
+        if batch_size >= self.batch_size:
+            self._adapt_batch_size(elapsed / batch_size)
+    
+    def _record_batch(self, batch_size: int, elapsed: float):
+        """Contabiliza um lote gravado (inteiro ou metade de uma bisseção)"""
+        self.total_added += batch_size
+        self.batch_count += 1
+        self.batch_sizes_used.add(batch_size)
+        logger.info(f"Batch {self.batch_count} processed: {batch_size} documents in {elapsed:.3f}s")
+    
+    def _adapt_batch_size(self, latency_per_document: float):
+        """Adota o tamanho tentado se o tempo por documento melhorou; senão volta ao anterior"""
+        if self._probe_from is not None:
+            if latency_per_document < self._latency * (1 - self.tolerance):
+                log_debug(logger, f"Write batch size {self._probe_from} -> {self.batch_size} "
+                                  f"({self._latency * 1000:.3f} -> {latency_per_document * 1000:.3f} ms per document)")
+                self._latency = latency_per_document
+                self.resizes += 1
+                # Kept improving: the next step goes the same way right away
+                self._probe_from = None
+                self._probe()
+            else:
+                self.batch_size = self._probe_from
+                self._probe_from = None
+                self._probe_grow = not self._probe_grow
+                self._batches_since_probe = 0
+            return
+        
+        if self._latency is None:
+            self._latency = latency_per_document
+        else:
+            self._latency += self.latency_smoothing * (latency_per_document - self._latency)
+        self._batches_since_probe += 1
+        if self._batches_since_probe >= self.probe_interval:
+            self._probe()
+    
+    def _probe(self):
+        """Próximo lote com o dobro ou a metade do tamanho atual, dentro dos limites"""
+        if self._probe_grow:
+            new_size = min(self.batch_size * 2, self.max_batch_size)
+        else:
+            new_size = max(self.batch_size // 2, self.min_batch_size)
+        if new_size == self.batch_size:
+            # At a limit: try the other direction next time
+            self._probe_grow = not self._probe_grow
+            self._batches_since_probe = 0
+            return
+        self._probe_from = self.batch_size
+        self.batch_size = new_size
     
-    def _process_batch_individually(self):
-        """Processa documentos individualmente quando batch falha"""
-        logger.info("Processing batch individually to identify issues...")
+    def _bisect(self, batch: Dict[str, List[Any]]):
+        """Grava as duas metades de um lote que falhou, dividindo de novo a que falhar"""
+        batch_size = len(batch["ids"])
+        if batch_size == 1:
+            # The failure was already logged by the caller for this single document
+            self.failed_ids.append(batch["ids"][0])
+            return
         
-        for i in range(len(self.current_batch["ids"])):
+        self.bisection_splits += 1
+        middle = batch_size // 2
+        for half in ({key: values[:middle] for key, values in batch.items()},
+                     {key: values[middle:] for key, values in batch.items()}):
             try:
-                self.collection.add(
-                    ids=[self.current_batch["ids"][i]],
-                    documents=[self.current_batch["documents"][i]],
-                    embeddings=[self.current_batch["embeddings"][i]],
-                    metadatas=[self.current_batch["metadatas"][i]]
-                )
-                self.total_added += 1
+                elapsed = self._write_batch(half)
             except Exception as e:
-                logger.error(f"Failed to add document {self.current_batch['ids'][i]}: {str(e)}")
-        
-        # Clear batch after individual processing
-        self.current_batch = {
-            "ids": [],
-            "documents": [],
-            "embeddings": [],
-            "metadatas": []
-        }
+                if len(half["ids"]) == 1:
+                    logger.error(f"Failed to add document {half['ids'][0]}: {str(e)}")
+                self._bisect(half)
+                continue
+            self._record_batch(len(half["ids"]), elapsed)
     
     def finalize(self):
         """Processa batch final e retorna estatísticas"""
         self.flush_batch()
+        return self.get_stats()
+    
+    def get_stats(self) -> Dict[str, Any]:
         return {
             "total_added": self.total_added,
             "batch_count": self.batch_count,
-            "avg_batch_size": self.total_added / self.batch_count if self.batch_count > 0 else 0
+            "avg_batch_size": self.total_added / self.batch_count if self.batch_count > 0 else 0,
+            "final_batch_size": self.batch_size,
+            "min_batch_size_used": min(self.batch_sizes_used, default=0),
+            "max_batch_size_used": max(self.batch_sizes_used, default=0),
+            "batch_resizes": self.resizes,
+            "write_calls": self.write_calls,
+            "write_seconds": round(self.write_seconds, 4),
+            "documents_per_s": round(self.total_added / self.write_seconds, 1) if self.write_seconds > 0 else 0.0,
+            "bisection_splits": self.bisection_splits,
+            "failed_documents": len(self.failed_ids),
+            "failed_ids": list(self.failed_ids)
         }
 
 class CollectionManager:
@@ -243,7 +437,8 @@ class CollectionManager:
             }
         }
     
-    def create_or_reset_collection(self, collection_name: str, reset: bool = False) -> chromadb.Collection:
+    def create_or_reset_collection(self, collection_name: str, reset: bool = False,
+                                   embedding_model: str = "") -> chromadb.Collection:
         """Cria ou reseta collection com configuração otimizada"""
         
         # Delete existing collection if reset requested
@@ -267,7 +462,8 @@ class CollectionManager:
                 "hnsw:M": 16,
                 "description": config.get("description", ""),
                 "created_timestamp": time.time(),
-                "content_types": ",".join(config.get("expected_content_types", []))
+                "content_types": ",".join(config.get("expected_content_types", [])),
+                "embedding_model": embedding_model
             }
         )
         
@@ -306,9 +502,9 @@ class CollectionManager:
                     content_type = metadata.get("content_type", "unknown")
                     content_types[content_type] += 1
             
-            if sample_data["embeddings"]:
+            if sample_data["embeddings"] is not None:
                 for embedding in sample_data["embeddings"]:
-                    if embedding:
+                    if embedding is not None and len(embedding):
                         embedding_dims.append(len(embedding))
             
             avg_dimension = sum(embedding_dims) / len(embedding_dims) if embedding_dims else 0.0
@@ -336,31 +532,78 @@ class CollectionManager:
 class DocumentProcessor:
     """Processa diferentes tipos de documentos com estratégias específicas"""
     
-    def __init__(self, validator: EmbeddingValidator, deduplicator: ContentDeduplicator):
+    def __init__(self, validator: EmbeddingValidator, deduplicator: ContentDeduplicator,
+                 embedding_provider: Optional[EmbeddingProvider] = None,
+                 validation_batch_size: int = INGEST_VALIDATION_BATCH_SIZE, dedup_rank: int = 0):
         self.validator = validator
         self.deduplicator = deduplicator
+        # Posição da collection na ordem de deduplicação (a de menor rank fica com o conteúdo repetido)
+        self.dedup_rank = dedup_rank
+        # Com um provider, os embeddings são recalculados a partir do conteúdo (os do arquivo são ignorados)
+        self.embedding_provider = embedding_provider
+        self.validation_batch_size = validation_batch_size
+        self._stats_lock = threading.Lock()
         self.processing_stats = defaultdict(int)
     
-    def process_docs_collection(self, data: List[Dict], collection_name: str) -> Generator[Tuple[str, str, List[float], Dict], None, None]:
+    def process_docs_collection(self, data: Iterable[Dict], collection_name: str) -> Generator[Tuple[str, str, np.ndarray, Dict], None, None]:
         """Processa documentação geral"""
+        return self._validated(self.docs_candidates(data, collection_name))
+    
+    def process_enums_collection(self, data: Iterable[Tuple[str, Iterable[Dict]]], collection_name: str) -> Generator[Tuple[str, str, np.ndarray, Dict], None, None]:
+        """Processa enums com estrutura específica"""
+        return self._validated(self.enums_candidates(data, collection_name))
+    
+    def process_function_collection(self, data: Iterable[Tuple[str, Iterable[Dict]]], collection_name: str) -> Generator[Tuple[str, str, np.ndarray, Dict], None, None]:
+        """Processa coleções de funções (folha/pessoal) com o novo formato"""
+        return self._validated(self.function_candidates(data, collection_name))
+    
+    def _validated(self, candidates: Iterable[Tuple[str, str, Any, Dict]]) -> Generator[Tuple[str, str, np.ndarray, Dict], None, None]:
+        """
+        Junta os candidatos em blocos de validation_batch_size, recalcula os
+        embeddings do bloco numa só chamada (com provider) e valida/normaliza
+        o bloco inteiro de uma vez; só as linhas válidas seguem, como arrays float32.
+        """
+        block = []
+        for candidate in candidates:
+            block.append(candidate)
+            if len(block) >= self.validation_batch_size:
+                yield from self.validate_block(block)
+                block = []
+        if block:
+            yield from self.validate_block(block)
+    
+    def validate_block(self, block: List[Tuple[str, str, Any, Dict]]) -> Generator[Tuple[str, str, np.ndarray, Dict], None, None]:
+        """Recalcula (com provider) e valida os embeddings de um bloco de candidatos, devolvendo só os válidos"""
+        embeddings = [embedding for _, _, embedding, _ in block]
+        if self.embedding_provider is not None:
+            try:
+                embeddings = self.embedding_provider.embed([content for _, content, _, _ in block])
+            except Exception as e:
+                logger.error(f"Error embedding block of {len(block)} chunks: {e}")
+                self.add_stat("processing_errors", len(block))
+                return
+        
+        valid_mask, normalized = self.validator.validate_and_normalize_batch(embeddings)
+        self.add_stat("skipped_invalid_embedding", int(len(block) - valid_mask.sum()))
+        self.add_stat("processed_successfully", int(valid_mask.sum()))
+        for row in np.flatnonzero(valid_mask):
+            doc_id, content, _, metadata = block[row]
+            yield doc_id, content, normalized[row], metadata
+    
+    def docs_candidates(self, data: Iterable[Dict], collection_name: str) -> Generator[Tuple[str, str, Any, Dict], None, None]:
+        """Candidatos (id, conteúdo, embedding do arquivo, metadados) da documentação, já deduplicados"""
         for i, chunk in enumerate(data):
             try:
                 content = chunk.get("content", "")
                 embedding = chunk.get("embedding", [])
                 
-                if not content or not embedding:
-                    self.processing_stats["skipped_empty"] += 1
+                if not content or (len(embedding) == 0 and self.embedding_provider is None):
+                    self.add_stat("skipped_empty")
                     continue
                 
                 # Check for duplicates
-                if self.deduplicator.is_duplicate(content):
-                    self.processing_stats["skipped_duplicate"] += 1
-                    continue
-                
-                # Validate embedding
-                is_valid, normalized_embedding = self.validator.validate_and_normalize(embedding, content)
-                if not is_valid:
-                    self.processing_stats["skipped_invalid_embedding"] += 1
+                if self.deduplicator.is_duplicate(content, self.dedup_rank):
+                    self.add_stat("skipped_duplicate")
                     continue
                 
                 # Enhanced metadata
@@ -375,38 +618,33 @@ class DocumentProcessor:
                     'processing_timestamp': time.time(),
                     'chunk_index': i
                 }
+                self._add_chunk_family_metadata(metadata)
+                self._add_token_count(metadata, content)
                 
                 # Generate deterministic ID
                 doc_id = self._generate_document_id(collection_name, content, metadata)
                 
-                self.processing_stats["processed_successfully"] += 1
-                yield doc_id, content, normalized_embedding, metadata
+                yield doc_id, content, embedding, metadata
                 
             except Exception as e:
                 logger.error(f"Error processing docs chunk {i}: {e}")
-                self.processing_stats["processing_errors"] += 1
+                self.add_stat("processing_errors")
     
-    def process_enums_collection(self, data: Dict[str, List], collection_name: str) -> Generator[Tuple[str, str, List[float], Dict], None, None]:
-        """Processa enums com estrutura específica"""
-        for enum_name, enum_chunks in data.items():
+    def enums_candidates(self, data: Iterable[Tuple[str, Iterable[Dict]]], collection_name: str) -> Generator[Tuple[str, str, Any, Dict], None, None]:
+        """Candidatos dos enums, já deduplicados"""
+        for enum_name, enum_chunks in data:
             for chunk_idx, chunk in enumerate(enum_chunks):
                 try:
                     content = chunk.get("content", "")
                     embedding = chunk.get("embedding", [])
                     
-                    if not content or not embedding:
-                        self.processing_stats["skipped_empty"] += 1
+                    if not content or (len(embedding) == 0 and self.embedding_provider is None):
+                        self.add_stat("skipped_empty")
                         continue
                     
                     # Check for duplicates
-                    if self.deduplicator.is_duplicate(content):
-                        self.processing_stats["skipped_duplicate"] += 1
-                        continue
-                    
-                    # Validate embedding
-                    is_valid, normalized_embedding = self.validator.validate_and_normalize(embedding, content)
-                    if not is_valid:
-                        self.processing_stats["skipped_invalid_embedding"] += 1
+                    if self.deduplicator.is_duplicate(content, self.dedup_rank):
+                        self.add_stat("skipped_duplicate")
                         continue
                     
                     # Enhanced metadata for enums
@@ -424,38 +662,33 @@ class DocumentProcessor:
                     part_number = chunk.get("part_number")
                     if part_number is not None:
                         metadata['part_number'] = part_number
+                    self._add_chunk_family_metadata(metadata, chunk.get("part_number"))
+                    self._add_token_count(metadata, content)
                     
                     # Generate deterministic ID
                     doc_id = self._generate_document_id(collection_name, content, metadata)
                     
-                    self.processing_stats["processed_successfully"] += 1
-                    yield doc_id, content, normalized_embedding, metadata
+                    yield doc_id, content, embedding, metadata
                     
                 except Exception as e:
                     logger.error(f"Error processing enum {enum_name} chunk {chunk_idx}: {e}")
-                    self.processing_stats["processing_errors"] += 1
+                    self.add_stat("processing_errors")
     
-    def process_function_collection(self, data: Dict[str, List], collection_name: str) -> Generator[Tuple[str, str, List[float], Dict], None, None]:
-        """Processa coleções de funções (folha/pessoal) com o novo formato"""
-        for function_name, function_chunks in data.items():
+    def function_candidates(self, data: Iterable[Tuple[str, Iterable[Dict]]], collection_name: str) -> Generator[Tuple[str, str, Any, Dict], None, None]:
+        """Candidatos das funções (folha/pessoal), já deduplicados"""
+        for function_name, function_chunks in data:
             for chunk in function_chunks:
                 try:
                     content = chunk.get("content", "")
                     embedding = chunk.get("embedding", [])
                     
-                    if not content or not embedding:
-                        self.processing_stats["skipped_empty"] += 1
+                    if not content or (len(embedding) == 0 and self.embedding_provider is None):
+                        self.add_stat("skipped_empty")
                         continue
                     
                     # Check for duplicates
-                    if self.deduplicator.is_duplicate(content):
-                        self.processing_stats["skipped_duplicate"] += 1
-                        continue
-                    
-                    # Validate embedding
-                    is_valid, normalized_embedding = self.validator.validate_and_normalize(embedding, content)
-                    if not is_valid:
-                        self.processing_stats["skipped_invalid_embedding"] += 1
+                    if self.deduplicator.is_duplicate(content, self.dedup_rank):
+                        self.add_stat("skipped_duplicate")
                         continue
                     
                     # Convert extracted_headers to string if it's a dictionary
@@ -493,16 +726,40 @@ class DocumentProcessor:
                         'content_length': len(content),
                         'domain': collection_name  # folha or pessoal
                     }
+                    self._add_chunk_family_metadata(metadata, chunk.get("part_number"))
+                    self._add_token_count(metadata, content)
                     
                     # Generate deterministic ID using chunk_key if available
                     doc_id = chunk.get("chunk_key", self._generate_document_id(collection_name, content, metadata))
                     
-                    self.processing_stats["processed_successfully"] += 1
-                    yield doc_id, content, normalized_embedding, metadata
+                    yield doc_id, content, embedding, metadata
                     
                 except Exception as e:
                     logger.error(f"Error processing function {function_name}: {e}")
-                    self.processing_stats["processing_errors"] += 1
+                    self.add_stat("processing_errors")
+    
+    def _add_token_count(self, metadata: Dict[str, Any], content: str):
+        """Grava token_count (quando o chunk não traz um) para o empacotamento de contexto não tokenizar na consulta"""
+        if not metadata.get('token_count'):
+            metadata['token_count'] = count_tokens(content)
+    
+    def _add_chunk_family_metadata(self, metadata: Dict[str, Any], source_part_number: Any = None):
+        """
+        Grava base_key e part_number derivados do chunk_key para agrupar partes
+        sem regex na busca. O part_number do chunk de origem (source_part_number)
+        prevalece; o derivado só preenche o que a origem não trouxe.
+        """
+        base_key, part_number = split_chunk_key(metadata.get("chunk_key", ""))
+        metadata['base_key'] = base_key
+        if part_number is None:
+            return
+        if source_part_number is None:
+            metadata['part_number'] = part_number
+        elif str(source_part_number) != str(part_number):
+            logger.warning(
+                f"Chunk {metadata.get('chunk_key')}: source part_number {source_part_number} "
+                f"differs from the one in its key ({part_number}); keeping the source value"
+            )
     
     def _classify_content_type(self, content: str) -> str:
         """Classifica tipo de conteúdo baseado em padrões"""
@@ -552,21 +809,223 @@ class DocumentProcessor:
         
         return f"{collection_name}_{doc_hash}"
     
+    def add_stat(self, stat_name: str, amount: int = 1):
+        # Os estágios do pipeline contam a partir de threads diferentes
+        with self._stats_lock:
+            self.processing_stats[stat_name] += amount
+    
     def get_processing_stats(self) -> Dict[str, int]:
         """Retorna estatísticas de processamento"""
-        return dict(self.processing_stats)
+        with self._stats_lock:
+            return dict(self.processing_stats)
+
+def _collection_ids(collection, page_size: int = 5000) -> Set[str]:
+    """Ids armazenados na collection, paginados e sem documentos/embeddings"""
+    ids = set()
+    for offset in range(0, collection.count(), page_size):
+        ids.update(collection.get(limit=page_size, offset=offset, include=[])["ids"])
+    return ids
+
+def _delete_in_batches(collection, doc_ids: List[str], batch_size: int = INGEST_DELETE_BATCH_SIZE) -> int:
+    """Remove os ids em lotes e retorna quantos foram removidos"""
+    for start in range(0, len(doc_ids), batch_size):
+        collection.delete(ids=doc_ids[start:start + batch_size])
+    if doc_ids:
+        logger.info(f"Deleted {len(doc_ids)} documents no longer present in the source")
+    return len(doc_ids)
 
-def initialize_chroma_db(reset_collections: bool = False):
+class CollectionIngestJob:
+    """
+    Ingestão incremental de uma collection: decide pelo manifesto se ela pode
+    ser pulada, roda o pipeline parse -> validate -> write contra o manifesto
+    anterior (add para ids novos, upsert para alterados) e, no fim, remove o
+    que saiu da fonte e as cópias de conteúdo que pertencem a uma collection
+    de rank menor (deduplicação entre collections processadas em paralelo).
+    """
+    
+    def __init__(self, collection_name: str, rank: int, config: Dict[str, Any], collection,
+                 document_processor: DocumentProcessor, deduplicator: ContentDeduplicator,
+                 manifest_directory: str, embedding_model: str):
+        self.collection_name = collection_name
+        self.rank = rank
+        self.config = config
+        self.collection = collection
+        self.document_processor = document_processor
+        self.deduplicator = deduplicator
+        self.embedding_model = embedding_model
+        self.manifest_path = IngestManifest.path_for(manifest_directory, collection_name)
+        self.source = source_fingerprint(config["file_path"])
+        self.previous_manifest: Optional[IngestManifest] = None
+        self.current_manifest = IngestManifest(
+            collection_name, source=self.source, embedding_model=embedding_model, reembed=INGEST_REEMBED
+        )
+        self.stale_ids: Set[str] = set()
+        self.add_processor = OptimizedBatchProcessor(collection)
+        self.upsert_processor = OptimizedBatchProcessor(collection, upsert=True)
+        self.stats = defaultdict(int)
+        self.pipeline_stats: Dict[str, Any] = {}
+        self.batch_stats: Dict[str, Any] = {}
+        self.failed = False
+        self.elapsed = 0.0
+    
+    def load_manifest(self, reset: bool):
+        """O manifesto anterior só vale enquanto ainda descreve a collection"""
+        previous_manifest = None if reset else IngestManifest.load(self.manifest_path)
+        collection_count = self.collection.count()
+        if previous_manifest is not None and len(previous_manifest) != collection_count:
+            logger.warning(
+                f"Ingest manifest for {self.collection_name} lists {len(previous_manifest)} documents but the "
+                f"collection has {collection_count}; rewriting the collection"
+            )
+            previous_manifest = None
+        self.previous_manifest = previous_manifest
+    
+    def is_unchanged(self, dedup_context: str) -> bool:
+        """Mesmo arquivo, mesmo pipeline de embeddings e mesmos conteúdos nas collections anteriores"""
+        return self.previous_manifest is not None and self.previous_manifest.matches_source(
+            self.source, self.embedding_model, INGEST_REEMBED, dedup_context
+        )
+    
+    def run(self):
+        start_time = time.time()
+        # Dropped while this run writes, so an interrupted run is never mistaken for a complete one
+        Path(self.manifest_path).unlink(missing_ok=True)
+        
+        # Without a usable manifest the stored ids are unknown: list them (ids only)
+        # so every document is upserted and the ones no longer in the file are removed
+        if self.previous_manifest is not None:
+            self.stale_ids = set(self.previous_manifest.entries)
+        else:
+            self.stale_ids = _collection_ids(self.collection)
+        
+        # Stream data: chunks are parsed one at a time as the parse stage consumes them
+        file_path = self.config["file_path"]
+        logger.info(f"Streaming data from {file_path}")
+        data = self.config["reader"](file_path)
+        candidates = getattr(self.document_processor, self.config["candidates_method"])(data, self.collection_name)
+        
+        pipeline = StagedPipeline(
+            self.collection_name,
+            block_size=self.document_processor.validation_batch_size,
+            queue_blocks=INGEST_PIPELINE_QUEUE_BLOCKS
+        )
+        with tqdm(desc=f"Processing {self.collection_name}", position=self.rank, leave=True) as self.progress:
+            try:
+                pipeline.run(candidates, self.transform, self.sink)
+            finally:
+                self.batch_stats = {
+                    "add": self.add_processor.finalize(),
+                    "upsert": self.upsert_processor.finalize()
+                }
+                self.pipeline_stats = pipeline.get_stats()
+                self.elapsed = time.time() - start_time
+        logger.info(pipeline.summary())
+    
+    def transform(self, block: List[Tuple[str, str, Any, Dict]]) -> List[Tuple[str, str, np.ndarray, Dict, List[str]]]:
+        """Estágio validate: embeddings validados/normalizados e hashes do manifesto"""
+        # Content claimed by an earlier collection since parsing: skip it before embedding
+        kept = [candidate for candidate in block if not self._superseded_content(content_digest(candidate[1]))]
+        if len(kept) < len(block):
+            self._count_superseded(len(block) - len(kept), validated=False)
+        block = kept
+        return [
+            (doc_id, content, embedding, metadata, IngestManifest.entry_digests(content, metadata, embedding))
+            for doc_id, content, embedding, metadata in self.document_processor.validate_block(block)
+        ]
+    
+    def _superseded_content(self, content_hash: str) -> bool:
+        owner = self.deduplicator.owner(content_hash)
+        return owner is not None and owner < self.rank
+    
+    def _superseded(self, digests: List[str]) -> bool:
+        return self._superseded_content(digests[0])
+    
+    def _count_superseded(self, count: int, validated: bool = True):
+        """Conteúdo que acabou sendo de uma collection anterior conta como duplicata, como na ingestão sequencial"""
+        self.document_processor.add_stat("skipped_duplicate", count)
+        if validated:
+            self.document_processor.add_stat("processed_successfully", -count)
+    
+    def sink(self, records: List[Tuple[str, str, np.ndarray, Dict, List[str]]]):
+        """Estágio write: compara com o manifesto anterior e grava só o que mudou"""
+        previous_digests = self.previous_manifest.entries if self.previous_manifest is not None else {}
+        for doc_id, content, embedding, metadata, digests in records:
+            # The first chunk with a given id wins, as it did with plain adds
+            if doc_id in self.current_manifest.entries:
+                self.stats["repeated_ids"] += 1
+                continue
+            # Content meanwhile claimed by an earlier collection: not worth writing
+            if self._superseded(digests):
+                self._count_superseded(1)
+                continue
+            
+            self.current_manifest.entries[doc_id] = digests
+            self.stats["processed"] += 1
+            if doc_id not in self.stale_ids:
+                self.add_processor.add_document(doc_id, content, embedding, metadata)
+                self.stats["submitted"] += 1
+            elif previous_digests.get(doc_id) == digests:
+                self.stats["unchanged"] += 1
+            else:
+                self.upsert_processor.add_document(doc_id, content, embedding, metadata)
+                self.stats["submitted"] += 1
+        self.progress.update(len(records))
+    
+    def finish(self, dedup_context: str):
+        """Remove as cópias de conteúdo de collections anteriores e os ids que sumiram, e grava o manifesto"""
+        entries = self.current_manifest.entries
+        # Claimed by an earlier collection after this one had already written it
+        superseded_ids = [doc_id for doc_id, digests in entries.items() if self._superseded(digests)]
+        if superseded_ids:
+            self._count_superseded(len(superseded_ids))
+        for doc_id in superseded_ids:
+            digests = entries.pop(doc_id)
+            self.stats["processed"] -= 1
+            if doc_id in self.stale_ids and self.previous_manifest is not None and self.previous_manifest.entries.get(doc_id) == digests:
+                self.stats["unchanged"] -= 1
+        
+        # Tombstones: stored ids that the source no longer produces, plus the superseded copies
+        removed_ids = [doc_id for doc_id in self.stale_ids if doc_id not in entries]
+        removed_ids += [doc_id for doc_id in superseded_ids if doc_id not in self.stale_ids]
+        self.stats["deleted"] = _delete_in_batches(self.collection, removed_ids)
+        
+        # A manifest is only recorded when every document reached the collection
+        self.stats["added"] = self.add_processor.total_added
+        self.stats["updated"] = self.upsert_processor.total_added
+        if self.stats["added"] + self.stats["updated"] == self.stats["submitted"]:
+            self.current_manifest.dedup_context = dedup_context
+            self.current_manifest.save(self.manifest_path)
+        else:
+            logger.warning(f"Some documents of {self.collection_name} failed to be written; it will be rewritten on the next run")
+        
+        logger.info(f"Collection {self.collection_name} completed:")
+        logger.info(f"  - Documents processed: {self.stats['processed']}")
+        logger.info(f"  - Documents added: {self.stats['added']}")
+        logger.info(f"  - Documents updated: {self.stats['updated']}")
+        logger.info(f"  - Documents deleted: {self.stats['deleted']}")
+        logger.info(f"  - Documents unchanged: {self.stats['unchanged']}")
+        if self.stats["repeated_ids"]:
+            logger.info(f"  - Repeated ids skipped: {self.stats['repeated_ids']}")
+        logger.info(f"  - Processing time: {self.elapsed:.2f}s")
+    
+    @property
+    def changed(self) -> bool:
+        return bool(self.stats["added"] or self.stats["updated"] or self.stats["deleted"])
+
+def initialize_chroma_db(reset_collections: bool = False, chroma_path: str = "./chroma_db") -> Dict[str, Any]:
     """
     Initialize ChromaDB with enhanced optimization and validation.
     """
-    log_function_call(logger, "initialize_chroma_db", kwargs={"reset_collections": reset_collections})
+    log_function_call(logger, "initialize_chroma_db", kwargs={"reset_collections": reset_collections, "chroma_path": chroma_path})
     
     start_time = time.time()
     
+    # Once written to, the directory no longer matches the snapshot it may have been activated from
+    Path(chroma_path, INDEX_SNAPSHOT_MANIFEST_FILENAME).unlink(missing_ok=True)
+    
     # Initialize ChromaDB client with optimized settings
     client = chromadb.PersistentClient(
-        path="./chroma_db",
+        path=chroma_path,
         settings=Settings(
             anonymized_telemetry=False,
             is_persistent=True,
@@ -574,109 +1033,177 @@ def initialize_chroma_db(reset_collections: bool = False):
     )
     
     # Initialize components
-    embedding_validator = EmbeddingValidator(expected_dimension=512)
+    # The collections are tagged with the backend's model so queries with another backend are flagged
+    # The provider (and its API key) is only needed when the chunk contents are re-embedded
+    embedding_provider = None
+    embedding_model = configured_embedding_model()
+    embedding_dimensions = EMBEDDING_DIMENSIONS
+    if INGEST_REEMBED:
+        embedding_provider = create_embedding_provider(api_key=os.getenv("OPENAI_API_KEY"))
+        embedding_model = embedding_provider.model_name
+        embedding_dimensions = embedding_provider.dimensions
+        logger.info(f"Re-embedding chunk contents with {embedding_model}")
+    embedding_validator = EmbeddingValidator(expected_dimension=embedding_dimensions)
     content_deduplicator = ContentDeduplicator()
     collection_manager = CollectionManager(client)
-    document_processor = DocumentProcessor(embedding_validator, content_deduplicator)
     
     # Define collection configurations
     collection_files = {
         "docs": {
             "file_path": os.path.join(os.getcwd(), "docs", "bfc_documentation_embeddings_v2.json"),
-            "processor_method": "process_docs_collection"
+            "candidates_method": "docs_candidates",
+            "reader": iter_json_chunks
         },
         "enums": {
             "file_path": os.path.join(os.getcwd(), "docs", "enums_pessoal_and_folha_with_embeddings.json"),
-            "processor_method": "process_enums_collection"
+            "candidates_method": "enums_candidates",
+            "reader": iter_json_chunk_groups
         },
         "folha": {
             "file_path": os.path.join(os.getcwd(), "docs", "folha_with_embeddings.json"),
-            "processor_method": "process_function_collection"
+            "candidates_method": "function_candidates",
+            "reader": iter_json_chunk_groups
         },
         "pessoal": {
             "file_path": os.path.join(os.getcwd(), "docs", "pessoal_with_embeddings.json"),
-            "processor_method": "process_function_collection"
+            "candidates_method": "function_candidates",
+            "reader": iter_json_chunk_groups
         }
     }
     
-    # Process each collection
     total_stats = {
         "collections_processed": 0,
+        "collections_unchanged": 0,
         "total_documents_added": 0,
+        "total_documents_updated": 0,
+        "total_documents_deleted": 0,
+        "total_documents_unchanged": 0,
         "total_duplicates_removed": 0,
         "total_invalid_embeddings": 0,
-        "processing_time": 0.0
+        "processing_time": 0.0,
+        "pipelines": {},
+        "write_batches": {}
     }
+    manifest_directory = os.path.join(chroma_path, INGEST_MANIFEST_DIRNAME)
+    changed_collections = set()
     
-    for collection_name, config in collection_files.items():
-        logger.info(f"Processing collection: {collection_name}")
-        collection_start_time = time.time()
-        
-        # Create or reset collection
-        collection = collection_manager.create_or_reset_collection(collection_name, reset_collections)
-        
-        # Check if file exists
-        file_path = config["file_path"]
-        if not os.path.exists(file_path):
-            logger.warning(f"File not found: {file_path}")
+    # Plan: a collection is skipped when its manifest matches the source file, the embedding
+    # pipeline and the contents of the earlier collections (deduplication is global and
+    # follows this order), so skipping stops at the first collection that must be processed
+    jobs: List[CollectionIngestJob] = []
+    earlier_digests: Set[str] = set()
+    for rank, (collection_name, config) in enumerate(collection_files.items()):
+        collection = collection_manager.create_or_reset_collection(
+            collection_name, reset_collections, embedding_model=embedding_model
+        )
+        if not os.path.exists(config["file_path"]):
+            logger.warning(f"File not found: {config['file_path']}")
             continue
         
+        document_processor = DocumentProcessor(
+            embedding_validator, content_deduplicator,
+            embedding_provider=embedding_provider,
+            dedup_rank=rank
+        )
+        job = CollectionIngestJob(
+            collection_name, rank, config, collection, document_processor, content_deduplicator,
+            manifest_directory, embedding_model
+        )
+        job.load_manifest(reset_collections)
+        if not jobs and job.is_unchanged(content_set_digest(earlier_digests)):
+            content_deduplicator.seed(job.previous_manifest.content_digests(), rank)
+            earlier_digests.update(job.previous_manifest.content_digests())
+            total_stats["collections_unchanged"] += 1
+            total_stats["total_documents_unchanged"] += len(job.previous_manifest)
+            logger.info(f"Collection {collection_name} is up to date ({len(job.previous_manifest)} documents), skipping")
+            continue
+        jobs.append(job)
+    
+    # Independent pipelines: one per collection, running concurrently
+    if jobs:
+        logger.info(f"Ingesting {', '.join(job.collection_name for job in jobs)} with up to {INGEST_PARALLEL_COLLECTIONS} concurrent pipelines")
+        with ThreadPoolExecutor(max_workers=INGEST_PARALLEL_COLLECTIONS, thread_name_prefix="ingest") as executor:
+            futures = {executor.submit(job.run): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Error processing collection {job.collection_name}: {str(e)}")
+                    job.failed = True
+    
+    # Finish in dedup order: each manifest records the contents held by the collections before it
+    for job in jobs:
+        if job.failed:
+            continue
         try:
-            # Load data
-            logger.info(f"Loading data from {file_path}")
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Get existing IDs to avoid duplicates
-            existing_ids = set()
-            try:
-                existing_data = collection.get()
-                existing_ids = set(existing_data.get("ids", []))
-                logger.info(f"Found {len(existing_ids)} existing documents in collection {collection_name}")
-            except Exception as e:
-                logger.warning(f"Could not retrieve existing IDs: {e}")
-            
-            # Initialize batch processor
-            batch_processor = OptimizedBatchProcessor(collection, batch_size=50)
-            
-            # Process documents based on collection type
-            processor_method = getattr(document_processor, config["processor_method"])
-            document_generator = processor_method(data, collection_name)
-            
-            # Process documents with progress bar
-            processed_count = 0
-            skipped_existing = 0
-            
-            logger.info(f"Processing documents for collection {collection_name}...")
-            
-            for doc_id, content, embedding, metadata in tqdm(document_generator, desc=f"Processing {collection_name}"):
-                # Skip if document already exists
-                if doc_id in existing_ids:
-                    skipped_existing += 1
-                    continue
-                
-                # Add to batch
-                batch_processor.add_document(doc_id, content, embedding, metadata)
-                processed_count += 1
-            
-            # Finalize batch processing
-            batch_stats = batch_processor.finalize()
-            
-            # Log collection statistics
-            collection_time = time.time() - collection_start_time
-            logger.info(f"Collection {collection_name} completed:")
-            logger.info(f"  - Documents processed: {processed_count}")
-            logger.info(f"  - Documents added: {batch_stats['total_added']}")
-            logger.info(f"  - Existing documents skipped: {skipped_existing}")
-            logger.info(f"  - Processing time: {collection_time:.2f}s")
-            
-            # Update total stats
-            total_stats["collections_processed"] += 1
-            total_stats["total_documents_added"] += batch_stats["total_added"]
-            
+            job.finish(content_set_digest(earlier_digests))
         except Exception as e:
-            logger.error(f"Error processing collection {collection_name}: {str(e)}")
+            logger.error(f"Error finishing collection {job.collection_name}: {str(e)}")
             continue
+        earlier_digests.update(job.current_manifest.content_digests())
+        if job.changed:
+            changed_collections.add(job.collection_name)
+        
+        total_stats["collections_processed"] += 1
+        total_stats["total_documents_added"] += job.stats["added"]
+        total_stats["total_documents_updated"] += job.stats["updated"]
+        total_stats["total_documents_deleted"] += job.stats["deleted"]
+        total_stats["total_documents_unchanged"] += job.stats["unchanged"]
+        total_stats["pipelines"][job.collection_name] = job.pipeline_stats
+        total_stats["write_batches"][job.collection_name] = job.batch_stats
+    
+    # Rebuild the query-side indexes from the final contents of every collection
+    indexed_collections = {}
+    for collection_name in collection_files.keys():
+        try:
+            indexed_collections[collection_name] = client.get_collection(collection_name)
+        except (ValueError, chromadb.errors.NotFoundError):
+            continue
+    
+    # Unchanged collections leave the derived indexes as they are
+    lexical_index_path = os.path.join(chroma_path, LEXICAL_INDEX_FILENAME)
+    identifier_index_path = os.path.join(chroma_path, IDENTIFIER_INDEX_FILENAME)
+    rebuild_indexes = bool(changed_collections) or not (
+        os.path.exists(lexical_index_path) and os.path.exists(identifier_index_path)
+    )
+    if not rebuild_indexes:
+        logger.info("No collection changed; keeping the lexical and identifier indexes")
+    
+    # BM25 inverted index
+    if rebuild_indexes:
+        try:
+            lexical_index = LexicalIndex.build_from_collections(indexed_collections)
+            lexical_index.save(lexical_index_path)
+            total_stats["lexical_index_documents"] = len(lexical_index)
+        except Exception as e:
+            logger.error(f"Error building lexical index: {str(e)}")
+    
+    # Identifier (title/function/enum name) -> chunk ids map
+    if rebuild_indexes:
+        try:
+            identifier_index = IdentifierIndex.build_from_collections(indexed_collections)
+            identifier_index.save(identifier_index_path)
+            total_stats["identifier_index_entries"] = len(identifier_index)
+        except Exception as e:
+            logger.error(f"Error building identifier index: {str(e)}")
+    
+    # Memory-mapped exports for the exact search engine. Exports of changed collections are
+    # dropped for every dtype whatever the engine: an upsert can change vectors without
+    # changing the count, which is all load() can check
+    try:
+        exact_index = ExactVectorIndex(os.path.join(chroma_path, EXACT_INDEX_DIRNAME), dtype=SEARCH_EXACT_DTYPE)
+        for collection_name in changed_collections:
+            exact_index.invalidate_collection(collection_name)
+        if SEARCH_ENGINE == "exact":
+            total_stats["exact_index_vectors"] = sum(
+                exact_index.export_collection(collection_name, collection)
+                for collection_name, collection in indexed_collections.items()
+                if (not SEARCH_EXACT_COLLECTIONS or collection_name in SEARCH_EXACT_COLLECTIONS)
+                and not exact_index.has_export(collection_name, collection.count())
+            )
+    except Exception as e:
+        logger.error(f"Error exporting exact index: {str(e)}")
     
     # Final statistics and validation
     total_time = time.time() - start_time
@@ -685,7 +1212,10 @@ def initialize_chroma_db(reset_collections: bool = False):
     # Get validation stats
     validation_stats = embedding_validator.get_stats()
     deduplication_stats = content_deduplicator.get_stats()
-    processing_stats = document_processor.get_processing_stats()
+    processing_stats = defaultdict(int)
+    for job in jobs:
+        for stat_name, stat_value in job.document_processor.get_processing_stats().items():
+            processing_stats[stat_name] += stat_value
     
     # Log comprehensive summary
     logger.info("=" * 80)
@@ -693,6 +1223,10 @@ def initialize_chroma_db(reset_collections: bool = False):
     logger.info("=" * 80)
     logger.info(f"Total collections processed: {total_stats['collections_processed']}")
     logger.info(f"Total documents added: {total_stats['total_documents_added']}")
+    logger.info(f"Total documents updated: {total_stats['total_documents_updated']}")
+    logger.info(f"Total documents deleted: {total_stats['total_documents_deleted']}")
+    logger.info(f"Total documents unchanged: {total_stats['total_documents_unchanged']} "
+                f"({total_stats['collections_unchanged']} collections skipped)")
     logger.info(f"Total processing time: {total_time:.2f}s")
     logger.info("")
     logger.info("VALIDATION STATISTICS:")
@@ -708,6 +1242,28 @@ def initialize_chroma_db(reset_collections: bool = False):
     logger.info("PROCESSING STATISTICS:")
     for stat_name, stat_value in processing_stats.items():
         logger.info(f"  - {stat_name}: {stat_value}")
+    if total_stats["pipelines"]:
+        logger.info("")
+        logger.info("PIPELINE THROUGHPUT (items/s while busy):")
+        for collection_name, pipeline_stats in total_stats["pipelines"].items():
+            stages = ", ".join(
+                f"{stage} {stage_stats['items_per_s']}/s ({stage_stats['busy_s']:.2f}s busy)"
+                for stage, stage_stats in pipeline_stats["stages"].items()
+            )
+            logger.info(f"  {collection_name}: {pipeline_stats['elapsed_s']:.2f}s, bottleneck {pipeline_stats['bottleneck']} - {stages}")
+    if total_stats["write_batches"]:
+        logger.info("")
+        logger.info("WRITE BATCHES:")
+        for collection_name, batch_stats in total_stats["write_batches"].items():
+            for mode, mode_stats in batch_stats.items():
+                if not mode_stats["write_calls"]:
+                    continue
+                logger.info(
+                    f"  {collection_name} ({mode}): {mode_stats['total_added']} documents in {mode_stats['batch_count']} batches "
+                    f"(sizes {mode_stats['min_batch_size_used']}-{mode_stats['max_batch_size_used']}, final {mode_stats['final_batch_size']}), "
+                    f"{mode_stats['documents_per_s']}/s, {mode_stats['bisection_splits']} bisection splits, "
+                    f"{mode_stats['failed_documents']} failed"
+                )
     
     # Generate collection health report
     logger.info("")
@@ -723,7 +1279,8 @@ def initialize_chroma_db(reset_collections: bool = False):
     
     logger.info("=" * 80)
     
-    log_function_return(logger, "initialize_chroma_db", None)
+    log_function_return(logger, "initialize_chroma_db", total_stats)
+    return total_stats
 
 if __name__ == "__main__":
     import argparse
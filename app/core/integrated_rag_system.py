@@ -2,14 +2,22 @@
 import os
 import time
 import logging
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple, AsyncIterator
+from dataclasses import dataclass, asdict
 import uuid
 
 # Import components
 from .semantic_search import SemanticSearch
 from .initialize_chroma_db import initialize_chroma_db
-from .response_generator import ResponseGenerator
+from .response_generator import ResponseGenerator, ERROR_RESPONSE_PREFIX
+from .answer_cache import SemanticAnswerCache, CachedAnswer
+from .ingest_manifest import index_version
+from .config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+)
 
 @dataclass
 class SearchResponse:
@@ -19,6 +27,13 @@ class SearchResponse:
     results: List[Dict[str, Any]]  # Search results with their scores and metadata
     processing_time: float
     metadata: Dict[str, Any]  # e.g., query_analysis, timings
+    query_embedding: Optional[List[float]] = None  # Vector the search used; None if it never embedded the query
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form for API responses (without the query embedding)."""
+        response = asdict(self)
+        response.pop("query_embedding")
+        return response
 
 class OptimizedSearchSystem:
     """Complete and optimized semantic search system."""
@@ -32,6 +47,14 @@ class OptimizedSearchSystem:
         self.is_initialized = False  # Should be set to True after successful DB init
         self.initialization_time = 0.0
         self.response_generator = ResponseGenerator(api_key=self.api_key)
+        self.answer_cache = SemanticAnswerCache(
+            similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            max_entries=ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+            # Ingests run by other processes (index_snapshot build --ingest, incremental
+            # ingest) rewrite the manifests on disk, which drops the cached answers
+            version_provider=lambda: index_version(self.search_engine.chroma_path)
+        ) if ANSWER_CACHE_ENABLED else None
         logging.info("OptimizedSearchSystem created. Call initialize_database() to prepare for queries.")
     
     def _initialize_components(self):
@@ -46,9 +69,7 @@ class OptimizedSearchSystem:
         start_time = time.time()
         try:
             initialize_chroma_db(reset_collections=reset_collections)
-            
-            # Reload collections in search engine to reflect any changes
-            self.search_engine._load_collections() 
+            self.reload()
             
             self.initialization_time = time.time() - start_time
             self.is_initialized = True
@@ -70,6 +91,105 @@ class OptimizedSearchSystem:
             logging.error(f"Error initializing database: {e}", exc_info=True)
             raise
     
+    def reload(self):
+        """Reloads collections and derived indexes after the database changed on disk."""
+        self.search_engine._load_collections()
+        # Cached answers were generated from the previous collection contents
+        if self.answer_cache:
+            self.answer_cache.invalidate()
+    
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Prepares the system to serve queries from the already-built database,
+        without re-running ingestion. Falls back to initialize_database() when
+        the database is empty. A dummy retrieval pages the indexes into memory.
+        """
+        start_time = time.time()
+        self.search_engine._load_collections()
+        total_documents = sum(
+            collection.count()
+            for collection in self.search_engine.collections.values() if collection
+        )
+        if total_documents == 0:
+            logging.info("No documents found in ChromaDB; running initial ingestion.")
+            return self.initialize_database(reset_collections=False)
+        
+        probe = [1.0 / (self.search_engine.embedding_dimensions ** 0.5)] * self.search_engine.embedding_dimensions
+        self.search_engine._search_all_collections(probe, top_k_initial=1)
+        
+        self.initialization_time = time.time() - start_time
+        self.is_initialized = True
+        stats = {
+            "initialization_time": self.initialization_time,
+            "collections_loaded": len(self.search_engine.collections),
+            "total_documents": total_documents,
+            "reset_performed": False
+        }
+        logging.info(f"Search system warm-up completed: {stats}")
+        return stats
+    
+    def close(self):
+        """Releases executor threads and cache handles held by the search engine."""
+        self.search_engine.close()
+    
+    def _analyze_query(self, query_text: str) -> Dict[str, Any]:
+        if not self.search_engine.query_analyzer:
+             raise RuntimeError("Query Analyzer not available in SearchEngine.")
+        query_analysis = self.search_engine.query_analyzer.analyze_query(query_text)
+        query_analysis["original_query"] = query_text
+        return query_analysis
+    
+    def _build_search_response(self, query_id: str, query_text: str, search_results: List[Dict],
+                               query_analysis: Dict[str, Any], search_time: float,
+                               processing_start_time: float,
+                               query_embedding: Optional[List[float]] = None) -> SearchResponse:
+        total_processing_time = time.time() - processing_start_time
+        
+        # Prepare results with detailed information
+        formatted_results = []
+        for result in search_results:
+            formatted_results.append({
+                "id": result.get("id", ""),
+                "collection": result.get("collection", ""),
+                "relevance_score": round(result.get("relevance_score", 0.0), 3),
+                "content": result.get("content", ""),
+                "metadata": result.get("metadata", {}),
+                "has_code_example": result.get("has_code_example", False),
+                "has_field_definition": result.get("has_field_definition", False),
+                "has_method_description": result.get("has_method_description", False)
+            })
+        
+        return SearchResponse(
+            query_id=query_id,
+            query=query_text,
+            results=formatted_results,
+            processing_time=round(total_processing_time, 3),
+            metadata={
+                "query_analysis": query_analysis,
+                "timings": {
+                    "search_sec": round(search_time, 3),
+                    "total_sec": round(total_processing_time, 3)
+                },
+                "num_results": len(search_results)
+            },
+            query_embedding=query_embedding
+        )
+    
+    def _build_error_response(self, query_id: str, query_text: str, error: Exception,
+                              processing_start_time: float,
+                              query_analysis: Optional[Dict[str, Any]]) -> SearchResponse:
+        logging.error(f"Error processing query (ID: {query_id}): {error}", exc_info=True)
+        return SearchResponse(
+            query_id=query_id,
+            query=query_text,
+            results=[],
+            processing_time=round(time.time() - processing_start_time, 3),
+            metadata={
+                "error": str(error), 
+                "query_analysis": query_analysis if query_analysis is not None else {"error": "failed before analysis"}
+            }
+        )
+    
     def search(self, 
               query_text: str,
               top_k: int = 10) -> SearchResponse:
@@ -78,73 +198,259 @@ class OptimizedSearchSystem:
         
         query_id = str(uuid.uuid4())
         processing_start_time = time.time()
+        query_analysis = None
         
         try:
             # Step 1: Analyze Query
-            if not self.search_engine.query_analyzer:
-                 raise RuntimeError("Query Analyzer not available in SearchEngine.")
-            query_analysis = self.search_engine.query_analyzer.analyze_query(query_text)
-            query_analysis["original_query"] = query_text
+            query_analysis = self._analyze_query(query_text)
 
             # Step 2: Search for relevant documents
             search_start_time = time.time()
-            search_results = self.search_engine.search(query_text, query_analysis, top_k=top_k)
+            search_results, query_embedding = self.search_engine.search_with_query_embedding(
+                query_text, query_analysis, top_k=top_k
+            )
             search_time = time.time() - search_start_time
             
-            total_processing_time = time.time() - processing_start_time
-            
-            # Prepare results with detailed information
-            formatted_results = []
-            for result in search_results:
-                formatted_results.append({
-                    "collection": result.get("collection", ""),
-                    "relevance_score": round(result.get("relevance_score", 0.0), 3),
-                    "content": result.get("content", ""),
-                    "metadata": result.get("metadata", {}),
-                    "has_code_example": result.get("has_code_example", False),
-                    "has_field_definition": result.get("has_field_definition", False),
-                    "has_method_description": result.get("has_method_description", False)
-                })
+            return self._build_search_response(
+                query_id, query_text, search_results, query_analysis, search_time, processing_start_time,
+                query_embedding
+            )
+        except Exception as e:
+            return self._build_error_response(query_id, query_text, e, processing_start_time, query_analysis)
+    
+    def search_many(self,
+                    queries: List[str],
+                    top_k: int = 10) -> List[SearchResponse]:
+        """Batch search: embeds all queries together and queries each collection once per batch."""
+        if not self.is_initialized:
+            raise RuntimeError("System not initialized. Call initialize_database() first.")
+        
+        processing_start_time = time.time()
+        query_ids = [str(uuid.uuid4()) for _ in queries]
+        query_analyses = [self._analyze_query(query_text) for query_text in queries]
+        
+        search_start_time = time.time()
+        try:
+            batch_results = self.search_engine.search_many(queries, query_analyses, top_k=top_k)
+        except Exception as e:
+            # The whole batch shares one embedding call and one query per collection, so it fails as a unit
+            return [
+                self._build_error_response(query_id, query_text, e, processing_start_time, query_analysis)
+                for query_id, query_text, query_analysis in zip(query_ids, queries, query_analyses)
+            ]
+        search_time = time.time() - search_start_time
+        
+        return [
+            self._build_search_response(
+                query_id, query_text, search_results, query_analysis, search_time, processing_start_time
+            )
+            for query_id, query_text, search_results, query_analysis
+            in zip(query_ids, queries, batch_results, query_analyses)
+        ]
+    
+    async def search_async(self,
+                           query_text: str,
+                           top_k: int = 10) -> SearchResponse:
+        """Versão assíncrona de search; não bloqueia o event loop."""
+        if not self.is_initialized:
+            raise RuntimeError("System not initialized. Call initialize_database() first.")
+        
+        query_id = str(uuid.uuid4())
+        processing_start_time = time.time()
+        query_analysis = None
+        
+        try:
+            query_analysis = self._analyze_query(query_text)
+
+            search_start_time = time.time()
+            search_results, query_embedding = await self.search_engine.search_with_query_embedding_async(
+                query_text, query_analysis, top_k=top_k
+            )
+            search_time = time.time() - search_start_time
             
-            return SearchResponse(
-                query_id=query_id,
-                query=query_text,
-                results=formatted_results,
-                processing_time=round(total_processing_time, 3),
-                metadata={
-                    "query_analysis": query_analysis,
-                    "timings": {
-                        "search_sec": round(search_time, 3),
-                        "total_sec": round(total_processing_time, 3)
-                    },
-                    "num_results": len(search_results)
-                }
+            return self._build_search_response(
+                query_id, query_text, search_results, query_analysis, search_time, processing_start_time,
+                query_embedding
             )
         except Exception as e:
-            logging.error(f"Error processing query (ID: {query_id}): {e}", exc_info=True)
-            return SearchResponse(
-                query_id=query_id,
-                query=query_text,
-                results=[],
-                processing_time=round(time.time() - processing_start_time, 3),
-                metadata={
-                    "error": str(e), 
-                    "query_analysis": query_analysis if 'query_analysis' in locals() else {"error": "failed before analysis"}
-                }
+            return self._build_error_response(query_id, query_text, e, processing_start_time, query_analysis)
+
+    def _is_answer_cacheable(self, search_response: SearchResponse, conversation_history: Optional[list]) -> bool:
+        # Answers that depend on conversation history or on a failed search are never cached, and
+        # neither are searches that never embedded the query (identifier-only lookups): the cache
+        # is keyed by the search's own vector instead of paying for a separate embedding call
+        return (
+            self.answer_cache is not None
+            and not conversation_history
+            and bool(search_response.results)
+            and "error" not in search_response.metadata
+            and search_response.query_embedding is not None
+        )
+    
+    def _cached_answer(self, search_response: SearchResponse, conversation_history: Optional[list]
+                       ) -> Tuple[Optional[CachedAnswer], Optional[Tuple[List[float], List[str], Optional[str]]]]:
+        """
+        Look up the answer cache for a search. Returns (hit, key): hit is the cached entry or
+        None, and key is the (query embedding, chunk ids, index version) to store a fresh answer
+        under, or None when this answer must not be cached.
+        """
+        if not self._is_answer_cacheable(search_response, conversation_history):
+            return None, None
+        key = (
+            search_response.query_embedding,
+            [result["id"] for result in search_response.results],
+            self.answer_cache.current_version()
+        )
+        return self.answer_cache.get_entry(*key), key
+    
+    @staticmethod
+    def _context_packing(search_response: SearchResponse) -> Optional[Dict[str, Any]]:
+        return search_response.metadata.get('query_analysis', {}).get("context_packing")
+    
+    def _store_answer(self, query_text: str, key: Optional[Tuple[List[float], List[str], Optional[str]]], answer: str,
+                      search_response: SearchResponse):
+        # The packing report is stored with the answer so a hit returns the same response shape as a miss
+        if key is not None and answer and not answer.startswith(ERROR_RESPONSE_PREFIX):
+            query_embedding, chunk_ids, index_version = key
+            self.answer_cache.put(
+                query_text, query_embedding, chunk_ids, answer,
+                context_packing=self._context_packing(search_response),
+                index_version=index_version
             )
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss metrics for the query embedding cache and the answer cache."""
+        embedding_cache = self.search_engine.embedding_cache
+        return {
+            "embedding_cache": embedding_cache.get_stats() if embedding_cache else None,
+            "answer_cache": self.answer_cache.get_stats() if self.answer_cache else None
+        }
+    
+    def get_embedding_stats(self) -> Dict[str, Any]:
+        """Batch-size and queue-wait metrics of the embedding request coalescer."""
+        return {
+            "embedding_model": self.search_engine.embedding_model,
+            "coalescer": self.search_engine.get_embedding_stats()
+        }
 
     def generate_llm_response(self, query_text: str, top_k: int = 10, conversation_history: Optional[list] = None):
         """Run search and generate LLM response using the response generator."""
         search_response = self.search(query_text, top_k=top_k)
+        
+        cached, cache_key = self._cached_answer(search_response, conversation_history)
+        if cached is not None:
+            return {
+                "search_response": search_response,
+                "llm_response": cached.answer,
+                "answer_cache_hit": True,
+                "context_packing": cached.context_packing
+            }
+        
         llm_response = self.response_generator.generate_response(
             query=query_text,
             search_results=search_response.results,
             query_analysis=search_response.metadata.get('query_analysis', {}),
             conversation_history=conversation_history
         )
+        self._store_answer(query_text, cache_key, llm_response, search_response)
         return {
             "search_response": search_response,
-            "llm_response": llm_response
+            "llm_response": llm_response,
+            "answer_cache_hit": False,
+            "context_packing": self._context_packing(search_response)
+        }
+
+    async def generate_llm_response_async(self, query_text: str, top_k: int = 10, conversation_history: Optional[list] = None):
+        """Async counterpart of generate_llm_response for use inside an event loop."""
+        search_response = await self.search_async(query_text, top_k=top_k)
+        
+        cached, cache_key = self._cached_answer(search_response, conversation_history)
+        if cached is not None:
+            return {
+                "search_response": search_response,
+                "llm_response": cached.answer,
+                "answer_cache_hit": True,
+                "context_packing": cached.context_packing
+            }
+        
+        llm_response = await self.response_generator.generate_response_async(
+            query=query_text,
+            search_results=search_response.results,
+            query_analysis=search_response.metadata.get('query_analysis', {}),
+            conversation_history=conversation_history
+        )
+        self._store_answer(query_text, cache_key, llm_response, search_response)
+        return {
+            "search_response": search_response,
+            "llm_response": llm_response,
+            "answer_cache_hit": False,
+            "context_packing": self._context_packing(search_response)
+        }
+
+    async def stream_llm_response_async(self, query_text: str, top_k: int = 10,
+                                        conversation_history: Optional[list] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run search, then stream the LLM response. Yields events as dicts:
+        one "sources" event with the retrieved chunks, then "token" events with
+        generated text, and finally "done" (or "error" if generation fails).
+        """
+        search_response = await self.search_async(query_text, top_k=top_k)
+        yield {
+            "event": "sources",
+            "data": {
+                "query_id": search_response.query_id,
+                "sources": [
+                    {
+                        "collection": result["collection"],
+                        "relevance_score": result["relevance_score"],
+                        "title": result["metadata"].get("title", ""),
+                        "chunk_key": result["metadata"].get("chunk_key", "")
+                    }
+                    for result in search_response.results
+                ],
+                "search_time": search_response.processing_time
+            }
+        }
+        
+        generation_start_time = time.time()
+        cached, cache_key = self._cached_answer(search_response, conversation_history)
+        if cached is not None:
+            yield {"event": "token", "data": {"content": cached.answer}}
+            yield {
+                "event": "done",
+                "data": {
+                    "query_id": search_response.query_id,
+                    "generation_time": 0.0,
+                    "answer_cache_hit": True,
+                    "context_packing": cached.context_packing
+                }
+            }
+            return
+        
+        generated_parts = []
+        try:
+            async for token in self.response_generator.generate_response_stream(
+                query=query_text,
+                search_results=search_response.results,
+                query_analysis=search_response.metadata.get('query_analysis', {}),
+                conversation_history=conversation_history
+            ):
+                generated_parts.append(token)
+                yield {"event": "token", "data": {"content": token}}
+        except Exception as e:
+            logging.error(f"Error streaming response (ID: {search_response.query_id}): {e}", exc_info=True)
+            yield {"event": "error", "data": {"detail": str(e)}}
+            return
+        
+        self._store_answer(query_text, cache_key, "".join(generated_parts).strip(), search_response)
+        yield {
+            "event": "done",
+            "data": {
+                "query_id": search_response.query_id,
+                "generation_time": round(time.time() - generation_start_time, 3),
+                "answer_cache_hit": False,
+                "context_packing": self._context_packing(search_response)
+            }
         }
 
 def create_search_system(api_key: Optional[str] = None) -> OptimizedSearchSystem:
@@ -0,0 +1,194 @@
+# app/core/lexical_index.py
+import json
+import math
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import setup_logging
+
+logger = setup_logging(__name__, "logs/lexical_index.log")
+
+LEXICAL_INDEX_VERSION = 1
+
+_WORD_PATTERN = re.compile(r"[0-9A-Za-z_]+")
+_CAMEL_CASE_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+PORTUGUESE_STOPWORDS = frozenset("""
+a ao aos as ate com como da das de del dele deles do dos e ela elas ele eles em entre era essa esse esta
+este eu foi for ha isso isto ja la mais mas me mesmo meu minha muito na nao nas nem no nos nossa nosso
+num numa o os ou para pela pelas pelo pelos por qual quando que quem se sem ser seu sua sao so tambem
+te tem tu um uma umas uns voce
+the of and to in is for on with by an be this that
+""".split())
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def _light_stem(token: str) -> str:
+    """Normalização leve de plural em português (matriculas -> matricula, funcoes -> funcao)."""
+    if len(token) > 4:
+        if token.endswith("oes") or token.endswith("aes"):
+            return token[:-3] + "ao"
+        if token.endswith("s"):
+            return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenizador para documentação BFC-Script.
+
+    Remove acentos e stopwords em português e aplica stemming leve de plural.
+    Identificadores são indexados inteiros e também quebrados em
+    snake_case/camelCase: "cagedMatricula_importa" gera
+    cagedmatricula_importa, cagedmatricula, caged, matricula e importa.
+    """
+    tokens = []
+    for word in _WORD_PATTERN.findall(_strip_accents(text)):
+        lowered = word.lower().strip("_")
+        if not lowered:
+            continue
+
+        pieces = [part for part in word.split("_") if part]
+        sub_tokens = []
+        if len(pieces) > 1:
+            sub_tokens.extend(part.lower() for part in pieces)
+        for part in pieces:
+            camel_parts = _CAMEL_CASE_PATTERN.findall(part)
+            if len(camel_parts) > 1:
+                sub_tokens.extend(p.lower() for p in camel_parts)
+
+        if lowered not in PORTUGUESE_STOPWORDS:
+            tokens.append(_light_stem(lowered) if not sub_tokens else lowered)
+        for sub_token in sub_tokens:
+            if sub_token not in PORTUGUESE_STOPWORDS and len(sub_token) > 1:
+                tokens.append(_light_stem(sub_token))
+    return tokens
+
+
+class LexicalIndex:
+    """
+    Índice invertido BM25 sobre todas as collections, persistido em JSON.
+    Cada documento é identificado pelo id do Chroma e pela collection de origem.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.doc_collections: List[str] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.avg_doc_length = 0.0
+        self._building: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add_document(self, doc_id: str, collection_name: str, text: str):
+        doc_index = len(self.doc_ids)
+        term_counts = Counter(tokenize(text))
+        self.doc_ids.append(doc_id)
+        self.doc_collections.append(collection_name)
+        self.doc_lengths.append(sum(term_counts.values()))
+        for term, count in term_counts.items():
+            self._building[term].append((doc_index, count))
+
+    def finalize(self):
+        self.postings = dict(self._building)
+        self._building = defaultdict(list)
+        self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    @staticmethod
+    def document_text(content: str, metadata: Dict[str, Any]) -> str:
+        """Texto indexado: identificadores dos metadados seguidos do conteúdo."""
+        identifiers = [
+            metadata.get(field, "")
+            for field in ("title", "function_name", "enum_name", "chunk_key", "section", "subsection")
+        ]
+        return " ".join(str(value) for value in identifiers if value) + "\n" + (content or "")
+
+    def search(self, query: str, top_n: int = 50,
+               collection_names: Optional[Iterable[str]] = None) -> List[Tuple[str, str, float]]:
+        """Retorna [(doc_id, collection, score_bm25)] ordenados por score decrescente."""
+        if not self.doc_ids:
+            return []
+        allowed = set(collection_names) if collection_names is not None else None
+        total_docs = len(self.doc_ids)
+        scores: Dict[int, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            df = len(term_postings)
+            idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+            for doc_index, tf in term_postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_index] / (self.avg_doc_length or 1.0)
+                scores[doc_index] += idf * (tf * (self.k1 + 1)) / (tf + self.k1 * length_norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        hits = []
+        for doc_index, score in ranked:
+            if allowed is not None and self.doc_collections[doc_index] not in allowed:
+                continue
+            hits.append((self.doc_ids[doc_index], self.doc_collections[doc_index], score))
+            if len(hits) >= top_n:
+                break
+        return hits
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": LEXICAL_INDEX_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self.doc_ids,
+            "doc_collections": self.doc_collections,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        Path(tmp_path).replace(path)
+        logger.info(f"Lexical index saved to {path}: {len(self.doc_ids)} documents, {len(self.postings)} terms")
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LexicalIndex"]:
+        if not Path(path).exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != LEXICAL_INDEX_VERSION:
+            logger.warning(f"Ignoring lexical index at {path}: unsupported version {payload.get('version')}")
+            return None
+        index = cls(k1=payload["k1"], b=payload["b"])
+        index.doc_ids = payload["doc_ids"]
+        index.doc_collections = payload["doc_collections"]
+        index.doc_lengths = payload["doc_lengths"]
+        index.postings = {term: [tuple(p) for p in plist] for term, plist in payload["postings"].items()}
+        index.avg_doc_length = sum(index.doc_lengths) / len(index.doc_lengths) if index.doc_lengths else 0.0
+        return index
+
+    @classmethod
+    def build_from_collections(cls, collections: Dict[str, Any], page_size: int = 1000) -> "LexicalIndex":
+        """Constrói o índice a partir do conteúdo atual das collections do Chroma."""
+        start_time = time.time()
+        index = cls()
+        for collection_name, collection in collections.items():
+            count = collection.count()
+            for offset in range(0, count, page_size):
+                page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+                metadatas = page.get("metadatas") or [{}] * len(page["ids"])
+                for doc_id, content, metadata in zip(page["ids"], page["documents"], metadatas):
+                    index.add_document(doc_id, collection_name, cls.document_text(content, metadata or {}))
+        index.finalize()
+        logger.info(f"Lexical index built with {len(index)} documents in {time.time() - start_time:.2f}s")
+        return index
@@ -0,0 +1,89 @@
+# app/core/mmr_reranker.py
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .config import setup_logging
+
+logger = setup_logging(__name__, "logs/mmr_reranker.log")
+
+
+def mmr_select(embeddings: np.ndarray, relevance: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """
+    Seleção por Maximal Marginal Relevance.
+
+    embeddings deve estar L2-normalizado (linhas zeradas não penalizam nem são
+    penalizadas). As similaridades par a par saem de um único produto matricial
+    e a similaridade máxima de cada candidato com o conjunto já escolhido é
+    mantida incrementalmente, então a seleção custa O(k·n) após o produto.
+    Retorna os índices escolhidos, em ordem de seleção.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    similarities = embeddings @ embeddings.T
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected: List[int] = []
+
+    for step in range(k):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity if step else relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarities[:, best], out=max_similarity)
+
+    return selected
+
+
+class MMRReranker:
+    """
+    Reranker de diversidade sobre os candidatos já pontuados (boost de título e
+    fusão híbrida incluídos). Evita que o top_k seja preenchido por partes
+    quase idênticas de uma mesma função. O lambda é escolhido pelas intenções
+    da query; com várias intenções vale o maior (o mais conservador).
+    """
+
+    def __init__(self, default_lambda: float = 0.7,
+                 lambda_by_intent: Optional[Dict[str, float]] = None,
+                 candidate_pool: int = 50):
+        self.default_lambda = default_lambda
+        self.lambda_by_intent = dict(lambda_by_intent or {})
+        self.candidate_pool = candidate_pool
+
+    def lambda_for(self, query_analysis: Dict[str, Any]) -> float:
+        intent_lambdas = [
+            self.lambda_by_intent[intent]
+            for intent in query_analysis.get("intents", [])
+            if intent in self.lambda_by_intent
+        ]
+        return max(intent_lambdas) if intent_lambdas else self.default_lambda
+
+    def rerank(self, relevance: np.ndarray, embeddings: Optional[np.ndarray],
+               query_analysis: Dict[str, Any], top_k: int) -> List[int]:
+        """
+        Recebe os candidatos ordenados por relevance_score decrescente e os
+        respectivos vetores (linhas zeradas contam como ortogonais aos demais).
+        Retorna os índices escolhidos, em ordem de seleção.
+        """
+        lambda_mult = self.lambda_for(query_analysis)
+        pool_size = min(len(relevance), max(self.candidate_pool, top_k))
+        query_analysis["reranking"] = {
+            "strategy": "mmr",
+            "lambda": lambda_mult,
+            "candidates": pool_size
+        }
+        if lambda_mult >= 1.0 or pool_size <= 1 or embeddings is None:
+            return list(range(min(top_k, pool_size)))
+
+        pool = np.array(embeddings[:pool_size], dtype=np.float32)
+        norms = np.linalg.norm(pool, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        pool /= norms
+
+        selected = mmr_select(pool, np.asarray(relevance[:pool_size], dtype=np.float32), top_k, lambda_mult)
+        logger.debug(f"MMR (lambda={lambda_mult}) picked {selected} from {pool_size} candidates")
+        return selected
@@ -1,8 +1,13 @@
 import os
 import logging
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
+from typing import List, Dict, Any, Optional, AsyncIterator
+from openai import OpenAI, AsyncOpenAI
 from ..utils.prompts import RAG_SYSTEM_PROMPT
+from .config import CONTEXT_PACKING_ENABLED, CONTEXT_TOKEN_BUDGET, CONTEXT_MIN_FRAGMENT_TOKENS
+from .context_packer import ContextPacker, format_context_block
+
+# Prefixo das respostas de erro, para que não sejam reaproveitadas por caches
+ERROR_RESPONSE_PREFIX = "Desculpe, ocorreu um erro ao gerar a resposta"
 
 class ResponseGenerator:
     """Response generator using GPT-4o-mini."""
@@ -13,6 +18,11 @@ class ResponseGenerator:
             raise ValueError("API key is required")
         
         self.client = OpenAI(api_key=self.api_key)
+        self.async_client = AsyncOpenAI(api_key=self.api_key)
+        self.context_packer = ContextPacker(
+            token_budget=CONTEXT_TOKEN_BUDGET,
+            min_fragment_tokens=CONTEXT_MIN_FRAGMENT_TOKENS
+        ) if CONTEXT_PACKING_ENABLED else None
         logging.info("ResponseGenerator initialized with GPT-4o-mini")
     
     def _prepare_prompt(self, 
@@ -25,18 +35,24 @@ class ResponseGenerator:
         1. Histórico da Conversa (se houver).
         2. Mensagem de Sistema: Contém apenas as regras (RAG_SYSTEM_PROMPT).
         3. Mensagem de Usuário: Contém o contexto recuperado e a query atual.
+        
+        Com o empacotamento de contexto ativo, os resultados entram em ordem de
+        ranking até o orçamento de tokens, e as decisões ficam registradas em
+        query_analysis["context_packing"].
         """
         try:
             # Formata o contexto dos resultados da busca
-            context_parts = []
-            for result in search_results:
-                if isinstance(result, dict):
-                    collection = result.get('collection', 'unknown')
-                    content = result.get('content', '')
-                    # Adiciona uma formatação clara para cada parte do contexto
-                    context_parts.append(f"### Bloco de Documentação (Fonte: {collection})\n{content}")
-                else:
-                    context_parts.append(str(result))
+            if self.context_packer is not None:
+                context_parts, packing_report = self.context_packer.pack(search_results)
+                query_analysis["context_packing"] = packing_report
+            else:
+                context_parts = []
+                for result in search_results:
+                    if isinstance(result, dict):
+                        # Adiciona uma formatação clara para cada parte do contexto
+                        context_parts.append(format_context_block(result.get('collection', 'unknown'), result.get('content', '')))
+                    else:
+                        context_parts.append(str(result))
             
             context = "\n\n".join(context_parts)
             
@@ -73,6 +89,17 @@ class ResponseGenerator:
             logging.error(f"Erro ao preparar o prompt: {e}", exc_info=True)
             raise
     
+    def _completion_params(self) -> Dict[str, Any]:
+        """Parâmetros do modelo compartilhados pelas versões síncrona e assíncrona."""
+        return {
+            "model": "gpt-4o-mini",
+            "temperature": 0.4, # Um pouco mais baixo para seguir regras estritas
+            "max_tokens": 4096,
+            "top_p": 0.4,
+            "frequency_penalty": 0.0,
+            "presence_penalty": 0.0
+        }
+    
     def generate_response(self,
                          query: str,
                          search_results: List[Dict[str, Any]],
@@ -90,13 +117,8 @@ class ResponseGenerator:
             
             # Gera a resposta
             response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
                 messages=messages,
-                temperature=0.4, # Um pouco mais baixo para seguir regras estritas
-                max_tokens=4096,
-                top_p=0.4,
-                frequency_penalty=0.0,
-                presence_penalty=0.0
+                **self._completion_params()
             )
             
             # Extrai e retorna o conteúdo da resposta
@@ -104,4 +126,54 @@ class ResponseGenerator:
             
         except Exception as e:
             logging.error(f"Erro ao gerar a resposta: {e}", exc_info=True)
-            return f"Desculpe, ocorreu um erro ao gerar a resposta: {str(e)}"
\ No newline at end of file
+            return f"{ERROR_RESPONSE_PREFIX}: {str(e)}"
+    
+    async def generate_response_async(self,
+                                      query: str,
+                                      search_results: List[Dict[str, Any]],
+                                      query_analysis: Dict[str, Any],
+                                      conversation_history: Optional[List[tuple]] = None) -> str:
+        """Versão assíncrona de generate_response usando AsyncOpenAI."""
+        try:
+            messages = self._prepare_prompt(
+                query=query,
+                search_results=search_results,
+                query_analysis=query_analysis,
+                conversation_history=conversation_history
+            )
+            
+            response = await self.async_client.chat.completions.create(
+                messages=messages,
+                **self._completion_params()
+            )
+            
+            return response.choices[0].message.content.strip()
+            
+        except Exception as e:
+            logging.error(f"Erro ao gerar a resposta: {e}", exc_info=True)
+            return f"{ERROR_RESPONSE_PREFIX}: {str(e)}"
+    
+    async def generate_response_stream(self,
+                                       query: str,
+                                       search_results: List[Dict[str, Any]],
+                                       query_analysis: Dict[str, Any],
+                                       conversation_history: Optional[List[tuple]] = None) -> AsyncIterator[str]:
+        """Gera a resposta em streaming, produzindo os trechos de texto à medida que chegam do modelo."""
+        messages = self._prepare_prompt(
+            query=query,
+            search_results=search_results,
+            query_analysis=query_analysis,
+            conversation_history=conversation_history
+        )
+        
+        stream = await self.async_client.chat.completions.create(
+            messages=messages,
+            stream=True,
+            **self._completion_params()
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
@@ -0,0 +1,198 @@
+# app/core/result_set.py
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+def object_array(values: Sequence[Any]) -> np.ndarray:
+    """Array de referências (sem copiar strings/dicts) que aceita indexação vetorizada."""
+    array = np.empty(len(values), dtype=object)
+    if len(values):
+        array[:] = values
+    return array
+
+
+class ResultSet:
+    """
+    Candidatos de uma busca em layout struct-of-arrays.
+
+    Scores e distâncias ficam em arrays NumPy; ids, documentos, metadados e
+    collections são arrays de referências para os objetos devolvidos pelo
+    Chroma (ou pelo índice unificado). Filtros, limiares e ordenação operam
+    sobre índices, e os dicts consumidos pelo restante da aplicação só são
+    montados em to_dicts para os resultados finais.
+    """
+
+    def __init__(self,
+                 ids: np.ndarray,
+                 documents: np.ndarray,
+                 metadatas: np.ndarray,
+                 collections: np.ndarray,
+                 distances: np.ndarray,
+                 scores: Optional[np.ndarray] = None,
+                 embeddings: Optional[np.ndarray] = None,
+                 identifier_match: Optional[np.ndarray] = None,
+                 vector_scores: Optional[np.ndarray] = None,
+                 lexical_ranks: Optional[np.ndarray] = None):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.collections = collections
+        self.distances = np.asarray(distances, dtype=np.float32)
+        # Score is based purely on distance
+        self.scores = self.distances_to_scores(self.distances) if scores is None else scores
+        self.embeddings = embeddings
+        self.identifier_match = (
+            np.zeros(len(ids), dtype=bool) if identifier_match is None else identifier_match
+        )
+        # Preenchidos pela fusão híbrida: score vetorial original e posição no ranking BM25 (0 = ausente)
+        self.vector_scores = vector_scores
+        self.lexical_ranks = lexical_ranks
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def distances_to_scores(distances: np.ndarray) -> np.ndarray:
+        return np.minimum(1.0 - (np.asarray(distances, dtype=np.float32) / 2.0), 1.0)
+
+    @classmethod
+    def empty(cls) -> "ResultSet":
+        return cls(
+            ids=object_array([]),
+            documents=object_array([]),
+            metadatas=object_array([]),
+            collections=object_array([]),
+            distances=np.empty(0, dtype=np.float32)
+        )
+
+    @classmethod
+    def from_hits(cls, collection_name: str, ids: Sequence[str], documents: Sequence[str],
+                  metadatas: Optional[Sequence[Optional[Dict[str, Any]]]], distances: Sequence[float],
+                  embeddings: Optional[Any] = None) -> "ResultSet":
+        """
+        Monta o conjunto a partir das listas paralelas de um collection.query/get.
+        Sem documents (busca em duas fases) o conteúdo fica pendente até hydrate_from.
+        """
+        count = len(ids)
+        metadatas = [metadata or {} for metadata in metadatas] if metadatas else [{}] * count
+        collections = np.empty(count, dtype=object)
+        collections[:] = collection_name
+        return cls(
+            ids=object_array(ids),
+            documents=object_array(documents if documents is not None else [None] * count),
+            metadatas=object_array(metadatas),
+            collections=collections,
+            distances=np.asarray(distances, dtype=np.float32),
+            embeddings=np.asarray(embeddings, dtype=np.float32) if embeddings is not None and count else None
+        )
+
+    @classmethod
+    def concat(cls, result_sets: Iterable["ResultSet"]) -> "ResultSet":
+        """
+        Concatena vários conjuntos. Se só parte deles tiver embeddings, as linhas
+        dos demais ficam zeradas (o MMR as trata como ortogonais).
+        """
+        parts = [part for part in result_sets if len(part)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+
+        embeddings = None
+        dimensions = next((part.embeddings.shape[1] for part in parts if part.embeddings is not None), None)
+        if dimensions is not None:
+            embeddings = np.vstack([
+                part.embeddings if part.embeddings is not None
+                else np.zeros((len(part), dimensions), dtype=np.float32)
+                for part in parts
+            ])
+
+        def optional_column(name: str, fill: Any, dtype: Any) -> Optional[np.ndarray]:
+            if all(getattr(part, name) is None for part in parts):
+                return None
+            return np.concatenate([
+                getattr(part, name) if getattr(part, name) is not None else np.full(len(part), fill, dtype=dtype)
+                for part in parts
+            ])
+
+        return cls(
+            ids=np.concatenate([part.ids for part in parts]),
+            documents=np.concatenate([part.documents for part in parts]),
+            metadatas=np.concatenate([part.metadatas for part in parts]),
+            collections=np.concatenate([part.collections for part in parts]),
+            distances=np.concatenate([part.distances for part in parts]),
+            scores=np.concatenate([part.scores for part in parts]),
+            embeddings=embeddings,
+            identifier_match=np.concatenate([part.identifier_match for part in parts]),
+            vector_scores=optional_column("vector_scores", np.nan, np.float32),
+            lexical_ranks=optional_column("lexical_ranks", 0, np.int32)
+        )
+
+    def take(self, indices: np.ndarray) -> "ResultSet":
+        """Subconjunto (ou reordenação) pelos índices ou máscara booleana informados."""
+        return ResultSet(
+            ids=self.ids[indices],
+            documents=self.documents[indices],
+            metadatas=self.metadatas[indices],
+            collections=self.collections[indices],
+            distances=self.distances[indices],
+            scores=self.scores[indices],
+            embeddings=self.embeddings[indices] if self.embeddings is not None else None,
+            identifier_match=self.identifier_match[indices],
+            vector_scores=self.vector_scores[indices] if self.vector_scores is not None else None,
+            lexical_ranks=self.lexical_ranks[indices] if self.lexical_ranks is not None else None
+        )
+
+    def pending_content(self) -> np.ndarray:
+        """Índices cujo documento ainda não foi lido do Chroma."""
+        return np.flatnonzero(np.fromiter((doc is None for doc in self.documents), dtype=bool, count=len(self)))
+
+    def hydrate_from(self, contents: Dict[str, Any]):
+        """Preenche documento e metadados pendentes a partir de {id: (documento, metadados)}."""
+        pending = self.pending_content()
+        if not len(pending):
+            return
+        self.documents = self.documents.copy()
+        self.metadatas = self.metadatas.copy()
+        for index in pending:
+            document, metadata = contents.get(self.ids[index], ("", {}))
+            self.documents[index] = document or ""
+            self.metadatas[index] = metadata or {}
+
+    def above(self, min_score: float) -> "ResultSet":
+        """Mantém apenas os candidatos com score >= min_score, preservando a ordem."""
+        keep = self.scores >= min_score
+        return self if keep.all() else self.take(np.flatnonzero(keep))
+
+    def ranked(self) -> "ResultSet":
+        """Ordena por score decrescente (estável: empates mantêm a ordem de chegada)."""
+        return self.take(np.argsort(-self.scores, kind="stable"))
+
+    def to_dict(self, index: int) -> Dict[str, Any]:
+        content = self.documents[index]
+        result = {
+            "id": self.ids[index],
+            "content": content,
+            "metadata": self.metadatas[index],
+            "distance": float(self.distances[index]),
+            "collection": self.collections[index],
+            "relevance_score": float(self.scores[index]),
+            "has_code_example": "Code Example:" in content or "```" in content,
+            "has_field_definition": "Types:" in content or "Fields:" in content,
+            "has_method_description": "Method:" in content or "Description:" in content
+        }
+        if self.identifier_match[index]:
+            result["identifier_match"] = True
+        if self.vector_scores is not None:
+            vector_score = self.vector_scores[index]
+            result["vector_score"] = None if np.isnan(vector_score) else float(vector_score)
+        if self.lexical_ranks is not None:
+            result["lexical_rank"] = int(self.lexical_ranks[index]) or None
+        return result
+
+    def to_dicts(self, indices: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Materializa os dicts de resultado apenas para os índices pedidos (todos por padrão)."""
+        if indices is None:
+            indices = range(len(self))
+        return [self.to_dict(int(index)) for index in indices]
@@ -1,14 +1,62 @@
 # app/core/semantic_search.py
 import os
 import time
+import asyncio
+import re
 import chromadb
 from chromadb.config import Settings
-from openai import OpenAI
 import numpy as np
-import re
-from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Dict, Any, Optional, Tuple, Union
 import logging
-from .config import setup_logging
+from .config import (
+    setup_logging,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MEMORY_SIZE,
+    EMBEDDING_CACHE_DISK_SIZE,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    EMBEDDING_COALESCER_ENABLED,
+    EMBEDDING_COALESCER_MAX_BATCH_SIZE,
+    EMBEDDING_COALESCER_MAX_WAIT_MS,
+    EMBEDDING_COALESCER_MAX_IN_FLIGHT,
+    SEARCH_PARALLEL_ENABLED,
+    SEARCH_MAX_WORKERS,
+    SEARCH_COLLECTION_TIMEOUT_SECONDS,
+    SEARCH_ENGINE,
+    EXACT_INDEX_DIRNAME,
+    SEARCH_EXACT_DTYPE,
+    SEARCH_EXACT_COLLECTIONS,
+    SEARCH_EXACT_BLOCK_ROWS,
+    SEARCH_ADAPTIVE_DEPTH,
+    SEARCH_ADAPTIVE_INITIAL_DEPTH,
+    SEARCH_ADAPTIVE_GROWTH_FACTOR,
+    SEARCH_ADAPTIVE_SCORE_MARGIN,
+    SEARCH_BATCH_EMBEDDING_SIZE,
+    SEARCH_BATCH_QUERY_SIZE,
+    SEARCH_TWO_PHASE_FETCH,
+    LEXICAL_INDEX_FILENAME,
+    SEARCH_HYBRID_ENABLED,
+    SEARCH_HYBRID_LEXICAL_TOP_N,
+    SEARCH_RRF_K,
+    IDENTIFIER_INDEX_FILENAME,
+    SEARCH_IDENTIFIER_LOOKUP_ENABLED,
+    SEARCH_IDENTIFIER_SKIP_ANN,
+    SEARCH_MMR_ENABLED,
+    SEARCH_MMR_LAMBDA,
+    SEARCH_MMR_LAMBDA_BY_INTENT,
+    SEARCH_MMR_CANDIDATE_POOL,
+)
+from .embedding_cache import EmbeddingCache
+from .embedding_provider import EmbeddingProvider, create_embedding_provider
+from .embedding_coalescer import EmbeddingCoalescer
+from .vector_index import UnifiedVectorIndex
+from .exact_index import ExactVectorIndex
+from .lexical_index import LexicalIndex, PORTUGUESE_STOPWORDS
+from .identifier_index import IdentifierIndex, normalize_for_identifier_match
+from .mmr_reranker import MMRReranker
+from .result_set import ResultSet
+from ..utils.chunk_keys import chunk_family
 
 logger = setup_logging(__name__, "logs/semantic_search.log")
 
@@ -53,12 +101,12 @@ class BasicQueryAnalyzer:
         return analysis
 
 class SemanticSearch:
-    def __init__(self, api_key=None, chroma_path="./chroma_db"):
+    def __init__(self, api_key=None, chroma_path="./chroma_db",
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 search_engine: Optional[str] = None,
+                 embedding_provider: Optional[EmbeddingProvider] = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
-            raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable or pass it to the constructor.")
-        
-        self.client = OpenAI(api_key=self.api_key)
+        self.embedding_provider = self._initialize_embedding_provider(embedding_provider)
         self.chroma_path = chroma_path
         
         self.chroma_client = chromadb.PersistentClient(
@@ -66,12 +114,44 @@ class SemanticSearch:
             settings=Settings(anonymized_telemetry=False)
         )
         
-        self._load_collections()
+        self.embedding_model = self.embedding_provider.model_name
+        self.embedding_dimensions = self.embedding_provider.dimensions
+        self.embedding_cache = embedding_cache or self._initialize_embedding_cache()
+        self.search_engine = search_engine or SEARCH_ENGINE
+        self.unified_index: Optional[UnifiedVectorIndex] = None
+        self.exact_index: Optional[ExactVectorIndex] = None
+        self.two_phase_fetch = SEARCH_TWO_PHASE_FETCH
+        self.hybrid_search = SEARCH_HYBRID_ENABLED
+        self.hybrid_lexical_top_n = SEARCH_HYBRID_LEXICAL_TOP_N
+        self.rrf_k = SEARCH_RRF_K
+        self.lexical_index: Optional[LexicalIndex] = None
+        self.identifier_lookup = SEARCH_IDENTIFIER_LOOKUP_ENABLED
+        self.identifier_skip_ann = SEARCH_IDENTIFIER_SKIP_ANN
+        self.identifier_index: Optional[IdentifierIndex] = None
+        
         self._initialize_reranker()
+        self._load_collections()
         self._initialize_query_analyzer()
         
         self.max_results_per_collection = 100 
         self.min_relevance_score = 0.1
+        
+        # Profundidade adaptativa: max_results_per_collection passa a ser o teto
+        self.adaptive_depth = SEARCH_ADAPTIVE_DEPTH
+        self.adaptive_initial_depth = SEARCH_ADAPTIVE_INITIAL_DEPTH
+        self.adaptive_growth_factor = max(2, SEARCH_ADAPTIVE_GROWTH_FACTOR)
+        self.adaptive_score_margin = SEARCH_ADAPTIVE_SCORE_MARGIN
+        
+        self.batch_embedding_size = SEARCH_BATCH_EMBEDDING_SIZE
+        self.batch_query_size = SEARCH_BATCH_QUERY_SIZE
+        
+        # Executor reutilizável para consultar as collections em paralelo
+        self.parallel_search = SEARCH_PARALLEL_ENABLED
+        self.collection_timeout = SEARCH_COLLECTION_TIMEOUT_SECONDS
+        self._search_executor = (
+            ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS, thread_name_prefix="collection-search")
+            if self.parallel_search else None
+        )
     
     def _load_collections(self):
         try:
@@ -82,187 +162,891 @@ class SemanticSearch:
                 self.collections[collection_name] = self.chroma_client.get_collection(collection_name)
                 count = self.collections[collection_name].count()
                 logger.info(f"Loaded collection: {collection_name} with {count} documents")
+                self._check_embedding_model(self.collections[collection_name])
             logger.info(f"Loaded {len(self.collections)} collections")
         except Exception as e:
             logger.error(f"Error loading collections: {str(e)}")
             self.collections = {}
+        
+        self._load_identifier_index()
+        
+        if self.hybrid_search:
+            self._load_lexical_index()
+        
+        if self.search_engine == "unified":
+            self._load_unified_index()
+        elif self.search_engine == "exact":
+            self._load_exact_index()
     
-    def get_embedding(self, text: str) -> List[float]:
+    def _check_embedding_model(self, collection):
+        """Avisa quando a collection foi ingerida com outro backend de embeddings (vetores incomparáveis)."""
+        ingested_model = (collection.metadata or {}).get("embedding_model")
+        if ingested_model and ingested_model != self.embedding_model:
+            logger.warning(
+                f"Collection {collection.name} was ingested with embedding model '{ingested_model}' "
+                f"but queries use '{self.embedding_model}'; distances will not be meaningful"
+            )
+    
+    def _load_identifier_index(self):
+        """Carrega o mapa identificador -> chunks gravado na ingestão (ou o reconstrói a partir das collections)."""
+        index_path = os.path.join(self.chroma_path, IDENTIFIER_INDEX_FILENAME)
         try:
-            max_tokens_for_embedding = 8000 
-            if len(text) > max_tokens_for_embedding:
-                text = text[:max_tokens_for_embedding]
-                logger.warning(f"Text truncated to {max_tokens_for_embedding} characters for embedding")
-            
-            response = self.client.embeddings.create(
-                model="text-embedding-3-small",
-                input=text,
-                dimensions=512 
+            self.identifier_index = IdentifierIndex.load(index_path)
+            if self.identifier_index is None:
+                logger.warning(f"Identifier index not found at {index_path}; building it from the collections")
+                self.identifier_index = IdentifierIndex.build_from_collections(self.collections)
+            logger.info(f"Loaded identifier index with {len(self.identifier_index)} identifiers")
+        except Exception as e:
+            logger.error(f"Error loading identifier index: {str(e)}")
+            self.identifier_index = None
+    
+    def _load_lexical_index(self):
+        index_path = os.path.join(self.chroma_path, LEXICAL_INDEX_FILENAME)
+        try:
+            self.lexical_index = LexicalIndex.load(index_path)
+            if self.lexical_index:
+                logger.info(f"Loaded lexical index with {len(self.lexical_index)} documents")
+            else:
+                logger.warning(f"Lexical index not found at {index_path}; hybrid search disabled until the next ingest")
+        except Exception as e:
+            logger.error(f"Error loading lexical index: {str(e)}")
+            self.lexical_index = None
+    
+    def _find_identifiers(self, query: str) -> List[str]:
+        if not self.identifier_lookup or not self.identifier_index:
+            return []
+        return self.identifier_index.find(query)
+    
+    def _is_identifier_only_query(self, query: str) -> bool:
+        """True quando, removidos os identificadores citados, sobram apenas stopwords."""
+        if not self.identifier_index:
+            return False
+        text = normalize_for_identifier_match(query)
+        spans = self.identifier_index.match_spans(query)
+        if not spans:
+            return False
+        covered = [False] * len(text)
+        for start, end in spans:
+            covered[start:end] = [True] * (end - start)
+        remainder = "".join(" " if is_covered else char for char, is_covered in zip(text, covered))
+        return all(
+            token in PORTUGUESE_STOPWORDS
+            for token in re.split(r"[\W_]+", remainder) if token
+        )
+    
+    def _load_unified_index(self):
+        try:
+            index = UnifiedVectorIndex()
+            index.load(self.collections)
+            self.unified_index = index
+        except Exception as e:
+            logger.error(f"Error loading unified index, falling back to Chroma queries: {str(e)}")
+            self.unified_index = None
+    
+    def _load_exact_index(self):
+        try:
+            index = ExactVectorIndex(
+                os.path.join(self.chroma_path, EXACT_INDEX_DIRNAME),
+                dtype=SEARCH_EXACT_DTYPE,
+                block_rows=SEARCH_EXACT_BLOCK_ROWS
             )
-            embedding = response.data[0].embedding
-            logger.info(f"Generated embedding of length {len(embedding)}")
-            return embedding
+            index.load(self.collections, SEARCH_EXACT_COLLECTIONS or None)
+            self.exact_index = index
+        except Exception as e:
+            logger.error(f"Error loading exact index, falling back to Chroma queries: {str(e)}")
+            self.exact_index = None
+    
+    def _initialize_embedding_provider(self, provider: Optional[EmbeddingProvider]) -> EmbeddingProvider:
+        provider = provider or create_embedding_provider(api_key=self.api_key)
+        if not (EMBEDDING_COALESCER_ENABLED and provider.coalesce_requests):
+            return provider
+        logger.info(
+            f"Coalescing concurrent embedding calls (up to {EMBEDDING_COALESCER_MAX_BATCH_SIZE} texts "
+            f"or {EMBEDDING_COALESCER_MAX_WAIT_MS} ms per request)"
+        )
+        return EmbeddingCoalescer(
+            provider,
+            max_batch_size=EMBEDDING_COALESCER_MAX_BATCH_SIZE,
+            max_wait_ms=EMBEDDING_COALESCER_MAX_WAIT_MS,
+            max_in_flight=EMBEDDING_COALESCER_MAX_IN_FLIGHT
+        )
+    
+    def get_embedding_stats(self) -> Optional[Dict[str, Any]]:
+        """Métricas de tamanho de lote e espera na fila do coalescer (None quando desativado)."""
+        if isinstance(self.embedding_provider, EmbeddingCoalescer):
+            return self.embedding_provider.get_stats()
+        return None
+    
+    def _initialize_embedding_cache(self) -> Optional[EmbeddingCache]:
+        if not EMBEDDING_CACHE_ENABLED:
+            logger.info("Query embedding cache disabled")
+            return None
+        try:
+            cache = EmbeddingCache(
+                db_path=EMBEDDING_CACHE_PATH,
+                max_memory_entries=EMBEDDING_CACHE_MEMORY_SIZE,
+                max_disk_entries=EMBEDDING_CACHE_DISK_SIZE,
+                ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS
+            )
+            logger.info("Query embedding cache initialized successfully")
+            return cache
+        except Exception as e:
+            logger.error(f"Error initializing query embedding cache: {str(e)}")
+            return None
+    
+    def _truncate_for_embedding(self, text: str) -> str:
+        max_tokens_for_embedding = 8000 
+        if len(text) > max_tokens_for_embedding:
+            text = text[:max_tokens_for_embedding]
+            logger.warning(f"Text truncated to {max_tokens_for_embedding} characters for embedding")
+        return text
+    
+    def _get_cached_embedding(self, text: str) -> Optional[List[float]]:
+        if not self.embedding_cache:
+            return None
+        cached = self.embedding_cache.get(text, self.embedding_model, self.embedding_dimensions)
+        if cached is not None:
+            logger.info(f"Embedding cache hit ({len(cached)} dims)")
+        return cached
+    
+    def _store_embedding(self, text: str, embedding: List[float]):
+        logger.info(f"Generated embedding of length {len(embedding)}")
+        if self.embedding_cache:
+            self.embedding_cache.put(text, self.embedding_model, self.embedding_dimensions, embedding)
+    
+    def get_embedding(self, text: str) -> List[float]:
+        """
+        Embedding da query pelo backend configurado. Falhas do backend são
+        propagadas (a busca devolve zero resultados em vez de ranquear por um
+        vetor sem significado).
+        """
+        text = self._truncate_for_embedding(text)
+        cached = self._get_cached_embedding(text)
+        if cached is not None:
+            return cached
+        
+        try:
+            embedding = self.embedding_provider.embed_one(text)
+        except Exception as e:
+            logger.error(f"Error getting embedding: {str(e)}")
+            raise
+        self._store_embedding(text, embedding)
+        return embedding
+    
+    async def get_embedding_async(self, text: str) -> List[float]:
+        """Versão assíncrona de get_embedding."""
+        text = self._truncate_for_embedding(text)
+        cached = self._get_cached_embedding(text)
+        if cached is not None:
+            return cached
+        
+        try:
+            embedding = await self.embedding_provider.embed_one_async(text)
         except Exception as e:
             logger.error(f"Error getting embedding: {str(e)}")
-            return np.random.rand(512).tolist() 
+            raise
+        self._store_embedding(text, embedding)
+        return embedding
+    
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Gera embeddings para vários textos. Os acertos do cache são reaproveitados
+        e os demais são enviados ao backend em lotes de batch_embedding_size.
+        Se algum lote falhar, o erro é propagado.
+        """
+        texts = [self._truncate_for_embedding(text) for text in texts]
+        embeddings: List[Optional[List[float]]] = [self._get_cached_embedding(text) for text in texts]
+        
+        # Textos repetidos no lote são enviados uma única vez
+        pending: Dict[str, List[int]] = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                pending.setdefault(texts[i], []).append(i)
+        pending_texts = list(pending)
+        
+        for start in range(0, len(pending_texts), self.batch_embedding_size):
+            chunk = pending_texts[start:start + self.batch_embedding_size]
+            try:
+                chunk_embeddings = self.embedding_provider.embed(chunk)
+            except Exception as e:
+                logger.error(f"Error getting embeddings for batch of {len(chunk)} texts: {str(e)}")
+                raise
+            for text, embedding in zip(chunk, chunk_embeddings):
+                self._store_embedding(text, embedding)
+                for i in pending[text]:
+                    embeddings[i] = embedding
+        
+        logger.info(f"Generated {len(pending_texts)} embeddings for {len(texts)} texts")
+        return embeddings
+    
+    def _query_include(self) -> List[str]:
+        """
+        Campos pedidos ao collection.query. Na busca em duas fases os documentos
+        ficam de fora (e os metadados também, quando o boost de título pode vir
+        do índice de identificadores); os embeddings só vêm quando o reranker MMR os usa.
+        """
+        include = ["distances"]
+        if not self.two_phase_fetch:
+            include += ["documents", "metadatas"]
+        elif not (self.identifier_lookup and self.identifier_index):
+            include.append("metadatas")
+        if self.reranker is not None:
+            include.append("embeddings")
+        return include
+    
+    def _query_result_set(self, collection_name: str, results: Dict[str, Any], q: int = 0) -> ResultSet:
+        """ResultSet da q-ésima query de uma resposta de collection.query, já filtrado por min_relevance_score."""
+        if not results or not results.get('ids') or not len(results['ids'][q]):
+            return ResultSet.empty()
+        embeddings = results.get('embeddings')
+        return ResultSet.from_hits(
+            collection_name,
+            results['ids'][q],
+            results['documents'][q] if results.get('documents') else None,
+            results['metadatas'][q] if results.get('metadatas') else None,
+            results['distances'][q],
+            embeddings=embeddings[q] if embeddings is not None else None
+        ).above(self.min_relevance_score)
     
     def search_collection(self, collection_name: str, query_embedding: List[float], 
-                         top_k_initial: int = 100) -> List[Dict]:
+                         top_k_initial: int = 100) -> ResultSet:
         collection = self.collections.get(collection_name)
         if not collection:
             logger.warning(f"Collection {collection_name} not available for search.")
-            return []
+            return ResultSet.empty()
         
         try:
             results = collection.query(
                 query_embeddings=[query_embedding],
                 n_results=top_k_initial,
-                include=["documents", "metadatas", "distances"]
+                include=self._query_include()
             )
-            
-            formatted_results = []
-            if results and results['documents'] and results['documents'][0]:
-                for i in range(len(results['documents'][0])):
-                    distance = results['distances'][0][i]
-                    # Score is based purely on distance
-                    current_score = 1.0 - (distance / 2.0) 
-                    
-                    content = results['documents'][0][i]
-                    metadata = results['metadatas'][0][i] if results['metadatas'] and results['metadatas'][0] else {}
-                    
-                    if current_score < self.min_relevance_score:
-                        continue
-                    
-                    final_relevance_score = min(current_score, 1.0)
-                    
-                    formatted_results.append({
-                        "content": content,
-                        "metadata": metadata,
-                        "distance": distance,
-                        "collection": collection_name,
-                        "relevance_score": final_relevance_score,
-                        "has_code_example": "Code Example:" in content or "```" in content,
-                        "has_field_definition": "Types:" in content or "Fields:" in content,
-                        "has_method_description": "Method:" in content or "Description:" in content
-                    })
-            
-            return formatted_results
+            return self._query_result_set(collection_name, results)
         except Exception as e:
             logger.error(f"Error searching in collection {collection_name}: {str(e)}")
-            return []
+            return ResultSet.empty()
     
-    def rerank_results(self, results: List[Dict], query: str, query_analysis: Dict[str, Any]) -> List[Dict]:
-        if not results:
-            return []
+    def search_collection_batch(self, collection_name: str, query_embeddings: List[List[float]],
+                                top_k_initial: int = 100) -> List[ResultSet]:
+        """
+        Consulta uma collection com vários embeddings por chamada de collection.query.
+        Cada query do lote vira um ResultSet filtrado por min_relevance_score.
+        """
+        collection = self.collections.get(collection_name)
+        if not collection:
+            logger.warning(f"Collection {collection_name} not available for search.")
+            return [ResultSet.empty() for _ in query_embeddings]
         
-        # Simple sort by relevance score
-        results.sort(key=lambda x: x.get("relevance_score", 0.0), reverse=True)
+        batch_results: List[ResultSet] = []
+        for start in range(0, len(query_embeddings), self.batch_query_size):
+            chunk = query_embeddings[start:start + self.batch_query_size]
+            try:
+                results = collection.query(
+                    query_embeddings=chunk,
+                    n_results=top_k_initial,
+                    include=self._query_include()
+                )
+            except Exception as e:
+                logger.error(f"Error searching batch in collection {collection_name}: {str(e)}")
+                batch_results.extend(ResultSet.empty() for _ in chunk)
+                continue
+            
+            batch_results.extend(self._query_result_set(collection_name, results, q) for q in range(len(chunk)))
+        return batch_results
+    
+    def _fetch_results_by_ids(self, ids_by_collection: Dict[str, List[str]],
+                              query_embedding: Optional[List[float]]) -> ResultSet:
+        """
+        Busca documentos por id e calcula a distância de cosseno exata em relação à query.
+        Sem query_embedding (consulta só por identificadores) a distância é 0. Na
+        busca em duas fases o conteúdo só é lido depois, para os resultados finais.
+        """
+        query_vector = None
+        if query_embedding is not None:
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+        include = [] if self.two_phase_fetch else ["documents", "metadatas"]
+        if query_vector is not None:
+            include.append("embeddings")
         
-        # Remove duplicates
-        unique_results = []
-        seen_contents = set()
+        fetched = []
+        for collection_name, ids in ids_by_collection.items():
+            collection = self.collections.get(collection_name)
+            if not collection or not ids:
+                continue
+            try:
+                data = collection.get(ids=ids, include=include)
+            except Exception as e:
+                logger.error(f"Error fetching documents by id from {collection_name}: {str(e)}")
+                continue
+            
+            embeddings = None
+            if query_vector is not None:
+                embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+                norms = np.linalg.norm(embeddings, axis=1)
+                norms[norms == 0] = 1.0
+                distances = 1.0 - (embeddings @ query_vector) / norms
+            else:
+                distances = np.zeros(len(data["ids"]), dtype=np.float32)
+            fetched.append(ResultSet.from_hits(
+                collection_name, data["ids"], data.get("documents"), data.get("metadatas"), distances,
+                embeddings=embeddings
+            ))
+        return ResultSet.concat(fetched)
+    
+    def _hydrate_results(self, result_set: ResultSet, query_analysis: Dict[str, Any]):
+        """Segunda fase: lê documento e metadados dos resultados pendentes, um collection.get por collection."""
+        pending = result_set.pending_content()
+        if not len(pending):
+            return
+        ids_by_collection: Dict[str, List[str]] = {}
+        for index in pending:
+            ids_by_collection.setdefault(result_set.collections[index], []).append(result_set.ids[index])
         
-        for result in results:
-            content_hash = hash(result["content"])
-            if content_hash not in seen_contents:
-                seen_contents.add(content_hash)
-                unique_results.append(result)
+        contents = {}
+        for collection_name, ids in ids_by_collection.items():
+            collection = self.collections.get(collection_name)
+            if not collection:
+                continue
+            try:
+                data = collection.get(ids=ids, include=["documents", "metadatas"])
+            except Exception as e:
+                logger.error(f"Error fetching content by id from {collection_name}: {str(e)}")
+                continue
+            metadatas = data.get("metadatas") or [{}] * len(data["ids"])
+            contents.update(zip(data["ids"], zip(data["documents"], metadatas)))
         
-        return unique_results
+        result_set.hydrate_from(contents)
+        query_analysis.setdefault("retrieval", {})["documents_hydrated"] = len(pending)
+    
+    def _hydrate_metadatas(self, result_set: ResultSet):
+        """
+        Lê só os metadados dos candidatos que vieram sem eles (a busca exata não
+        guarda metadados), um collection.get por collection; o documento continua
+        para a segunda fase.
+        """
+        missing = [index for index, metadata in enumerate(result_set.metadatas) if not metadata]
+        if not missing:
+            return
+        ids_by_collection: Dict[str, List[str]] = {}
+        for index in missing:
+            ids_by_collection.setdefault(result_set.collections[index], []).append(result_set.ids[index])
         
-    def merge_and_rank_results(self, results_by_collection: Dict[str, List[Dict]], query: str, query_analysis: Dict[str, Any], top_k: int = 5) -> List[Dict]:
-        all_results = []
-        for res_list in results_by_collection.values():
-            all_results.extend(res_list)
+        metadatas_by_id = {}
+        for collection_name, ids in ids_by_collection.items():
+            collection = self.collections.get(collection_name)
+            if not collection:
+                continue
+            try:
+                data = collection.get(ids=ids, include=["metadatas"])
+            except Exception as e:
+                logger.error(f"Error fetching metadata by id from {collection_name}: {str(e)}")
+                continue
+            metadatas_by_id.update(zip(data["ids"], data.get("metadatas") or [{}] * len(data["ids"])))
+        
+        result_set.metadatas = result_set.metadatas.copy()
+        for index in missing:
+            result_set.metadatas[index] = metadatas_by_id.get(result_set.ids[index]) or {}
+    
+    def _add_identifier_hits(self, identifiers: List[str], query_embedding: Optional[List[float]],
+                             candidates: ResultSet, collection_names: List[str]) -> ResultSet:
+        """
+        Busca diretamente por id os chunks dos identificadores citados na query e
+        marca-os com identifier_match, que recebe o mesmo boost do título em
+        merge_and_rank_results.
+        """
+        ids_by_collection = {
+            name: ids for name, ids in self.identifier_index.lookup(identifiers).items()
+            if name in collection_names
+        }
+        direct_ids = {doc_id for ids in ids_by_collection.values() for doc_id in ids}
+        known_ids = set(candidates.ids)
+        missing_ids = {
+            name: [doc_id for doc_id in ids if doc_id not in known_ids]
+            for name, ids in ids_by_collection.items()
+        }
+        
+        merged = ResultSet.concat([candidates, self._fetch_results_by_ids(missing_ids, query_embedding)])
+        merged.identifier_match = merged.identifier_match | np.fromiter(
+            (doc_id in direct_ids for doc_id in merged.ids), dtype=bool, count=len(merged)
+        )
+        
+        logger.info(f"Identifier lookup: {identifiers} -> {len(direct_ids)} chunks")
+        return merged
+    
+    def _search_identifiers_only(self, query: str, identifiers: List[str],
+                                 query_analysis: Dict[str, Any], top_k: int) -> List[Dict]:
+        """Responde consultas compostas só por identificadores sem embedding nem ANN."""
+        collection_names = [name for name, collection in self.collections.items() if collection]
+        candidates = self._add_identifier_hits(identifiers, None, ResultSet.empty(), collection_names)
+        query_analysis["retrieval"] = {
+            "mode": "identifier_lookup",
+            "documents_fetched": len(candidates)
+        }
         
+        merged_results = self.merge_and_rank_results(candidates, query, query_analysis, top_k)
+        for result in merged_results:
+            result["query_debug_original"] = query
+        logger.info(f"Found {len(merged_results)} results for query: '{query}' by identifier lookup only.")
+        return merged_results
+    
+    def _apply_hybrid_fusion(self, query: str, query_embedding: List[float],
+                             candidates: ResultSet, collection_names: List[str]) -> ResultSet:
+        """
+        Funde o ranking vetorial com o ranking BM25 por Reciprocal Rank Fusion.
+        Hits lexicais ausentes dos candidatos vetoriais são buscados por id. O
+        score passa a ser o RRF normalizado para [0, 1]; o score vetorial
+        original fica em vector_scores.
+        """
+        if not self.lexical_index:
+            return candidates
+        
+        lexical_hits = self.lexical_index.search(
+            query,
+            top_n=self.hybrid_lexical_top_n,
+            collection_names=collection_names
+        )
+        if not lexical_hits:
+            return candidates
+        
+        known_ids = set(candidates.ids)
+        missing_ids = {}
+        for doc_id, collection_name, _ in lexical_hits:
+            if doc_id not in known_ids:
+                missing_ids.setdefault(collection_name, []).append(doc_id)
+        
+        fused = ResultSet.concat([candidates, self._fetch_results_by_ids(missing_ids, query_embedding)])
+        
+        vector_ranks = np.empty(len(fused), dtype=np.float64)
+        vector_ranks[np.argsort(-fused.scores, kind="stable")] = np.arange(1, len(fused) + 1)
+        lexical_rank_by_id = {doc_id: rank for rank, (doc_id, _, _) in enumerate(lexical_hits, 1)}
+        lexical_ranks = np.fromiter(
+            (lexical_rank_by_id.get(doc_id, 0) for doc_id in fused.ids), dtype=np.int32, count=len(fused)
+        )
+        
+        fused_scores = 1.0 / (self.rrf_k + vector_ranks)
+        in_lexical = lexical_ranks > 0
+        fused_scores[in_lexical] += 1.0 / (self.rrf_k + lexical_ranks[in_lexical])
+        max_fused_score = 2.0 / (self.rrf_k + 1)
+        
+        fused.vector_scores = fused.scores
+        fused.lexical_ranks = lexical_ranks
+        fused.scores = fused_scores / max_fused_score
+        
+        logger.info(f"Hybrid fusion: {len(lexical_hits)} lexical hits, "
+                    f"{sum(len(ids) for ids in missing_ids.values())} fetched outside vector candidates")
+        return fused
+    
+    def rerank_results(self, candidates: ResultSet, query: str, query_analysis: Dict[str, Any],
+                       top_k: int = 5) -> List[int]:
+        """Índices dos top_k finais entre candidatos já ordenados por score (MMR quando habilitado)."""
+        if not len(candidates):
+            return []
+        if self.reranker is None:
+            return list(range(min(top_k, len(candidates))))
+        return self.reranker.rerank(candidates.scores, candidates.embeddings, query_analysis, top_k)
+    
+    def _candidate_pool_size(self, top_k: int) -> int:
+        return max(self.reranker.candidate_pool, top_k) if self.reranker is not None else top_k
+    
+    def merge_and_rank_results(self, candidates: ResultSet, query: str, query_analysis: Dict[str, Any], top_k: int = 5) -> List[Dict]:
         # ================== IMPLEMENTAÇÃO DA CORREÇÃO ==================
         # Normaliza a query substituindo espaços por underscores para corresponder ao formato do título.
         query_normalized_for_title_check = query.lower().replace(" ", "_")
 
-        for result in all_results:
-            title = result.get("metadata", {}).get("title", "")
-            if title and title.lower() in query_normalized_for_title_check:
-                result["relevance_score"] = result.get("relevance_score", 0.0) + 1.0
-                logging.info(f"Score impulsionado para o título correspondente: '{title}'")
+        if not (self.identifier_lookup and self.identifier_index):
+            # Sem o índice de identificadores o boost depende do título nos metadados
+            self._hydrate_metadatas(candidates)
+        titles = [metadata.get("title", "") for metadata in candidates.metadatas]
+        boosted = candidates.identifier_match | np.fromiter(
+            (bool(title) and title.lower() in query_normalized_for_title_check for title in titles),
+            dtype=bool, count=len(candidates)
+        )
+        if boosted.any():
+            candidates.scores = candidates.scores + boosted
+            for index in np.flatnonzero(boosted):
+                logging.info(f"Score impulsionado para o título correspondente: '{titles[index]}'")
         # ================== FIM DA CORREÇÃO ==================
 
         # Ordena os resultados com base no score (que agora pode estar impulsionado)
-        all_results.sort(key=lambda x: x.get("relevance_score", 0.0), reverse=True)
+        ranked = candidates.ranked()
         
-        # Pega os resultados iniciais do topo para encontrar chunks relacionados
-        initial_top_results = all_results[:top_k]
+        # Remove duplicados baseados no conteúdo exato, só até preencher o pool do reranking.
+        # Sem o conteúdo (busca em duas fases) o vetor do chunk identifica conteúdo repetido.
+        pool_size = self._candidate_pool_size(top_k)
+        has_vector = (
+            ranked.embeddings.any(axis=1) if ranked.embeddings is not None
+            else np.zeros(len(ranked), dtype=bool)
+        )
+        unique_indices = []
+        seen_content = set()
+        for index, content in enumerate(ranked.documents):
+            if content is None:
+                content = ranked.embeddings[index].tobytes() if has_vector[index] else ranked.ids[index]
+            if content not in seen_content:
+                unique_indices.append(index)
+                seen_content.add(content)
+                if len(unique_indices) >= pool_size:
+                    break
+        pool = ranked.take(np.asarray(unique_indices, dtype=np.intp))
         
-        related_chunks = set()
-        for result in initial_top_results:
-            metadata = result.get("metadata", {})
-            chunk_key = metadata.get("chunk_key", "")
-            
-            # Extrai a chave base do chunk para agrupar todas as suas partes
-            base_key = re.sub(r'_part\d+_\d+$', '', chunk_key)
+        # Diversifica o top_k para que partes quase idênticas de uma mesma função não ocupem todas as vagas
+        selected = self.rerank_results(pool, query, query_analysis, top_k)
+        pending = pool.pending_content()
+        if len(pending) and (pool.embeddings is None or not pool.embeddings[pending].any(axis=1).all()):
+            # Sem vetores, duplicados só aparecem depois da leitura: lê também uma reserva para repô-los
+            chosen = set(selected)
+            selected = list(selected) + [i for i in range(len(pool)) if i not in chosen][:top_k]
+        final = pool.take(np.asarray(selected, dtype=np.intp))
+        self._hydrate_results(final, query_analysis)
+        
+        # Só os resultados finais viram dicts
+        final_indices = []
+        seen_content = set()
+        for index, content in enumerate(final.documents):
+            if content not in seen_content:
+                final_indices.append(index)
+                seen_content.add(content)
+        return final.to_dicts(final_indices[:top_k])
+    
+    def _search_all_collections(self, query_embedding: List[float],
+                                top_k_initial: Union[int, Dict[str, int]],
+                                collection_names: Optional[List[str]] = None) -> Dict[str, ResultSet]:
+        """
+        Consulta todas as collections carregadas (ou apenas collection_names).
+        top_k_initial pode ser um inteiro ou um dict com a profundidade de cada collection.
+        No modo paralelo cada collection roda no executor compartilhado com timeout
+        próprio; o dicionário retornado mantém sempre a ordem de self.collections
+        para que o merge seja determinístico.
+        """
+        if collection_names is None:
+            collection_names = [name for name, collection in self.collections.items() if collection]
+        if isinstance(top_k_initial, int):
+            top_k_initial = {name: top_k_initial for name in collection_names}
+        
+        if self.unified_index is not None and self.unified_index.is_loaded:
+            results_by_collection = self.unified_index.search(
+                query_embedding,
+                top_k_per_collection=top_k_initial,
+                collection_names=collection_names
+            )
+            return {
+                name: result_set.above(self.min_relevance_score)
+                for name, result_set in results_by_collection.items()
+            }
+        
+        if self.exact_index is not None and self.exact_index.is_loaded:
+            # Collections exportadas respondem pela busca exata; as demais seguem no Chroma
+            exact_results = {
+                name: result_set.above(self.min_relevance_score)
+                for name, result_set in self.exact_index.search(
+                    query_embedding, top_k_per_collection=top_k_initial, collection_names=collection_names
+                ).items()
+            }
+            chroma_results = self._query_chroma_collections(
+                query_embedding, top_k_initial, [name for name in collection_names if name not in exact_results]
+            )
+            return {
+                name: exact_results[name] if name in exact_results else chroma_results[name]
+                for name in collection_names
+            }
+        
+        return self._query_chroma_collections(query_embedding, top_k_initial, collection_names)
+    
+    def _query_chroma_collections(self, query_embedding: List[float], top_k_initial: Dict[str, int],
+                                  collection_names: List[str]) -> Dict[str, ResultSet]:
+        """Uma collection.query por collection, em paralelo no executor compartilhado quando habilitado."""
+        if not self._search_executor or len(collection_names) < 2:
+            return {
+                name: self.search_collection(name, query_embedding, top_k_initial=top_k_initial[name])
+                for name in collection_names
+            }
+        
+        futures = {
+            name: self._search_executor.submit(self.search_collection, name, query_embedding, top_k_initial[name])
+            for name in collection_names
+        }
+        return self._collect_collection_futures(futures, ResultSet.empty)
+    
+    def _collect_collection_futures(self, futures: Dict[str, Future], empty: Callable[[], Any]) -> Dict[str, Any]:
+        """
+        Resultados das consultas submetidas ao executor, por collection. Todas
+        começam juntas, então o timeout por collection é um prazo comum; a
+        collection que estoura o prazo ou falha entra com empty().
+        """
+        wait(futures.values(), timeout=self.collection_timeout)
+        
+        results_by_collection = {}
+        for name, future in futures.items():
+            if not future.done():
+                future.cancel()
+                logger.warning(f"Search in collection {name} timed out after {self.collection_timeout:.2f}s")
+                results_by_collection[name] = empty()
+                continue
+            try:
+                results_by_collection[name] = future.result()
+            except Exception as e:
+                logger.error(f"Error searching in collection {name}: {str(e)}")
+                results_by_collection[name] = empty()
+        return results_by_collection
+    
+    def _search_all_collections_batch(self, query_embeddings: List[List[float]],
+                                      top_k_initial: int) -> List[Dict[str, ResultSet]]:
+        """Versão em lote de _search_all_collections: retorna um results_by_collection por query."""
+        collection_names = [name for name, collection in self.collections.items() if collection]
+        
+        if self.unified_index is not None and self.unified_index.is_loaded:
+            batch_results = self.unified_index.search_batch(
+                query_embeddings,
+                top_k_per_collection=top_k_initial,
+                collection_names=collection_names
+            )
+            return [
+                {name: result_set.above(self.min_relevance_score) for name, result_set in results.items()}
+                for results in batch_results
+            ]
+        
+        per_collection: Dict[str, List[ResultSet]] = {}
+        if self.exact_index is not None and self.exact_index.is_loaded:
+            exact_batch = self.exact_index.search_batch(
+                query_embeddings,
+                top_k_per_collection=top_k_initial,
+                collection_names=collection_names
+            )
+            for name in collection_names:
+                if name in self.exact_index:
+                    per_collection[name] = [results[name].above(self.min_relevance_score) for results in exact_batch]
+        chroma_names = [name for name in collection_names if name not in per_collection]
+        
+        if self._search_executor and len(chroma_names) > 1:
+            futures = {
+                name: self._search_executor.submit(self.search_collection_batch, name, query_embeddings, top_k_initial)
+                for name in chroma_names
+            }
+            per_collection.update(self._collect_collection_futures(
+                futures, lambda: [ResultSet.empty() for _ in query_embeddings]
+            ))
+        else:
+            per_collection.update(
+                (name, self.search_collection_batch(name, query_embeddings, top_k_initial))
+                for name in chroma_names
+            )
+        
+        return [
+            {name: per_collection[name][q] for name in collection_names}
+            for q in range(len(query_embeddings))
+        ]
+    
+    def _adaptive_search_all_collections(self, query: str, query_embedding: List[float], top_k: int,
+                                         query_analysis: Dict[str, Any]) -> Dict[str, ResultSet]:
+        """
+        Busca com profundidade adaptativa. Começa com poucos candidatos por collection
+        e só amplia (multiplicando pela growth factor, até max_results_per_collection)
+        as collections cujo último score retornado ainda alcança o corte do top_k;
+        as demais já não podem contribuir com candidatos melhores. A profundidade
+        escolhida é registrada em query_analysis["retrieval"].
+        
+        Queries que citam um título conhecido usam a profundidade máxima quando a
+        busca direta por identificadores está desligada, pois o boost de título
+        pode promover um chunk distante no ranking vetorial.
+        """
+        collection_names = [name for name, collection in self.collections.items() if collection]
+        if not self.identifier_lookup and self.identifier_index and self.identifier_index.find(query):
+            initial_depth = self.max_results_per_collection
+        else:
+            initial_depth = min(max(self.adaptive_initial_depth, top_k), self.max_results_per_collection)
+        depths = {name: initial_depth for name in collection_names}
+        
+        results_by_collection = self._search_all_collections(query_embedding, depths)
+        rounds = 1
+        
+        while True:
+            scores = np.concatenate(
+                [result_set.scores for result_set in results_by_collection.values()] or [np.empty(0)]
+            )
+            if len(scores) >= top_k:
+                cutoff = -np.partition(-scores, top_k - 1)[top_k - 1] - self.adaptive_score_margin
+            else:
+                cutoff = float("-inf")
             
-            # Encontra todos os chunks relacionados nos resultados
-            for other_result in all_results:
-                other_metadata = other_result.get("metadata", {})
-                other_chunk_key = other_metadata.get("chunk_key", "")
-                other_base_key = re.sub(r'_part\d+_\d+$', '', other_chunk_key)
-                
-                if base_key == other_base_key:
-                    related_chunks.add(other_chunk_key)
-        
-        # Coleta todos os chunks que foram marcados como relacionados
-        final_results = []
-        for result in all_results:
-            metadata = result.get("metadata", {})
-            chunk_key = metadata.get("chunk_key", "")
+            to_widen = [
+                name for name in collection_names
+                if depths[name] < self.max_results_per_collection
+                and name in results_by_collection
+                and len(results_by_collection[name]) >= depths[name]
+                and results_by_collection[name].scores[-1] >= cutoff
+            ]
+            if not to_widen:
+                break
             
-            if chunk_key in related_chunks:
-                final_results.append(result)
+            for name in to_widen:
+                depths[name] = min(depths[name] * self.adaptive_growth_factor, self.max_results_per_collection)
+            widened = self._search_all_collections(
+                query_embedding,
+                {name: depths[name] for name in to_widen},
+                collection_names=to_widen
+            )
+            results_by_collection.update(widened)
+            rounds += 1
+        
+        documents_fetched = sum(len(result_set) for result_set in results_by_collection.values())
+        query_analysis["retrieval"] = {
+            "mode": "adaptive",
+            "depth_per_collection": depths,
+            "rounds": rounds,
+            "documents_fetched": documents_fetched
+        }
+        logger.info(f"Adaptive retrieval: depths={depths}, rounds={rounds}, documents={documents_fetched}")
+        return results_by_collection
+    
+    def close(self):
+        """Libera o executor de busca, encerra o coalescer e fecha o cache de embeddings."""
+        if self._search_executor:
+            self._search_executor.shutdown(wait=False, cancel_futures=True)
+            self._search_executor = None
+        if isinstance(self.embedding_provider, EmbeddingCoalescer):
+            self.embedding_provider.close()
+        if self.embedding_cache:
+            self.embedding_cache.close()
+    
+    def _fuse_and_merge(self, query: str, query_embedding: List[float], query_analysis: Dict[str, Any],
+                        results_by_collection: Dict[str, ResultSet], top_k: int) -> List[Dict]:
+        """Junta os candidatos das collections, acrescenta acertos diretos e lexicais e faz o merge."""
+        collection_names = list(results_by_collection.keys())
+        candidates = ResultSet.concat(results_by_collection.values())
         
-        # Ordena os resultados finais pelo score de relevância novamente para garantir
-        final_results.sort(key=lambda x: x.get("relevance_score", 0.0), reverse=True)
+        identifiers = self._find_identifiers(query)
+        if identifiers:
+            query_analysis["identifier_matches"] = identifiers
+            candidates = self._add_identifier_hits(identifiers, query_embedding, candidates, collection_names)
         
-        # Remove duplicados baseados no conteúdo exato
-        unique_final_results = []
-        seen_content = set()
-        for result in final_results:
-            if result["content"] not in seen_content:
-                unique_final_results.append(result)
-                seen_content.add(result["content"])
-
-        return unique_final_results[:top_k]
+        if self.hybrid_search:
+            candidates = self._apply_hybrid_fusion(query, query_embedding, candidates, collection_names)
+        
+        return self.merge_and_rank_results(candidates, query, query_analysis, top_k)
+    
+    def _search_with_embedding(self, query: str, query_embedding: List[float],
+                               query_analysis: Dict[str, Any], top_k: int) -> List[Dict]:
+        """Executa a recuperação nas collections e o merge para um embedding já calculado."""
+        if self.adaptive_depth:
+            results_by_collection = self._adaptive_search_all_collections(query, query_embedding, top_k, query_analysis)
+        else:
+            results_by_collection = self._search_all_collections(
+                query_embedding,
+                top_k_initial=self.max_results_per_collection
+            )
+        
+        merged_results = self._fuse_and_merge(query, query_embedding, query_analysis, results_by_collection, top_k)
+        
+        for result in merged_results:
+            result["query_debug_original"] = query
+            
+        logger.info(f"Found {len(merged_results)} results for query: '{query}' after merging and reranking.")
+        return merged_results
+    
+    def _identifier_only_matches(self, query: str) -> List[str]:
+        """Identificadores da query quando ela pode ser respondida sem ANN; lista vazia caso contrário."""
+        if not self.identifier_skip_ann:
+            return []
+        identifiers = self._find_identifiers(query)
+        if identifiers and self._is_identifier_only_query(query):
+            return identifiers
+        return []
     
     def search(self, query: str, query_analysis: Dict[str, Any], top_k: int = 5) -> List[Dict]:
+        return self.search_with_query_embedding(query, query_analysis, top_k)[0]
+    
+    def search_with_query_embedding(self, query: str, query_analysis: Dict[str, Any],
+                                    top_k: int = 5) -> Tuple[List[Dict], Optional[List[float]]]:
+        """
+        Como search, devolvendo também o embedding usado na busca (None quando a
+        query foi respondida só pelo índice de identificadores ou a busca falhou),
+        para quem precisa do vetor (cache de respostas) não embedar de novo.
+        """
         try:
-            query_embedding = self.get_embedding(query)
+            identifiers = self._identifier_only_matches(query)
+            if identifiers:
+                query_analysis["identifier_matches"] = identifiers
+                return self._search_identifiers_only(query, identifiers, query_analysis, top_k), None
             
-            results_by_collection = {}
-            for collection_name in self.collections:
-                if self.collections[collection_name]:
-                    collection_results = self.search_collection(
-                        collection_name, 
-                        query_embedding,
-                        top_k_initial=self.max_results_per_collection
-                    )
-                    results_by_collection[collection_name] = collection_results
+            query_embedding = self.get_embedding(query)
+            return self._search_with_embedding(query, query_embedding, query_analysis, top_k), query_embedding
+        except Exception as e:
+            logger.error(f"Error in main search process: {str(e)}")
+            return [], None
+    
+    def search_many(self, queries: List[str], query_analyses: List[Dict[str, Any]], top_k: int = 5) -> List[List[Dict]]:
+        """
+        Busca em lote: embeda todas as queries em chamadas agrupadas e envia todos
+        os vetores a cada collection.query de uma vez. Usa a profundidade fixa
+        max_results_per_collection, e o merge continua sendo feito por query.
+        Erros são propagados: uma lista vazia por query se passaria por uma
+        busca bem-sucedida sem resultados.
+        """
+        if not queries:
+            return []
+        try:
+            query_embeddings = self.get_embeddings(queries)
+            batch_results_by_collection = self._search_all_collections_batch(
+                query_embeddings,
+                top_k_initial=self.max_results_per_collection
+            )
             
-            merged_results = self.merge_and_rank_results(results_by_collection, query, query_analysis, top_k)
+            all_merged = []
+            for query, query_embedding, query_analysis, results_by_collection in zip(
+                    queries, query_embeddings, query_analyses, batch_results_by_collection):
+                merged_results = self._fuse_and_merge(
+                    query, query_embedding, query_analysis, results_by_collection, top_k
+                )
+                for result in merged_results:
+                    result["query_debug_original"] = query
+                all_merged.append(merged_results)
             
-            for result in merged_results:
-                result["query_debug_original"] = query
-                
-            logger.info(f"Found {len(merged_results)} results for query: '{query}' after merging and reranking.")
-            return merged_results
+            logger.info(f"Batch search completed for {len(queries)} queries")
+            return all_merged
+        except Exception as e:
+            logger.error(f"Error in batch search process: {str(e)}")
+            raise
+    
+    async def search_async(self, query: str, query_analysis: Dict[str, Any], top_k: int = 5) -> List[Dict]:
+        """
+        Versão assíncrona de search. O embedding usa AsyncOpenAI e as consultas
+        ao Chroma (bloqueantes) rodam numa thread, fora do event loop.
+        """
+        return (await self.search_with_query_embedding_async(query, query_analysis, top_k))[0]
+    
+    async def search_with_query_embedding_async(self, query: str, query_analysis: Dict[str, Any],
+                                                top_k: int = 5) -> Tuple[List[Dict], Optional[List[float]]]:
+        """Versão assíncrona de search_with_query_embedding."""
+        try:
+            identifiers = self._identifier_only_matches(query)
+            if identifiers:
+                query_analysis["identifier_matches"] = identifiers
+                results = await asyncio.to_thread(
+                    self._search_identifiers_only, query, identifiers, query_analysis, top_k
+                )
+                return results, None
             
+            query_embedding = await self.get_embedding_async(query)
+            results = await asyncio.to_thread(
+                self._search_with_embedding, query, query_embedding, query_analysis, top_k
+            )
+            return results, query_embedding
         except Exception as e:
             logger.error(f"Error in main search process: {str(e)}")
-            return []
+            return [], None
 
     def _initialize_reranker(self):
-        self.reranker_config = {
-            "is_fitted": True, 
-            "type": "simple_sort"  # Reflects current simplified logic
-        }
-        logger.info("Reranker (simple_sort) initialized successfully")
+        if not SEARCH_MMR_ENABLED:
+            self.reranker = None
+            logger.info("MMR reranker disabled; results are ranked by score only")
+            return
+        self.reranker = MMRReranker(
+            default_lambda=SEARCH_MMR_LAMBDA,
+            lambda_by_intent=SEARCH_MMR_LAMBDA_BY_INTENT,
+            candidate_pool=SEARCH_MMR_CANDIDATE_POOL
+        )
+        logger.info(f"MMR reranker initialized (lambda={SEARCH_MMR_LAMBDA}, pool={SEARCH_MMR_CANDIDATE_POOL})")
 
     def _initialize_query_analyzer(self):
         try:
@@ -283,8 +1067,7 @@ class SemanticSearch:
             grouped_results = {}
             for result in results:
                 metadata = result.get("metadata", {})
-                chunk_key = metadata.get("chunk_key", "")
-                base_key = re.sub(r'_part\d+_\d+$', '', chunk_key)
+                base_key, _ = chunk_family(metadata)
                 
                 if base_key not in grouped_results:
                     grouped_results[base_key] = []
@@ -302,7 +1085,7 @@ class SemanticSearch:
             # Process each group of related chunks
             for base_key, group in grouped_results.items():
                 # Sort group by part number
-                group.sort(key=lambda x: int(re.search(r'_part\d+_(\d+)$', x.get("metadata", {}).get("chunk_key", "")).group(1)) if re.search(r'_part\d+_(\d+)$', x.get("metadata", {}).get("chunk_key", "")) else 0)
+                group.sort(key=lambda x: chunk_family(x.get("metadata", {}))[1] or 0)
                 
                 # Calculate average score for the group
                 avg_score = sum(r.get("relevance_score", 0.0) for r in group) / len(group)
@@ -321,8 +1104,8 @@ class SemanticSearch:
                 # Add content from all parts
                 context_parts.append("\n### Content\n")
                 for i, result in enumerate(group, 1):
-                    part_num_match = re.search(r'_part\d+_(\d+)$', result.get("metadata", {}).get("chunk_key", ""))
-                    part_num = part_num_match.group(1) if part_num_match else str(i)
+                    _, part_number = chunk_family(result.get("metadata", {}))
+                    part_num = str(part_number) if part_number is not None else str(i)
                     context_parts.append(f"Part {part_num} (Score: {result['relevance_score']:.4f}):\n{result['content']}\n")
                 
                 # Add relevance indicators
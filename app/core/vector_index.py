@@ -0,0 +1,198 @@
+# app/core/vector_index.py
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from .config import setup_logging
+from .result_set import ResultSet, object_array
+
+logger = setup_logging(__name__, "logs/vector_index.log")
+
+
+class UnifiedVectorIndex:
+    """
+    Índice vetorial em memória que cobre todas as collections do Chroma.
+
+    Os embeddings de todas as collections ficam numa única matriz float32
+    contígua e L2-normalizada, com arrays paralelos de ids e tags de collection.
+    Cada collection ocupa um bloco contíguo de linhas, então uma query é
+    respondida com um único produto matriz-vetor seguido de um argpartition
+    por bloco.
+    """
+
+    def __init__(self, page_size: int = 1000):
+        self.page_size = page_size
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.ids = np.empty(0, dtype=object)
+        self.collection_tags = np.empty(0, dtype=np.int16)
+        self.collection_names: List[str] = []
+        self.collection_slices: Dict[str, slice] = {}
+        self.documents = np.empty(0, dtype=object)
+        self.metadatas = np.empty(0, dtype=object)
+        self.is_loaded = False
+        self.load_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def load(self, collections: Dict[str, Any]):
+        """Carrega embeddings, documentos e metadados de todas as collections."""
+        start_time = time.time()
+        blocks, ids, tags, documents, metadatas = [], [], [], [], []
+        collection_names, collection_slices = [], {}
+        offset = 0
+
+        for name, collection in collections.items():
+            if not collection:
+                continue
+            tag = len(collection_names)
+            collection_names.append(name)
+            count = collection.count()
+
+            for page_start in range(0, count, self.page_size):
+                page = collection.get(
+                    limit=self.page_size,
+                    offset=page_start,
+                    include=["embeddings", "documents", "metadatas"]
+                )
+                page_embeddings = page.get("embeddings")
+                if page_embeddings is None or len(page_embeddings) == 0:
+                    continue
+                blocks.append(np.asarray(page_embeddings, dtype=np.float32))
+                ids.extend(page["ids"])
+                documents.extend(page.get("documents") or [""] * len(page["ids"]))
+                metadatas.extend(m or {} for m in (page.get("metadatas") or [{}] * len(page["ids"])))
+                tags.extend([tag] * len(page["ids"]))
+
+            collection_slices[name] = slice(offset, len(ids))
+            offset = len(ids)
+
+        matrix = np.vstack(blocks) if blocks else np.empty((0, 0), dtype=np.float32)
+        if matrix.size:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.ids = np.asarray(ids, dtype=object)
+        self.collection_tags = np.asarray(tags, dtype=np.int16)
+        self.collection_names = collection_names
+        self.collection_slices = collection_slices
+        self.documents = object_array(documents)
+        self.metadatas = object_array(metadatas)
+        self.is_loaded = True
+        self.load_time = time.time() - start_time
+
+        logger.info(
+            f"Unified index loaded: {len(self.ids)} vectors from {len(collection_names)} collections "
+            f"({self.matrix.nbytes / 1e6:.1f} MB) in {self.load_time:.2f}s"
+        )
+
+    def _block_result_set(self, name: str, block: slice, local_rows: np.ndarray,
+                          block_scores: np.ndarray) -> ResultSet:
+        rows = block.start + local_rows
+        collections = np.empty(len(rows), dtype=object)
+        collections[:] = name
+        return ResultSet(
+            ids=self.ids[rows],
+            documents=self.documents[rows],
+            metadatas=self.metadatas[rows],
+            collections=collections,
+            distances=(1.0 - block_scores).astype(np.float32),
+            embeddings=self.matrix[rows]
+        )
+
+    def search(self,
+               query_embedding: List[float],
+               top_k_per_collection: Union[int, Dict[str, int]],
+               collection_names: Optional[List[str]] = None) -> Dict[str, ResultSet]:
+        """
+        Retorna os top_k_per_collection vizinhos de cada collection (um inteiro
+        ou um dict por collection) como ResultSet ordenado por distância de
+        cosseno (mesma escala do Chroma com hnsw:space=cosine). Os conjuntos
+        referenciam as linhas do índice, sem copiar documentos nem metadados.
+        """
+        if not self.is_loaded or not len(self.ids):
+            return {}
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm > 0:
+            query = query / query_norm
+
+        similarities = self.matrix @ query
+
+        results_by_collection = {}
+        for name in collection_names or self.collection_names:
+            block = self.collection_slices.get(name)
+            if block is None:
+                continue
+            block_scores = similarities[block]
+            depth = top_k_per_collection[name] if isinstance(top_k_per_collection, dict) else top_k_per_collection
+            k = min(depth, len(block_scores))
+            if k <= 0:
+                results_by_collection[name] = ResultSet.empty()
+                continue
+            if k < len(block_scores):
+                top = np.argpartition(-block_scores, k - 1)[:k]
+            else:
+                top = np.arange(len(block_scores))
+            top = top[np.argsort(-block_scores[top], kind="stable")]
+            results_by_collection[name] = self._block_result_set(name, block, top, block_scores[top])
+
+        return results_by_collection
+
+    def search_batch(self,
+                     query_embeddings: List[List[float]],
+                     top_k_per_collection: int,
+                     collection_names: Optional[List[str]] = None) -> List[Dict[str, ResultSet]]:
+        """
+        Versão em lote de search: um único produto matriz-matriz para todas as
+        queries e um argpartition por bloco ao longo do eixo dos documentos.
+        Retorna um results_by_collection por query.
+        """
+        batch_size = len(query_embeddings)
+        if not self.is_loaded or not len(self.ids) or not batch_size:
+            return [{} for _ in range(batch_size)]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+
+        similarities = self.matrix @ queries.T  # (documentos, queries)
+
+        batch_results = [{} for _ in range(batch_size)]
+        for name in collection_names or self.collection_names:
+            block = self.collection_slices.get(name)
+            if block is None:
+                continue
+            block_scores = similarities[block]
+            k = min(top_k_per_collection, block_scores.shape[0])
+            if k <= 0:
+                for results in batch_results:
+                    results[name] = ResultSet.empty()
+                continue
+            if k < block_scores.shape[0]:
+                top = np.argpartition(-block_scores, k - 1, axis=0)[:k]
+            else:
+                top = np.tile(np.arange(block_scores.shape[0])[:, None], (1, batch_size))
+            top_scores = np.take_along_axis(block_scores, top, axis=0)
+            order = np.argsort(-top_scores, axis=0, kind="stable")
+            top = np.take_along_axis(top, order, axis=0)
+            top_scores = np.take_along_axis(top_scores, order, axis=0)
+
+            for q in range(batch_size):
+                batch_results[q][name] = self._block_result_set(name, block, top[:, q], top_scores[:, q])
+
+        return batch_results
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "vectors": len(self.ids),
+            "dimensions": int(self.matrix.shape[1]) if self.matrix.ndim == 2 and self.matrix.size else 0,
+            "collections": {name: block.stop - block.start for name, block in self.collection_slices.items()},
+            "memory_mb": round(self.matrix.nbytes / 1e6, 2),
+            "load_time": round(self.load_time, 3)
+        }
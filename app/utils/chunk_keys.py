@@ -0,0 +1,29 @@
+# app/utils/chunk_keys.py
+import re
+from typing import Any, Dict, Optional, Tuple
+
+# Chunks de uma mesma função/enum compartilham o prefixo e terminam em "_part<N>_<parte>"
+CHUNK_PART_PATTERN = re.compile(r'_part\d+_(\d+)$')
+
+
+def split_chunk_key(chunk_key: str) -> Tuple[str, Optional[int]]:
+    """
+    Separa um chunk_key em (base_key, part_number).
+
+    part_number é None quando o chunk_key não segue o padrão de partes;
+    nesse caso base_key é o próprio chunk_key.
+    """
+    match = CHUNK_PART_PATTERN.search(chunk_key or "")
+    if not match:
+        return chunk_key or "", None
+    return chunk_key[:match.start()], int(match.group(1))
+
+
+def chunk_family(metadata: Dict[str, Any]) -> Tuple[str, Optional[int]]:
+    """
+    Retorna (base_key, part_number) de um resultado, usando os valores gravados
+    na ingestão quando disponíveis e recalculando a partir do chunk_key caso contrário.
+    """
+    if "base_key" in metadata:
+        return metadata["base_key"], metadata.get("part_number")
+    return split_chunk_key(metadata.get("chunk_key", ""))
@@ -0,0 +1,45 @@
+# app/utils/token_counter.py
+import logging
+import threading
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# O gpt-4o usa o200k_base, que só existe a partir do tiktoken 0.7; com o
+# tiktoken fixado no projeto (0.6) o cl100k_base é o encoding mais próximo
+TOKEN_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN_ESTIMATE = 4
+
+_encoding_lock = threading.Lock()
+_encoding_loaded = False
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding_loaded, _encoding
+    if _encoding_loaded:
+        return _encoding
+    # Carregado uma vez só, mesmo com várias threads de ingestão chamando ao mesmo tempo
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                # O arquivo do encoding é baixado no primeiro uso; sem ele a contagem vira estimativa
+                logger.warning(f"Token encoding {TOKEN_ENCODING} unavailable, estimating tokens from text length: {e}")
+            _encoding_loaded = True
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata (sem tokenizar) usada em tempo de consulta."""
+    return (len(text) + CHARS_PER_TOKEN_ESTIMATE - 1) // CHARS_PER_TOKEN_ESTIMATE
+
+
+def count_tokens(text: str) -> int:
+    """Conta tokens com o encoding do modelo de geração (ou estima, se indisponível)."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
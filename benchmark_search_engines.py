@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Compare recall@k and per-query latency of the exact (brute-force) engine
+against Chroma's HNSW index, per collection, to choose SEARCH_ENGINE and
+SEARCH_EXACT_COLLECTIONS.
+
+Usage:
+    python benchmark_search_engines.py [--dtype float16|int8] [--k 10]
+                                       [--queries queries.txt] [--samples 200]
+
+With --queries, each line is embedded with the configured EMBEDDING_BACKEND.
+Otherwise the queries are midpoints of random pairs of stored vectors.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import chromadb
+from chromadb.config import Settings
+import numpy as np
+
+from app.core.config import EXACT_INDEX_DIRNAME
+from app.core.embedding_provider import create_embedding_provider
+from app.core.exact_index import ExactVectorIndex, compare_with_chroma
+
+
+def sample_queries(collections, samples, seed=0):
+    """Midpoints of random pairs of stored vectors, drawn across all collections."""
+    rng = np.random.default_rng(seed)
+    stored = [
+        np.asarray(collection.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+        for collection in collections.values() if collection.count() > 1
+    ]
+    matrix = np.vstack(stored)
+    first, second = rng.integers(0, len(matrix), size=(2, samples))
+    return ((matrix[first] + matrix[second]) / 2.0).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and latency of the exact engine versus Chroma HNSW")
+    parser.add_argument("--chroma-path", default="./chroma_db")
+    parser.add_argument("--dtype", choices=["float16", "int8"], default="float16")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", help="Text file with one query per line")
+    parser.add_argument("--samples", type=int, default=200, help="Synthetic queries when --queries is not given")
+    parser.add_argument("--scratch", action="store_true",
+                        help="Export to a temporary directory instead of the index next to the Chroma files")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.chroma_path, settings=Settings(anonymized_telemetry=False))
+    collections = {collection.name: client.get_collection(collection.name) for collection in client.list_collections()}
+    collections = {name: collection for name, collection in collections.items() if collection.count()}
+    if not collections:
+        print("ERROR: no non-empty collections found")
+        return
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        provider = create_embedding_provider(api_key=os.getenv("OPENAI_API_KEY"))
+        query_embeddings = provider.embed(texts)
+    else:
+        query_embeddings = sample_queries(collections, args.samples)
+
+    directory = tempfile.mkdtemp() if args.scratch else os.path.join(args.chroma_path, EXACT_INDEX_DIRNAME)
+    index = ExactVectorIndex(directory, dtype=args.dtype)
+    index.load(collections)
+
+    report = compare_with_chroma(index, collections, query_embeddings, k=args.k)
+    print(f"Exact engine ({args.dtype}) versus Chroma HNSW, {len(query_embeddings)} queries, k={args.k}")
+    print("=" * 80)
+    print(f"{'collection':<12}{'vectors':>9}  {'exact recall':>12} {'p50 ms':>8} {'p95 ms':>8}  "
+          f"{'chroma recall':>13} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, row in report.items():
+        exact, chroma = row["exact"], row["chroma"]
+        print(f"{name:<12}{row['vectors']:>9}  {exact['recall']:>12.4f} {exact['latency_ms_p50']:>8.3f} "
+              f"{exact['latency_ms_p95']:>8.3f}  {chroma['recall']:>13.4f} {chroma['latency_ms_p50']:>8.3f} "
+              f"{chroma['latency_ms_p95']:>8.3f}")
+    print()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
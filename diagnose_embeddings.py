@@ -8,22 +8,22 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.core.semantic_search import SemanticSearch
+from app.core.embedding_provider import create_embedding_provider
 import chromadb
 from chromadb.config import Settings
 import numpy as np
-from openai import OpenAI
 
-def test_embedding_similarity():
+def test_embedding_similarity(backend=None):
     """Test if embeddings are working correctly by comparing identical texts."""
     print("Testing Embedding Similarity\n" + "="*80)
     
-    # Initialize OpenAI client
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("ERROR: OPENAI_API_KEY not set")
+    # Initialize the embedding backend (EMBEDDING_BACKEND or the first CLI argument)
+    try:
+        provider = create_embedding_provider(backend, api_key=os.getenv("OPENAI_API_KEY"))
+    except ValueError as e:
+        print(f"ERROR: {e}")
         return
-        
-    client = OpenAI(api_key=api_key)
+    print(f"Embedding model: {provider.model_name}")
     
     # Test 1: Identical texts should have very high similarity
     print("\nTest 1: Identical Text Similarity")
@@ -31,19 +31,10 @@ def test_embedding_similarity():
     text2 = "exemplo de código para buscar funcionários"
     
     # Generate embeddings
-    response1 = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text1,
-        dimensions=512
-    )
-    response2 = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text2,
-        dimensions=512
-    )
+    embedding1, embedding2 = provider.embed([text1, text2])
     
-    emb1 = np.array(response1.data[0].embedding)
-    emb2 = np.array(response2.data[0].embedding)
+    emb1 = np.array(embedding1)
+    emb2 = np.array(embedding2)
     
     # Calculate cosine similarity
     cosine_sim = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
@@ -59,12 +50,7 @@ def test_embedding_similarity():
     print("\n\nTest 2: Similar Text Similarity")
     text3 = "código de exemplo para procurar empregados"
     
-    response3 = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text3,
-        dimensions=512
-    )
-    emb3 = np.array(response3.data[0].embedding)
+    emb3 = np.array(provider.embed_one(text3))
     
     cosine_sim = np.dot(emb1, emb3) / (np.linalg.norm(emb1) * np.linalg.norm(emb3))
     cosine_distance = 1 - cosine_sim
@@ -76,4 +62,4 @@ def test_embedding_similarity():
     print(f"Expected: ~0.2-0.4 (similar meaning)")
 
 if __name__ == "__main__":
-    test_embedding_similarity() 
\ No newline at end of file
+    test_embedding_similarity(sys.argv[1] if len(sys.argv) > 1 else None) 
\ No newline at end of file
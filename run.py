@@ -3,7 +3,7 @@
 run.py - Ponto de entrada para o Sistema RAG Otimizado
 
 Este arquivo inicializa todos os componentes do sistema:
-1. Banco de dados ChromaDB
+1. Banco de dados ChromaDB (snapshot pré-construído mais recente, ou ingestão dos JSON)
 2. Sistema RAG  Integrado
 3. API FastAPI
 """
@@ -16,6 +16,8 @@ from dotenv import load_dotenv
 import logging
 from app.core.integrated_rag_system import OptimizedSearchSystem
 from app.core.initialize_chroma_db import initialize_chroma_db
+from app.core.index_snapshot import restore_latest_snapshot
+from app.core.config import INDEX_SNAPSHOT_DIR, INDEX_SNAPSHOT_REQUIRED
 from app.core.api.main import app
 
 # Configurar logging
@@ -35,10 +37,19 @@ def initialize_system():
         if not api_key:
             raise ValueError("OPENAI_API_KEY não encontrada no arquivo .env")
 
-        # 1. Inicializar banco de dados
-        logger.info("📚 Inicializando banco de dados ChromaDB...")
-        stats = initialize_chroma_db(reset_collections=True)
-        logger.info(f"✅ Banco de dados inicializado: {stats}")
+        # 1. Ativar o snapshot mais recente do índice (gerado com
+        #    `python -m app.core.index_snapshot build --ingest`)
+        logger.info(f"📦 Procurando snapshot do índice em {INDEX_SNAPSHOT_DIR}...")
+        snapshot = restore_latest_snapshot()
+        if snapshot:
+            logger.info(f"✅ Snapshot {snapshot['version']} ativado: {snapshot['collections']}")
+        elif INDEX_SNAPSHOT_REQUIRED:
+            raise RuntimeError(f"Nenhum snapshot válido em {INDEX_SNAPSHOT_DIR} (INDEX_SNAPSHOT_REQUIRED=true)")
+        else:
+            # Sem snapshot: ingestão incremental (só grava o que mudou desde a última execução)
+            logger.info("📚 Nenhum snapshot válido; inicializando banco de dados ChromaDB a partir dos JSON...")
+            stats = initialize_chroma_db()
+            logger.info(f"✅ Banco de dados inicializado: {stats}")
 
         # 2. Inicializar sistema RAG
         logger.info("🧠 Inicializando sistema RAG...")
@@ -46,9 +57,11 @@ def initialize_system():
         
         # Garantir que o sistema está inicializado
         if not search_system.is_initialized:
-            logger.info("🔄 Inicializando banco de dados do sistema RAG...")
-            search_system.initialize_database(reset_collections=False)  # Já resetamos antes
+            logger.info("🔄 Aquecendo o sistema RAG com o banco recém-criado...")
+            search_system.warm_up()  # Já populamos o banco acima, sem reingestão
             
+        # A API reutiliza esta instância durante toda a vida da aplicação
+        app.state.search_system = search_system
         logger.info("✅ Sistema RAG inicializado")
         return search_system
 
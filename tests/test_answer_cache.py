@@ -0,0 +1,57 @@
+from app.core.answer_cache import SemanticAnswerCache
+
+
+def test_hit_requires_same_chunk_set_and_similar_query():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    cache.put("como calcular férias", [1.0, 0.0], ["a", "b"], "resposta")
+
+    assert cache.get([0.99, 0.01], ["b", "a"]) == "resposta"
+    assert cache.get([1.0, 0.0], ["a", "c"]) is None
+    assert cache.get([0.0, 1.0], ["a", "b"]) is None
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_entry_keeps_context_packing():
+    cache = SemanticAnswerCache()
+    cache.put("q", [1.0, 0.0], ["a"], "resposta", context_packing={"tokens_used": 10})
+    assert cache.get_entry([1.0, 0.0], ["a"]).context_packing == {"tokens_used": 10}
+
+
+def test_expired_entries_miss(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.answer_cache.time.time", lambda: now[0])
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    cache.put("q", [1.0, 0.0], ["a"], "resposta")
+
+    now[0] += 30
+    assert cache.get([1.0, 0.0], ["a"]) == "resposta"
+    now[0] += 31
+    assert cache.get([1.0, 0.0], ["a"]) is None
+    assert cache.get_stats()["expired"] == 1
+
+
+def test_max_entries_evicts_least_recently_used():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.put("q1", [1.0, 0.0], ["a"], "r1")
+    cache.put("q2", [1.0, 0.0], ["b"], "r2")
+    cache.get([1.0, 0.0], ["a"])
+    cache.put("q3", [1.0, 0.0], ["c"], "r3")
+
+    assert cache.get([1.0, 0.0], ["a"]) == "r1"
+    assert cache.get([1.0, 0.0], ["b"]) is None
+
+
+def test_index_version_change_drops_answers():
+    version = ["v1"]
+    cache = SemanticAnswerCache(version_provider=lambda: version[0])
+    cache.get([1.0, 0.0], ["a"])
+    cache.put("q", [1.0, 0.0], ["a"], "resposta", index_version="v1")
+    assert cache.get([1.0, 0.0], ["a"]) == "resposta"
+
+    version[0] = "v2"
+    assert cache.get([1.0, 0.0], ["a"]) is None
+    cache.put("q", [1.0, 0.0], ["a"], "antiga", index_version="v1")
+    assert cache.get([1.0, 0.0], ["a"]) is None
@@ -0,0 +1,24 @@
+from app.utils.chunk_keys import chunk_family, split_chunk_key
+
+
+def test_split_chunk_key_with_part_suffix():
+    assert split_chunk_key("folha_calculo_part1_3") == ("folha_calculo", 3)
+
+
+def test_split_chunk_key_without_part_suffix():
+    assert split_chunk_key("folha_calculo") == ("folha_calculo", None)
+    assert split_chunk_key("folha_calculo_part_3") == ("folha_calculo_part_3", None)
+
+
+def test_split_chunk_key_empty():
+    assert split_chunk_key("") == ("", None)
+    assert split_chunk_key(None) == ("", None)
+
+
+def test_chunk_family_prefers_stored_metadata():
+    metadata = {"chunk_key": "folha_calculo_part1_3", "base_key": "outra_base", "part_number": 7}
+    assert chunk_family(metadata) == ("outra_base", 7)
+
+
+def test_chunk_family_falls_back_to_chunk_key():
+    assert chunk_family({"chunk_key": "enum_tipo_part2_1"}) == ("enum_tipo", 1)
@@ -0,0 +1,54 @@
+from app.core.context_packer import TRUNCATION_MARKER, ContextPacker, boundary_offsets
+
+SECTION_ONE = "# Seção 1\n" + "texto da primeira seção.\n" * 10
+CODE_BLOCK = "```\n" + "codigo()\n" * 10 + "```\n"
+SECTION_TWO = "# Seção 2\n" + "texto da segunda seção.\n" * 10
+CONTENT = SECTION_ONE + CODE_BLOCK + SECTION_TWO
+
+
+def _result(doc_id, content, token_count):
+    return {"id": doc_id, "collection": "folha", "content": content, "metadata": {"token_count": token_count}}
+
+
+def test_boundary_offsets_skip_inside_code_blocks():
+    content = "intro\n```\n# não é título\n```\n# Título\nfim\n"
+    # Antes da abertura do bloco e logo após o fechamento (que é onde começa o título)
+    assert boundary_offsets(content) == [content.index("```"), content.index("# Título")]
+
+
+def test_chunks_that_fit_are_included_whole():
+    packer = ContextPacker(token_budget=1000)
+    blocks, report = packer.pack([_result("a", "curto", 10), _result("b", "curto", 10)])
+    assert len(blocks) == 2
+    assert report["included"] == 2
+    assert report["tokens_used"] <= 1000
+
+
+def test_truncation_cuts_at_last_boundary_that_fits():
+    tokens = len(CONTENT) // 4
+    budget = (len(SECTION_ONE) + len(CODE_BLOCK)) // 4 + 40
+    packer = ContextPacker(token_budget=budget, min_fragment_tokens=16)
+    blocks, report = packer.pack([_result("a", CONTENT, tokens)])
+
+    assert report["truncated"] == 1
+    assert blocks[0].endswith(TRUNCATION_MARKER)
+    body = blocks[0][:-len(TRUNCATION_MARKER)]
+    assert body.endswith((SECTION_ONE + CODE_BLOCK).rstrip())
+    assert "# Seção 2" not in body
+    assert report["tokens_used"] <= budget
+
+
+def test_chunk_without_boundary_that_fits_is_skipped():
+    packer = ContextPacker(token_budget=200, min_fragment_tokens=16)
+    big = _result("a", "linha sem fronteira\n" * 200, 1000)
+    small = _result("b", "curto", 10)
+    blocks, report = packer.pack([big, small])
+
+    assert [chunk["action"] for chunk in report["chunks"]] == ["skipped", "included"]
+    assert len(blocks) == 1
+
+
+def test_small_remaining_budget_is_not_used_for_fragments():
+    packer = ContextPacker(token_budget=100, min_fragment_tokens=64)
+    _, report = packer.pack([_result("a", "curto", 60), _result("b", CONTENT, len(CONTENT) // 4)])
+    assert [chunk["action"] for chunk in report["chunks"]] == ["included", "skipped"]
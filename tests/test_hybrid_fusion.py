@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.core.lexical_index import LexicalIndex, tokenize
+from app.core.result_set import ResultSet
+from app.core.semantic_search import SemanticSearch
+
+
+@pytest.fixture
+def lexical_index():
+    index = LexicalIndex()
+    index.add_document("d1", "folha", "cálculo de férias proporcionais")
+    index.add_document("d2", "folha", "cargo_busca retorna o cargo do funcionário")
+    index.add_document("d3", "pessoal", "lista de dependentes do funcionário")
+    index.finalize()
+    return index
+
+
+def test_tokenize_splits_identifiers_and_drops_accents():
+    tokens = tokenize("cagedMatricula_importa férias")
+    assert "cagedmatricula_importa" in tokens
+    assert {"caged", "matricula", "importa"} <= set(tokens)
+    assert "feria" in tokens
+
+
+def test_bm25_ranks_matching_documents(lexical_index):
+    hits = lexical_index.search("cargo_busca")
+    assert hits[0][:2] == ("d2", "folha")
+    assert {doc_id for doc_id, _, _ in lexical_index.search("funcionário")} == {"d2", "d3"}
+    assert lexical_index.search("inexistente") == []
+
+
+def test_bm25_filters_by_collection(lexical_index):
+    hits = lexical_index.search("funcionário", collection_names=["pessoal"])
+    assert [doc_id for doc_id, _, _ in hits] == ["d3"]
+
+
+def _search_engine(lexical_index, fetched):
+    engine = SemanticSearch.__new__(SemanticSearch)
+    engine.lexical_index = lexical_index
+    engine.hybrid_lexical_top_n = 10
+    engine.rrf_k = 60
+    engine._fetch_results_by_ids = lambda ids_by_collection, query_embedding: fetched(ids_by_collection)
+    return engine
+
+
+def test_rrf_fusion_promotes_lexical_hits(lexical_index):
+    requested = {}
+
+    def fetched(ids_by_collection):
+        requested.update(ids_by_collection)
+        return ResultSet.from_hits("folha", ids_by_collection["folha"], ["conteúdo"], None, [0.9])
+
+    engine = _search_engine(lexical_index, fetched)
+    candidates = ResultSet.from_hits("folha", ["d1", "d9"], ["a", "b"], None, [0.2, 0.4])
+
+    fused = engine._apply_hybrid_fusion("cargo_busca", [1.0, 0.0], candidates, ["folha"])
+
+    # d2 só aparece no BM25: é buscado por id e entra na fusão
+    assert requested == {"folha": ["d2"]}
+    assert list(fused.ids) == ["d1", "d9", "d2"]
+    assert list(fused.lexical_ranks) == [0, 0, 1]
+    rrf = np.array([1 / 61, 1 / 62, 1 / 63 + 1 / 61]) / (2 / 61)
+    np.testing.assert_allclose(fused.scores, rrf, rtol=1e-6)
+    np.testing.assert_allclose(fused.vector_scores, candidates.scores.tolist() + [0.55], rtol=1e-6)
+    assert fused.scores.argmax() == 2
+
+
+def test_rrf_fusion_without_lexical_hits_keeps_candidates(lexical_index):
+    engine = _search_engine(lexical_index, lambda ids_by_collection: ResultSet.empty())
+    candidates = ResultSet.from_hits("folha", ["d1"], ["a"], None, [0.2])
+    assert engine._apply_hybrid_fusion("inexistente", [1.0, 0.0], candidates, ["folha"]) is candidates
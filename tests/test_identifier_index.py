@@ -0,0 +1,42 @@
+from app.core.identifier_index import IdentifierIndex
+
+
+def _index(*identifiers):
+    index = IdentifierIndex(min_length=4)
+    for position, identifier in enumerate(identifiers):
+        index.add(identifier, "folha", f"doc{position}")
+    index.build()
+    return index
+
+
+def test_find_matches_whole_identifiers_only():
+    index = _index("cargo_busca")
+    assert index.find("como usar cargo_busca?") == ["cargo_busca"]
+    assert index.find("como usar cargo_buscatodos") == []
+    assert index.find("xcargo_busca") == []
+
+
+def test_find_normalizes_spaces_and_case():
+    index = _index("cargo_busca")
+    assert index.find("Cargo Busca no cálculo") == ["cargo_busca"]
+
+
+def test_find_returns_each_identifier_once_in_query_order():
+    index = _index("cargo_busca", "funcionario_lista")
+    assert index.find("funcionario_lista e cargo_busca e funcionario_lista") == [
+        "funcionario_lista", "cargo_busca"
+    ]
+
+
+def test_short_identifiers_are_not_indexed():
+    index = _index("abc")
+    assert len(index) == 0
+    assert index.find("abc") == []
+
+
+def test_lookup_groups_ids_by_collection():
+    index = IdentifierIndex()
+    index.add("cargo_busca", "folha", "d1")
+    index.add("cargo_busca", "pessoal", "d2")
+    index.add("cargo_busca", "folha", "d1")
+    assert index.lookup(["cargo_busca"]) == {"folha": ["d1"], "pessoal": ["d2"]}
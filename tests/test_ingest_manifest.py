@@ -0,0 +1,54 @@
+import os
+
+from app.core.ingest_manifest import IngestManifest, content_set_digest, index_version
+
+
+def test_save_and_load_round_trip(tmp_path):
+    manifest = IngestManifest(
+        "folha",
+        source={"size": 10, "mtime_ns": 123},
+        embedding_model="text-embedding-3-small",
+        reembed=False,
+        dedup_context="abc"
+    )
+    manifest.entries["d1"] = IngestManifest.entry_digests("conteúdo", {"title": "t"}, [0.1, 0.2])
+    path = IngestManifest.path_for(str(tmp_path / "ingest_manifest"), "folha")
+    manifest.save(path)
+
+    loaded = IngestManifest.load(path)
+    assert loaded is not None
+    assert loaded.collection_name == "folha"
+    assert loaded.entries == manifest.entries
+    assert loaded.updated_at == manifest.updated_at
+    assert "d1" in loaded and len(loaded) == 1
+    assert loaded.matches_source({"size": 10, "mtime_ns": 123}, "text-embedding-3-small", False, "abc")
+    assert not loaded.matches_source({"size": 11, "mtime_ns": 123}, "text-embedding-3-small", False, "abc")
+
+
+def test_volatile_metadata_does_not_change_digests():
+    first = IngestManifest.entry_digests("c", {"title": "t", "processing_timestamp": 1.0}, [0.1])
+    second = IngestManifest.entry_digests("c", {"title": "t", "processing_timestamp": 2.0}, [0.1])
+    assert first == second
+
+
+def test_load_rejects_missing_and_unreadable_files(tmp_path):
+    assert IngestManifest.load(str(tmp_path / "missing.json")) is None
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json", encoding="utf-8")
+    assert IngestManifest.load(str(broken)) is None
+
+
+def test_content_set_digest_ignores_order():
+    assert content_set_digest(["a", "b"]) == content_set_digest(["b", "a"])
+
+
+def test_index_version_changes_when_a_manifest_is_saved(tmp_path):
+    before = index_version(str(tmp_path))
+    manifest = IngestManifest("folha")
+    path = IngestManifest.path_for(str(tmp_path / "ingest_manifest"), "folha")
+    manifest.save(path)
+    after_save = index_version(str(tmp_path))
+    assert after_save != before
+
+    os.utime(path, ns=(1, 1))
+    assert index_version(str(tmp_path)) != after_save
@@ -0,0 +1,49 @@
+import pytest
+
+from app.core.ingest_pipeline import StagedPipeline
+
+
+def test_all_items_reach_the_sink_in_order():
+    written = []
+    pipeline = StagedPipeline("test", block_size=3, queue_blocks=2)
+    stats = pipeline.run(range(10), lambda block: [item * 2 for item in block], written.extend)
+
+    assert written == [item * 2 for item in range(10)]
+    assert stats["stages"]["parse"]["items"] == 10
+    assert stats["stages"]["parse"]["blocks"] == 4
+    assert stats["stages"]["write"]["items"] == 10
+
+
+def _failing_source():
+    yield 1
+    yield 2
+    raise ValueError("arquivo corrompido")
+
+
+@pytest.mark.parametrize("stage", ["parse", "validate", "write"])
+def test_first_error_of_any_stage_is_raised(stage):
+    def transform(block):
+        if stage == "validate":
+            raise RuntimeError("falha na validação")
+        return block
+
+    def sink(block):
+        if stage == "write":
+            raise OSError("falha na gravação")
+
+    source = _failing_source() if stage == "parse" else range(100)
+    expected = {"parse": ValueError, "validate": RuntimeError, "write": OSError}[stage]
+    pipeline = StagedPipeline("test", block_size=1, queue_blocks=1)
+
+    with pytest.raises(expected):
+        pipeline.run(source, transform, sink)
+
+
+def test_write_failure_does_not_deadlock_a_long_source():
+    # Com a gravação parada, parse e validate não podem ficar bloqueados em filas cheias
+    def sink(block):
+        raise OSError("disco cheio")
+
+    pipeline = StagedPipeline("test", block_size=1, queue_blocks=1)
+    with pytest.raises(OSError):
+        pipeline.run(iter(range(100000)), lambda block: block, sink)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from app.core.mmr_reranker import mmr_select
+
+
+def _unit(rows):
+    matrix = np.asarray(rows, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def test_first_pick_is_most_relevant():
+    embeddings = _unit([[1, 0], [0, 1], [1, 1]])
+    relevance = np.array([0.2, 0.9, 0.5], dtype=np.float32)
+    assert mmr_select(embeddings, relevance, 1, 0.5)[0] == 1
+
+
+def test_near_duplicate_is_pushed_down():
+    embeddings = _unit([[1, 0], [1, 0.01], [0, 1]])
+    relevance = np.array([0.9, 0.89, 0.6], dtype=np.float32)
+    assert mmr_select(embeddings, relevance, 2, 0.5) == [0, 2]
+
+
+def test_lambda_one_keeps_relevance_order():
+    embeddings = _unit([[1, 0], [1, 0.01], [0, 1]])
+    relevance = np.array([0.9, 0.89, 0.6], dtype=np.float32)
+    assert mmr_select(embeddings, relevance, 3, 1.0) == [0, 1, 2]
+
+
+def test_k_is_clamped_and_indices_unique():
+    embeddings = _unit([[1, 0], [0, 1]])
+    relevance = np.array([0.5, 0.4], dtype=np.float32)
+    assert sorted(mmr_select(embeddings, relevance, 5, 0.7)) == [0, 1]
+    assert mmr_select(embeddings, relevance, 0, 0.7) == []
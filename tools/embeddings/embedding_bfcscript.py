@@ -1,11 +1,16 @@
 import json
 import os
+import sys
 import openai
 from tqdm import tqdm
 import time
+from pathlib import Path
 
-# Configure OpenAI API
-openai.api_key = os.getenv("OPENAI_API_KEY")
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from app.core.embedding_provider import create_embedding_provider
+
+# Embedding backend: EMBEDDING_BACKEND=openai (default) or local
+embedding_provider = create_embedding_provider(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Read all chunk files from the directory
 chunks_dir = "chunks/bfc_script_docs"
@@ -21,20 +26,15 @@ for filename in os.listdir(chunks_dir):
 
 print(f"Loaded {len(document_chunks)} chunks")
 
-# Create embeddings for the chunks using OpenAI's text-embedding-large model
-print("Generating embeddings with OpenAI's text-embedding-large model...")
+# Create embeddings for the chunks with the configured backend
+print(f"Generating embeddings with {embedding_provider.model_name}...")
 
 # Function to create embedding with rate limit handling
 def get_embedding(text):
     max_retries = 5
     for attempt in range(max_retries):
         try:
-            response = openai.embeddings.create(
-                model="text-embedding-3-small",
-                input=text,
-                dimensions=512  # The full dimensionality of the model
-            )
-            return response.data[0].embedding
+            return embedding_provider.embed_one(text)
         except openai.RateLimitError:
             wait_time = (2 ** attempt) * 1  # Exponential backoff: 1, 2, 4, 8, 16 seconds
             print(f"Rate limit hit. Waiting {wait_time} seconds...")
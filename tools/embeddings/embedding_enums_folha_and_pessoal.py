@@ -1,13 +1,17 @@
 import json
 import os
+import sys
 import openai
 from tqdm import tqdm
 import time
 from pathlib import Path
 import glob
 
-# Configure OpenAI API
-openai.api_key = os.getenv("OPENAI_API_KEY")
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from app.core.embedding_provider import create_embedding_provider
+
+# Embedding backend: EMBEDDING_BACKEND=openai (default) or local
+embedding_provider = create_embedding_provider(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Define paths
 current_dir = Path(__file__).parent.parent.parent
@@ -22,12 +26,7 @@ def get_embedding(text):
     max_retries = 5
     for attempt in range(max_retries):
         try:
-            response = openai.embeddings.create(
-                model="text-embedding-3-small",
-                input=text,
-                dimensions=512  # Match the semantic search configuration
-            )
-            return response.data[0].embedding
+            return embedding_provider.embed_one(text)
         except openai.RateLimitError:
             wait_time = (2 ** attempt) * 1  # Exponential backoff: 1, 2, 4, 8, 16 seconds
             print(f"Rate limit hit. Waiting {wait_time} seconds...")
@@ -87,7 +86,7 @@ def process_chunk_files():
 print("Loading chunk files...")
 enum_chunks = process_chunk_files()
 
-print("Generating embeddings with OpenAI's text-embedding-3-large model...")
+print(f"Generating embeddings with {embedding_provider.model_name}...")
 embeddings_data = {}
 
 for enum_name, chunks in tqdm(enum_chunks.items()):
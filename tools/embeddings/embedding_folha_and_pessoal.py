@@ -1,6 +1,5 @@
 import json
 import os
-import openai
 from tqdm import tqdm
 import time
 from pathlib import Path
@@ -11,6 +10,9 @@ import logging
 import sys
 import argparse
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from app.core.embedding_provider import EmbeddingProvider, create_embedding_provider
+
 """
 Script atualizado para gerar embeddings a partir da nova estrutura de chunks v2.
 
@@ -39,16 +41,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Configure OpenAI API
-openai.api_key = os.getenv("OPENAI_API_KEY")
-if not openai.api_key:
-    logger.error("OPENAI_API_KEY environment variable not set. Please set it before running this script.")
-    sys.exit(1)
-
 # Maximum tokens for text-embedding-3-small model
 MAX_TOKENS = 7500  # Slightly below 8192 limit for safety, matching chunking script
 EMBEDDING_DIMENSIONS = 512  # Using 512 dimensions for efficiency
 
+# Embedding backend, selected in main() (--backend or EMBEDDING_BACKEND)
+embedding_provider: Optional[EmbeddingProvider] = None
+
 def count_tokens(text: str) -> int:
     """Count tokens using the same encoding as the chunking script."""
     try:
@@ -81,13 +80,7 @@ def get_embedding_with_retry(text: str, chunk_id: str, retries: int = 5) -> Opti
             if not validate_chunk_content(text, chunk_id):
                 return None
             
-            response = openai.embeddings.create(
-                model="text-embedding-3-small",
-                dimensions=EMBEDDING_DIMENSIONS,
-                input=text
-            )
-            
-            embedding = response.data[0].embedding
+            embedding = embedding_provider.embed_one(text)
             
             # Validate embedding
             if len(embedding) != EMBEDDING_DIMENSIONS:
@@ -399,9 +392,18 @@ def main():
                        help="Output directory for embeddings (default: project_root/embeddings_v2)")
     parser.add_argument("--force", "-f", action="store_true",
                        help="Force overwrite existing embeddings file")
+    parser.add_argument("--backend", type=str, choices=["openai", "local"], default=None,
+                       help="Embedding backend (default: EMBEDDING_BACKEND env var, openai)")
     
     args = parser.parse_args()
     
+    global embedding_provider
+    try:
+        embedding_provider = create_embedding_provider(args.backend, api_key=os.getenv("OPENAI_API_KEY"))
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    
     # Define paths
     current_dir = Path(__file__).parent
     project_root = current_dir.parent  # Adjust based on your project structure
@@ -431,6 +433,7 @@ def main():
     logger.info(f"Metadata file: {metadata_file}")
     logger.info(f"Output file: {output_file}")
     logger.info(f"Max tokens per chunk: {MAX_TOKENS}")
+    logger.info(f"Embedding model: {embedding_provider.model_name}")
     logger.info(f"Embedding dimensions: {EMBEDDING_DIMENSIONS}")
     
     # Validate input directories and files